@@ -0,0 +1,11 @@
+--
+-- 爬蟲匯入去重用索引
+-- 由 python_service/crawl_ingest.py（以及服務啟動時）套用，可重複執行。
+-- 匯入時以 source_link 或「標題 + 換行（chr(10)）+ 內文」的 MD5 判斷文章是否已存在，
+-- 運算式需與 crawl_ingest.CONTENT_HASH_SQL 完全相同才會使用索引。
+--
+
+CREATE INDEX IF NOT EXISTS articles_source_link_idx ON public.articles (source_link);
+
+CREATE INDEX IF NOT EXISTS articles_content_md5_idx
+    ON public.articles (md5(coalesce(title, '') || chr(10) || coalesce(content, '')));
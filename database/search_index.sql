@@ -0,0 +1,24 @@
+--
+-- 文章全文搜尋索引（CJK 字元二元組）
+-- 由 python_service/search_index.py 於服務啟動時套用，可重複執行。
+-- 需 PostgreSQL 12 以上（generated column）。首次新增欄位會重寫 articles 資料表。
+--
+
+-- 將文字切成小寫字元二元組（略過含空白者），作為 tsvector 詞位
+CREATE OR REPLACE FUNCTION public.cjk_bigrams(txt text) RETURNS tsvector
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    AS $$
+    SELECT coalesce(array_to_tsvector(array_agg(DISTINCT g)), ''::tsvector)
+    FROM (
+        SELECT lower(substr(txt, i, 2)) AS g
+        FROM generate_series(1, greatest(char_length(txt) - 1, 0)) AS i
+    ) grams
+    WHERE g !~ '\s';
+$$;
+
+-- 由標題與內文自動維護的搜尋欄位（新增或更新文章時同步計算）
+ALTER TABLE public.articles
+    ADD COLUMN IF NOT EXISTS search_bigrams tsvector
+    GENERATED ALWAYS AS (public.cjk_bigrams(coalesce(title, '') || ' ' || coalesce(content, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS articles_search_bigrams_idx ON public.articles USING gin (search_bigrams);
@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""為所有 JSON 檔案根據檔名加入時間戳記"""
+"""
+為所有 JSON 檔案根據檔名加入時間戳記
+（舊資料用；新資料請改用 crawl_shards.py migrate：搬移時即依檔名補上 crawled_at，不需整檔重寫）
+"""
 
 import json
 import re
@@ -10,8 +13,8 @@ from datetime import datetime
 reports_dir = Path('C:/Users/rin/Desktop/truthliesdetector/projectt/reports')
 
 for json_file in reports_dir.glob('raw_*.json'):
-    # 從檔名提取日期時間: raw_20251015_195225.json
-    match = re.match(r'raw_(\d{8})_(\d{6})\.json', json_file.name)
+    # 從檔名提取日期時間: raw_20251015_195225.json（或 raw_20251015_195225_<工作代碼>.json）
+    match = re.match(r'raw_(\d{8})_(\d{6})(?:_\w+)?\.json', json_file.name)
     if not match:
         print(f"⚠️ 跳過 {json_file.name} (無法解析檔名)")
         continue
@@ -2,15 +2,27 @@
 """
 簡化版新聞分析腳本，專為 Node.js API 設計
 接收單一網址，輸出 JSON 格式分析結果
+
+用法：
+  python analyze_news.py <url>            分析單一網址
+  python analyze_news.py --worker         常駐模式：stdin 逐行輸入、stdout 逐行輸出 JSON
+  python analyze_news.py --serve [PORT]   常駐模式：本機 TCP 連接埠，逐行協定同 --worker
+  python analyze_news.py --batch <file>   批次分析檔案中的網址（每行一個）
 """
 import sys
 import json
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import urllib.parse
 import time
 import re
 
+from credibility import score_content
+from http_fetcher import HTML_CONTENT_TYPES, get_fetcher
+from html_extract import extract_article
+
 def preprocess_document_text(text: str) -> str:
     """清理常見的網頁噪音、廣告和冗餘空間。"""
     text = re.sub(r'\(C\) 版權所有|All rights reserved|分享給好友|點擊下載|繼續閱讀|相關新聞.*', '', text, flags=re.IGNORECASE)
@@ -18,132 +30,231 @@ def preprocess_document_text(text: str) -> str:
     text = re.sub(r'\s{2,}', ' ', text).strip()
     return text
 
-def fetch_and_clean_url(url: str):
-    """從 URL 抓取標題、網域和淨化後的主文本。"""
+def fetch_and_extract(url: str):
+    """從 URL 抓取並擷取標題與主文，回傳 (標題, 網域, 淨化後的主文, 擷取資訊 dict)"""
     domain = urllib.parse.urlparse(url).netloc
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
-        response.raise_for_status()
-        response.encoding = response.apparent_encoding
-
-        soup = BeautifulSoup(response.text, 'html.parser')
-        title = soup.title.string.strip() if soup.title and soup.title.string else "未偵測到標題"
-
-        # 嘗試擷取文章主體
-        main_text = ""
-        content_selectors = ['article', 'div[itemprop="articleBody"]', 'div.article-content', 'div.entry-content', 'div#main-content']
-
-        for selector in content_selectors:
-            article_body = soup.select_one(selector)
-            if article_body and len(article_body.get_text(strip=True)) > 200:
-                main_text = article_body.get_text(separator='\n', strip=True)
-                break
-
-        if not main_text and soup.body:
-            main_text = soup.body.get_text(separator='\n', strip=True)
+        response = get_fetcher().fetch(url, headers=headers, accept=HTML_CONTENT_TYPES)
 
-        main_text = preprocess_document_text(main_text)
-        return title, domain, main_text
+        # 擷取標題與文章主體（後端見 html_extract，輸出規則與原本的 BeautifulSoup 版本相同）
+        page = extract_article(response.text(apparent=True))
+        main_text = preprocess_document_text(page.text)
+        return page.title, domain, main_text, page.to_dict()
 
     except Exception as e:
         error_msg = f"網路連線或請求錯誤: {str(e)}"
-        return "提取失敗", domain, error_msg
+        return "提取失敗", domain, error_msg, None
+
+def fetch_and_clean_url(url: str):
+    """從 URL 抓取標題、網域和淨化後的主文本。"""
+    title, domain, main_text, _ = fetch_and_extract(url)
+    return title, domain, main_text
 
 def analyze_content(title: str, content: str, domain: str):
-    """簡單的內容分析，計算可信度分數"""
-    
-    # 網域可信度評分
-    domain_credibility = {
-        'cna.com.tw': 5.0, 'udn.com': 4.5, 'setn.com': 3.0, 
-        'facebook.com': 2.5, 'ptt.cc': 2.0
-    }
-    
-    domain_score = domain_credibility.get(domain, 3.0)
-    
-    # 情緒化詞彙檢測
-    emotional_indicators = [
-        '驚人', '絕對', '震驚', '離譜', '不可思議', '大爆發', '小心', '慘了', 
-        '怒吼', '崩潰', '獨家', '急轉直下', '馬上看', '瘋傳', '秘密'
-    ]
-    
-    emotion_count = sum(1 for word in emotional_indicators if word in content)
-    emotion_ratio = emotion_count / (len(content) / 100) if content else 0
-    
-    # 計算總分 (簡化版)
-    base_score = domain_score
-    emotion_penalty = min(emotion_ratio * 0.5, 2.0)
-    final_score = max(1.0, base_score - emotion_penalty)
-    
-    # 正規化到 0-1
-    confidence_score = min(1.0, final_score / 5.0)
-    
-    # 判斷可信度等級
-    if confidence_score >= 0.8:
-        credibility_level = "高度可信"
-    elif confidence_score >= 0.6:
-        credibility_level = "中度可信"
-    elif confidence_score >= 0.4:
-        credibility_level = "中度可疑"
-    else:
-        credibility_level = "高度可疑"
-    
-    return {
-        'confidence_score': round(confidence_score, 3),
-        'credibility_level': credibility_level,
-        'domain_score': domain_score,
-        'emotion_ratio': round(emotion_ratio, 2),
-        'final_score': round(final_score, 2)
-    }
+    """簡單的內容分析，計算可信度分數（規則見 credibility.score_content）"""
+    return score_content(domain, content)
 
-def main():
-    if len(sys.argv) < 2:
-        result = {
-            'error': '缺少網址參數',
-            'usage': 'python analyze_news.py <url>'
-        }
-        print(json.dumps(result, ensure_ascii=False, indent=2))
-        sys.exit(1)
-    
-    url = sys.argv[1]
-    
+def analyze_url(url: str) -> dict:
+    """分析單一網址，回傳結果 dict（失敗時含 'error' 欄位）"""
     try:
         # 擷取內容
-        title, domain, content = fetch_and_clean_url(url)
-        
+        title, domain, content, extraction = fetch_and_extract(url)
+
         if "提取失敗" in title or not content:
-            result = {
+            return {
                 'error': '無法擷取網頁內容',
                 'url': url,
                 'domain': domain
             }
-        else:
-            # 分析內容
-            analysis = analyze_content(title, content, domain)
-            
-            result = {
-                'success': True,
-                'url': url,
-                'title': title,
-                'domain': domain,
-                'content_length': len(content),
-                'analysis': analysis,
-                'summary': f"該文章來自 {domain}，標題為「{title}」，經分析後可信度等級為「{analysis['credibility_level']}」，可信度分數為 {analysis['confidence_score']}。"
-            }
-        
-        # 輸出 JSON 結果
-        print(json.dumps(result, ensure_ascii=False, indent=2))
-        
+
+        # 分析內容
+        analysis = analyze_content(title, content, domain)
+
+        return {
+            'success': True,
+            'url': url,
+            'title': title,
+            'domain': domain,
+            'content_length': len(content),
+            'analysis': analysis,
+            'extraction': extraction,
+            'summary': f"該文章來自 {domain}，標題為「{title}」，經分析後可信度等級為「{analysis['credibility_level']}」，可信度分數為 {analysis['confidence_score']}。"
+        }
+
     except Exception as e:
-        result = {
+        return {
             'error': f'分析過程發生錯誤: {str(e)}',
             'url': url
         }
+
+# =========================================================
+# 常駐模式：一次啟動、重複分析，省去每個網址的直譯器啟動與 bs4 匯入時間
+# 每行輸入一個請求，每行輸出一個 JSON 結果：
+#   輸入：{"id": 1, "url": "https://..."}，或直接一行網址
+#   輸出：{"id": 1, "success": true, ..., "elapsed_ms": 123}
+# 多個請求會同時處理，結果依完成順序輸出，以 id 對應
+# =========================================================
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PORT = 8765
+
+def parse_request_line(line: str):
+    """解析一行請求，回傳 (id, url)；空行回傳 None；格式錯誤時拋出 ValueError"""
+    line = line.strip()
+    if not line:
+        return None
+    if line[0] in '{["':
+        req = json.loads(line)
+        if not isinstance(req, dict):
+            raise ValueError('請求必須為 JSON 物件')
+        url = req.get('url')
+        if url is not None and not isinstance(url, str):
+            raise ValueError('url 必須為字串')
+        return req.get('id'), (url or '').strip()
+    return None, line
+
+def request_id(line: str):
+    """盡量從請求行取得 id（格式錯誤時仍能讓呼叫端對應回應）"""
+    try:
+        req = json.loads(line)
+    except ValueError:
+        return None
+    return req.get('id') if isinstance(req, dict) else None
+
+def handle_request_line(line: str):
+    """處理一行請求，回傳結果 dict；空行回傳 None。任何錯誤都回傳帶有 id 的錯誤結果"""
+    start = time.perf_counter()
+    req_id = None
+    try:
+        req = parse_request_line(line)
+        if req is None:
+            return None
+        req_id, url = req
+        result = analyze_url(url) if url else {'error': '缺少網址參數'}
+    except ValueError as e:
+        req_id = request_id(line)
+        result = {'error': f'無效的請求格式: {e}'}
+    except Exception as e:
+        result = {'error': f'分析失敗: {e}'}
+    if req_id is not None:
+        result = {'id': req_id, **result}
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000)
+    return result
+
+def serve_lines(lines, write, concurrency: int = DEFAULT_CONCURRENCY):
+    """從 lines 逐行讀取請求並同時處理，每個結果完成時呼叫 write(一行 JSON)"""
+    write_lock = threading.Lock()
+
+    def work(line):
+        # 每個非空白請求都必須寫出一行回應，否則等待該 id 的呼叫端會一直卡住
+        try:
+            result = handle_request_line(line)
+        except Exception as e:
+            result = {'error': f'分析失敗: {e}'}
+            req_id = request_id(line)
+            if req_id is not None:
+                result = {'id': req_id, **result}
+        if result is not None:
+            line_out = json.dumps(result, ensure_ascii=False, default=str) + '\n'
+            with write_lock:
+                write(line_out)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for line in lines:
+            executor.submit(work, line)
+
+def run_worker(concurrency: int):
+    """stdin / stdout 常駐模式（由 Node.js 以子行程長期持有）"""
+    def write(text):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    print(f"✅ analyze_news worker 已啟動（同時處理 {concurrency} 筆）", file=sys.stderr, flush=True)
+    serve_lines(sys.stdin, write, concurrency)
+
+def run_server(host: str, port: int, concurrency: int):
+    """本機 TCP 常駐模式：每個連線使用與 --worker 相同的逐行協定"""
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lines = (raw.decode('utf-8', errors='replace') for raw in self.rfile)
+
+            def write(text):
+                self.wfile.write(text.encode('utf-8'))
+                self.wfile.flush()
+
+            try:
+                serve_lines(lines, write, concurrency)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), Handler) as server:
+        server.daemon_threads = True
+        print(f"✅ analyze_news 服務已啟動: {host}:{port}", file=sys.stderr, flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+def run_batch(path: str, concurrency: int) -> int:
+    """批次模式：從檔案（- 表示 stdin）讀取網址，同時分析，依輸入順序逐行輸出結果"""
+    f = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    with f:
+        lines = [line for line in f if line.strip()]
+
+    start = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for result in executor.map(handle_request_line, lines):
+            if 'error' in result:
+                failed += 1
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + '\n')
+            sys.stdout.flush()
+    elapsed = time.perf_counter() - start
+    print(f"✅ 批次分析完成: {len(lines)} 筆，失敗 {failed} 筆，耗時 {elapsed:.1f} 秒",
+          file=sys.stderr, flush=True)
+    return 1 if failed else 0
+
+def main():
+    if len(sys.argv) < 2:
+        result = {
+            'error': '缺少網址參數',
+            'usage': 'python analyze_news.py <url> | --worker | --serve [PORT] | --batch <file>'
+        }
         print(json.dumps(result, ensure_ascii=False, indent=2))
         sys.exit(1)
 
+    if sys.argv[1].startswith('--'):
+        parser = argparse.ArgumentParser(description='新聞網址可信度分析')
+        mode = parser.add_mutually_exclusive_group(required=True)
+        mode.add_argument('--worker', action='store_true', help='從 stdin 逐行讀取請求，逐行輸出 JSON 結果')
+        mode.add_argument('--serve', nargs='?', type=int, const=DEFAULT_PORT, metavar='PORT',
+                          help=f'在本機 TCP 連接埠提供逐行協定（預設 {DEFAULT_PORT}）')
+        mode.add_argument('--batch', metavar='FILE', help='分析檔案中的所有網址（每行一個，- 表示 stdin）')
+        parser.add_argument('--host', default='127.0.0.1', help='--serve 綁定的位址')
+        parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='同時分析的網址數')
+        args = parser.parse_args()
+        concurrency = max(1, args.concurrency)
+
+        if args.worker:
+            run_worker(concurrency)
+        elif args.serve is not None:
+            run_server(args.host, args.serve, concurrency)
+        else:
+            sys.exit(run_batch(args.batch, concurrency))
+        return
+
+    url = sys.argv[1]
+    result = analyze_url(url)
+
+    # 輸出 JSON 結果
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    # 與舊版相同：分析過程拋出例外（結果不含 domain）時以狀態碼 1 結束
+    if 'error' in result and 'domain' not in result:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
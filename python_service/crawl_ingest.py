@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+爬蟲結果直接匯入資料庫
+爬取的條目原本只寫成 raw_*.json，搜尋與排行 API 查詢的 articles / analysis_results 看不到。
+CrawlIngestor 逐筆接收爬蟲輸出，累積成批（或等待 FLUSH_SECONDS 秒）後一次寫入：
+- 以 source_link 或「標題 + 換行 + 內文」的 MD5 去重（同批內與資料庫中已有的文章）
+- PostgreSQL：COPY 到暫存表，再以單一 INSERT ... SELECT 寫入 articles 與 analysis_results
+- 其他資料庫（SQLite 測試環境）：executemany
+- 寫入時一併以 credibility 計算可信度分數；有新文章時清除首頁列表快取
+
+用法：
+  python crawl_ingest.py projectt/reports/raw_*.json     匯入爬蟲輸出檔
+  scraper.py ... | python crawl_ingest.py -              從 stdin 逐行讀取 JSON 條目
+"""
+import hashlib
+import io
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import bindparam, text
+
+from credibility import score_content_batch
+from feed_cache import invalidate_article_feeds
+from json_stream import iter_json_file
+from news_keywords import classify_title, scan
+from verification_loader import classify_item
+
+SQL_PATH = Path(__file__).parent.parent / 'database' / 'crawl_ingest.sql'
+
+DEFAULT_BATCH_SIZE = 1000
+# 條目最多等待幾秒就寫入（讓新文章在數秒內可被搜尋）
+FLUSH_SECONDS = 2.0
+# 每則分析結果最多記錄的關鍵字數
+MAX_KEYWORDS = 10
+
+# 與 database/crawl_ingest.sql 的索引運算式相同
+CONTENT_HASH_SQL = "md5(coalesce({p}title, '') || chr(10) || coalesce({p}content, ''))"
+
+# 爬蟲輸出的欄位名稱不固定，依序嘗試
+LINK_KEYS = ('source_link', 'url', 'link', 'href')
+CONTENT_KEYS = ('content', 'text', 'summary', 'snippet', 'description')
+MEDIA_KEYS = ('media_name', 'source', 'publisher', 'site')
+TIME_KEYS = ('published_time', 'published_at', 'pubDate', 'date', 'crawled_at')
+
+STATUS_LABELS = {'verified': '已查證', 'unverified': '未查證'}
+
+# 暫存表與寫入欄位（順序即 COPY 的欄位順序）
+_COLUMNS = ('seq', 'title', 'content', 'category', 'source_link', 'media_name', 'published_time',
+            'reliability_score', 'content_md5', 'explanation', 'keywords', 'confidence_score',
+            'risk_level', 'analyzed_at')
+
+_STAGING_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS crawl_staging (
+        seq integer, title text, content text, category text, source_link text, media_name text,
+        published_time timestamp, reliability_score numeric(3,2), content_md5 text, explanation text,
+        keywords text, confidence_score numeric(3,2), risk_level text, analyzed_at timestamp
+    ) ON COMMIT DELETE ROWS
+"""
+
+_INSERT_PG_SQL = f"""
+    WITH fresh AS (
+        SELECT s.* FROM crawl_staging s
+        WHERE NOT EXISTS (SELECT 1 FROM articles a WHERE a.source_link = s.source_link)
+          AND NOT EXISTS (SELECT 1 FROM articles a WHERE {CONTENT_HASH_SQL.format(p='a.')} = s.content_md5)
+    ), ins AS (
+        INSERT INTO articles (title, content, category, source_link, media_name, published_time, reliability_score)
+        SELECT title, content, category, source_link, media_name, published_time, reliability_score
+        FROM fresh ORDER BY seq
+        RETURNING article_id, {CONTENT_HASH_SQL.format(p='')} AS content_md5
+    ), analysis AS (
+        INSERT INTO analysis_results (article_id, explanation, analyzed_at, keywords, category, confidence_score, risk_level)
+        SELECT ins.article_id, f.explanation, f.analyzed_at, f.keywords, f.category, f.confidence_score, f.risk_level
+        FROM ins JOIN fresh f ON f.content_md5 = ins.content_md5
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM ins)
+"""
+
+
+def ensure_ingest_indexes(engine) -> bool:
+    """在 PostgreSQL 上建立去重用索引（可重複執行），其他資料庫直接略過"""
+    if engine.dialect.name != 'postgresql':
+        return False
+    with engine.begin() as conn:
+        conn.exec_driver_sql(SQL_PATH.read_text(encoding='utf-8'))
+    return True
+
+
+# ---------------------------------------------------------
+# 條目正規化
+# ---------------------------------------------------------
+def content_md5(title: str, content: str) -> str:
+    return hashlib.md5(f'{title}\n{content}'.encode('utf-8')).hexdigest()
+
+
+def _first(item: Dict, keys) -> Optional[str]:
+    for key in keys:
+        value = item.get(key)
+        if isinstance(value, dict):
+            value = value.get('name') or value.get('title')
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is not None:
+        # 資料表使用不含時區的 UTC 時間
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _risk_level(confidence: float) -> str:
+    return '低' if confidence >= 0.6 else ('中' if confidence >= 0.4 else '高')
+
+
+def normalize_items(items: List[Dict]) -> List[Dict]:
+    """把爬蟲條目轉成寫入用的欄位（沒有標題的條目略過），並批次計算可信度"""
+    rows = []
+    for item in items:
+        title = _first(item, ('title',))
+        if not title:
+            continue
+        title = title[:200]
+        content = _first(item, CONTENT_KEYS) or ''
+        link = _first(item, LINK_KEYS)
+        domain = urllib.parse.urlparse(link).netloc if link else ''
+        hits = scan(title)
+        keywords = sorted({kw for labels in hits.values() for kws in labels.values() for kw in kws})
+        category = _first(item, ('category',)) or classify_title(title)[0]
+        rows.append({
+            'title': title,
+            'content': content,
+            'category': category[:50] if category else None,
+            'source_link': link,
+            'media_name': (_first(item, MEDIA_KEYS) or domain or None),
+            'published_time': next((t for t in (_parse_time(_first(item, (k,))) for k in TIME_KEYS) if t), None),
+            'content_md5': content_md5(title, content),
+            'explanation': (item.get('short_judgement') or '').strip() or f'爬蟲匯入（{STATUS_LABELS[classify_item(item)]}）',
+            'keywords': ', '.join(keywords[:MAX_KEYWORDS]) or None,
+            '_domain': domain,
+        })
+        if rows[-1]['media_name']:
+            rows[-1]['media_name'] = rows[-1]['media_name'][:100]
+
+    scores = score_content_batch([(row.pop('_domain'), row['content']) for row in rows])
+    now = datetime.utcnow()
+    for seq, (row, score) in enumerate(zip(rows, scores)):
+        row['seq'] = seq
+        row['reliability_score'] = score['final_score']
+        row['confidence_score'] = score['confidence_score']
+        row['risk_level'] = _risk_level(score['confidence_score'])
+        row['analyzed_at'] = now
+    return rows
+
+
+def _dedupe(rows: List[Dict]) -> List[Dict]:
+    """同批內以連結或內容雜湊去重，保留第一筆"""
+    links, hashes, unique = set(), set(), []
+    for row in rows:
+        if row['content_md5'] in hashes or (row['source_link'] and row['source_link'] in links):
+            continue
+        hashes.add(row['content_md5'])
+        if row['source_link']:
+            links.add(row['source_link'])
+        unique.append(row)
+    return unique
+
+
+# ---------------------------------------------------------
+# 寫入
+# ---------------------------------------------------------
+def _copy_value(value) -> str:
+    """COPY text 格式：NULL 為 \\N，反斜線與控制字元需跳脫"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _write_postgres(conn, rows: List[Dict]) -> int:
+    # 同時只允許一個匯入交易，避免兩個匯入程序同時寫入同一篇文章
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('crawl_ingest'))"))
+    conn.execute(text(_STAGING_SQL))
+    buf = io.StringIO()
+    for row in rows:
+        buf.write('\t'.join(_copy_value(row[c]) for c in _COLUMNS) + '\n')
+    buf.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY crawl_staging ({', '.join(_COLUMNS)}) FROM STDIN", buf)
+    finally:
+        cursor.close()
+    return conn.execute(text(_INSERT_PG_SQL)).scalar() or 0
+
+
+def _register_sqlite_functions(conn):
+    dbapi = conn.connection.dbapi_connection
+    dbapi.create_function('md5', 1, lambda s: hashlib.md5((s or '').encode('utf-8')).hexdigest(),
+                          deterministic=True)
+    dbapi.create_function('chr', 1, chr, deterministic=True)
+
+
+def _write_fallback(conn, rows: List[Dict]) -> int:
+    if conn.dialect.name == 'sqlite':
+        _register_sqlite_functions(conn)
+
+    links = [r['source_link'] for r in rows if r['source_link']]
+    existing_links = set()
+    if links:
+        stmt = text("SELECT source_link FROM articles WHERE source_link IN :links").bindparams(
+            bindparam('links', expanding=True))
+        existing_links = {r[0] for r in conn.execute(stmt, {'links': links})}
+    hash_sql = CONTENT_HASH_SQL.format(p='')
+    stmt = text(f"SELECT {hash_sql} FROM articles WHERE {hash_sql} IN :hashes").bindparams(
+        bindparam('hashes', expanding=True))
+    existing_hashes = {r[0] for r in conn.execute(stmt, {'hashes': [r['content_md5'] for r in rows]})}
+    fresh = [r for r in rows if r['source_link'] not in existing_links and r['content_md5'] not in existing_hashes]
+    if not fresh:
+        return 0
+
+    max_before = conn.execute(text("SELECT COALESCE(MAX(article_id), 0) FROM articles")).scalar()
+    conn.execute(text("""
+        INSERT INTO articles (title, content, category, source_link, media_name, published_time, reliability_score)
+        VALUES (:title, :content, :category, :source_link, :media_name, :published_time, :reliability_score)
+    """), fresh)
+    ids = dict(conn.execute(text(f"SELECT {hash_sql}, article_id FROM articles WHERE article_id > :max_before"),
+                            {'max_before': max_before}).all())
+    conn.execute(text("""
+        INSERT INTO analysis_results (article_id, explanation, analyzed_at, keywords, category, confidence_score, risk_level)
+        VALUES (:article_id, :explanation, :analyzed_at, :keywords, :category, :confidence_score, :risk_level)
+    """), [dict(r, article_id=ids[r['content_md5']]) for r in fresh if r['content_md5'] in ids])
+    return len(fresh)
+
+
+class CrawlIngestor:
+    """累積爬蟲條目並分批寫入資料庫（執行緒安全）"""
+
+    def __init__(self, engine, batch_size: int = DEFAULT_BATCH_SIZE, flush_seconds: float = FLUSH_SECONDS):
+        self.engine = engine
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self._pending: List[Dict] = []
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.RLock()
+        self.stats = {'received': 0, 'inserted': 0, 'skipped': 0}
+
+    def add(self, item: Dict):
+        with self._lock:
+            self._pending.append(item)
+            self.stats['received'] += 1
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            else:
+                self._schedule()
+
+    def add_many(self, items: Iterable[Dict]):
+        """
+        加入多筆條目；寫入失敗時其餘條目仍放入待寫入清單，全部加入後再拋出例外
+        每筆各自取得鎖：輸入為串流時，背景計時器仍可在串流結束前寫入
+        """
+        error = None
+        for item in items:
+            if error is None:
+                try:
+                    self.add(item)
+                except Exception as e:
+                    error = e
+                continue
+            with self._lock:
+                self._pending.append(item)
+                self.stats['received'] += 1
+                self._schedule()
+        if error is not None:
+            raise error
+
+    def _schedule(self):
+        if self._pending and self._timer is None and self.flush_seconds > 0:
+            # 第一筆待寫入的條目最多等待 flush_seconds 秒
+            self._timer = threading.Timer(self.flush_seconds, self._flush_later)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_later(self):
+        try:
+            self.flush()
+        except Exception:
+            # 失敗訊息已由 flush 印出，條目留待下一次寫入
+            pass
+
+    def flush(self) -> int:
+        """
+        寫入目前累積的條目，回傳新增的文章數
+        寫入失敗時條目放回待寫入清單並拋出例外，由呼叫端記錄失敗
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            items, self._pending = self._pending, []
+            if not items:
+                return 0
+            start = time.monotonic()
+            try:
+                rows = _dedupe(normalize_items(items))
+                with self.engine.begin() as conn:
+                    if conn.dialect.name == 'postgresql':
+                        inserted = _write_postgres(conn, rows)
+                    else:
+                        inserted = _write_fallback(conn, rows)
+            except Exception as e:
+                print(f"❌ 爬蟲結果匯入失敗（{len(items)} 筆，保留待下次寫入）: {e}")
+                self._pending[:0] = items
+                raise
+            self.stats['inserted'] += inserted
+            self.stats['skipped'] += len(items) - inserted
+            print(f"✅ 爬蟲結果匯入 {inserted} 篇新文章（略過 {len(items) - inserted} 筆重複或無標題），"
+                  f"耗時 {time.monotonic() - start:.2f} 秒")
+        if inserted:
+            invalidate_article_feeds()
+        return inserted
+
+    def close(self) -> Dict:
+        self.flush()
+        return dict(self.stats)
+
+
+# ---------------------------------------------------------
+# 命令列
+# ---------------------------------------------------------
+def iter_file_items(path: str) -> Iterator[Dict]:
+    """讀取 raw_*.json（{'items': [...]}）或 JSON Lines；- 表示 stdin 逐行讀取"""
+    if path == '-':
+        for line in sys.stdin:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+        return
+    yield from iter_json_file(path)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print('用法: python crawl_ingest.py <raw_*.json | *.jsonl | -> ...')
+        sys.exit(1)
+
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        ensure_ingest_indexes(db.engine)
+        ingestor = CrawlIngestor(db.engine)
+        for path in sys.argv[1:]:
+            ingestor.add_many(iter_file_items(path))
+        stats = ingestor.close()
+    print(f"🎉 匯入完成：{stats}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+查證資料分片儲存
+取代每次爬取寫出一個 raw_YYYYMMDD_HHMMSS.json（整個 items 陣列）、
+再由 add_timestamps.py 整檔重寫加上 crawled_at 的做法：
+
+- 依 crawled_at 的日期分區：shards/YYYY-MM-DD/part-*.jsonl[.zst|.gz]，每行一則條目
+- 只新增不改寫：每次寫入產生新的分片檔（先寫暫存檔再改名），既有分片不會再變動
+- 寫入時補上缺少的 crawled_at，不需要事後重寫檔案
+- manifest.json 記錄各分區的分片、筆數與位元組數，以及已搬移的 raw_*.json
+- 讀取端逐行串流，並只讀取指定日期範圍內的分區
+
+壓縮方式見 Config.VERIFICATION_SHARD_CODEC（有 zstandard 時預設 zstd，否則 gzip）。
+
+用法：
+  python crawl_shards.py migrate [--remove]       把 raw_*.json 搬進分片（可重複執行，已搬移的會略過）
+  python crawl_shards.py append FILE ...          附加 raw_*.json 或 JSON Lines（- 為 stdin）
+  python crawl_shards.py stats                    顯示各分區筆數
+  python crawl_shards.py rebuild-manifest         依分片檔重建 manifest
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from config import Config
+from json_stream import iter_json_file
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 分片資料夾（與 raw_*.json 同在 projectt/reports 下）
+SHARDS_DIR = Path(__file__).parent.parent / 'projectt' / 'reports' / 'shards'
+MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# 副檔名與壓縮方式
+CODEC_SUFFIXES = {'zstd': '.jsonl.zst', 'gzip': '.jsonl.gz', 'none': '.jsonl'}
+
+# manifest 鎖（跨行程）：等待上限與視為殘留的秒數
+LOCK_TIMEOUT = 30.0
+STALE_LOCK_SECONDS = 120.0
+
+# raw_20251015_195225.json 的檔名時間（排程器指定的輸出檔另有工作代碼：raw_20251015_195225_<代碼>.json）
+_RAW_NAME = re.compile(r'raw_(\d{8})_(\d{6})(?:_\w+)?\.json$')
+_PARTITION_NAME = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def default_codec() -> str:
+    codec = (Config.VERIFICATION_SHARD_CODEC or 'auto').lower()
+    if codec == 'zstd' and zstandard is None:
+        print("⚠️ 未安裝 zstandard，查證資料分片改用 gzip")
+        return 'gzip'
+    if codec in CODEC_SUFFIXES:
+        return codec
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def _open_text(path: Path, mode: str):
+    """依副檔名開啟分片（mode 為 'rt' 或 'wt'）"""
+    name = path.name
+    if name.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f'讀寫 {name} 需要 zstandard 套件')
+        return zstandard.open(path, mode, encoding='utf-8')
+    if name.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def raw_file_timestamp(name: str) -> Optional[str]:
+    """raw_20251015_195225.json → '2025-10-15T19:52:25'（與 add_timestamps.py 相同規則）"""
+    match = _RAW_NAME.search(name)
+    if not match:
+        return None
+    d, t = match.groups()
+    return f"{d[:4]}-{d[4:6]}-{d[6:8]}T{t[:2]}:{t[2:4]}:{t[4:6]}"
+
+
+def _partition_of(item: Dict, fallback: str) -> str:
+    try:
+        return datetime.fromisoformat(item['crawled_at']).date().isoformat()
+    except (KeyError, TypeError, ValueError):
+        # 沒有或無法解析的時間戳記：放在寫入時間的分區（原值保留，統計時照舊視為無法解析）
+        return fallback
+
+
+class ShardStore:
+    """日期分區的 JSON Lines 查證資料（只新增，不改寫）"""
+
+    def __init__(self, root: Path, codec: Optional[str] = None):
+        self.root = Path(root)
+        self.codec = codec or default_codec()
+        self._manifest: Optional[Dict] = None
+        self._manifest_mtime_ns: Optional[int] = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # manifest
+    # ------------------------------------------------------------------
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / MANIFEST_NAME
+
+    @staticmethod
+    def _empty_manifest() -> Dict:
+        return {'version': MANIFEST_VERSION, 'partitions': {}, 'migrated': [], 'updated_at': None}
+
+    def manifest(self) -> Dict:
+        """目前的 manifest（檔案未變動時使用快取）；尚未建立時回傳空的 manifest"""
+        with self._lock:
+            try:
+                mtime_ns = self.manifest_path.stat().st_mtime_ns
+            except OSError:
+                return self._empty_manifest()
+            if self._manifest is None or mtime_ns != self._manifest_mtime_ns:
+                with self.manifest_path.open('r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+                self._manifest_mtime_ns = mtime_ns
+            return self._manifest
+
+    @contextmanager
+    def _locked_manifest(self):
+        """跨行程獨占更新 manifest：yield 可修改的 manifest，結束時原子寫回"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        lock_path = self.root / (MANIFEST_NAME + '.lock')
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - lock_path.stat().st_mtime > STALE_LOCK_SECONDS:
+                        # 持有者已中止，移除殘留的鎖
+                        lock_path.unlink()
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f'無法取得 {lock_path}')
+                time.sleep(0.05)
+        try:
+            try:
+                with self.manifest_path.open('r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+            except FileNotFoundError:
+                manifest = self._empty_manifest()
+            yield manifest
+            manifest['updated_at'] = datetime.now().isoformat(timespec='seconds')
+            tmp = self.manifest_path.with_suffix('.tmp')
+            with tmp.open('w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.manifest_path)
+        finally:
+            try:
+                lock_path.unlink()
+            except OSError:
+                pass
+
+    def migrated_sources(self) -> set:
+        """已搬進分片的 raw_*.json 檔名"""
+        return set(self.manifest().get('migrated', []))
+
+    # ------------------------------------------------------------------
+    # 寫入
+    # ------------------------------------------------------------------
+    def append(self, items: Iterable[Dict], crawled_at: Optional[str] = None, source: Optional[str] = None) -> int:
+        """
+        附加條目（逐筆串流寫入），回傳寫入筆數
+        crawled_at：條目缺少 crawled_at 時補上的時間（預設為現在）
+        source：來源檔名，記錄於 manifest 的 migrated，避免重複搬移
+        """
+        crawled_at = crawled_at or datetime.now().isoformat(timespec='seconds')
+        fallback = crawled_at[:10]
+        suffix = CODEC_SUFFIXES[self.codec]
+        part_name = f"part-{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}-{uuid.uuid4().hex[:8]}{suffix}"
+
+        # 每個分區一個暫存檔，全部寫完才改名並登記到 manifest
+        writers: Dict[str, list] = {}
+        count = 0
+        try:
+            for item in items:
+                if 'crawled_at' not in item:
+                    item = dict(item, crawled_at=crawled_at)
+                partition = _partition_of(item, fallback)
+                writer = writers.get(partition)
+                if writer is None:
+                    directory = self.root / partition
+                    directory.mkdir(parents=True, exist_ok=True)
+                    # 暫存檔以 . 開頭（不符合 part-*），副檔名不變，_open_text 才會選到相同的壓縮方式
+                    tmp = directory / ('.' + part_name)
+                    writer = writers[partition] = [tmp, _open_text(tmp, 'wt'), 0]
+                writer[1].write(json.dumps(item, ensure_ascii=False) + '\n')
+                writer[2] += 1
+                count += 1
+        except BaseException:
+            for tmp, f, _ in writers.values():
+                f.close()
+                tmp.unlink(missing_ok=True)
+            raise
+
+        parts = {}
+        for partition, (tmp, f, records) in writers.items():
+            f.close()
+            final = tmp.with_name(part_name)
+            os.replace(tmp, final)
+            parts[partition] = {'file': f'{partition}/{part_name}', 'records': records,
+                                'bytes': final.stat().st_size}
+
+        if parts or source:
+            with self._locked_manifest() as manifest:
+                for partition, entry in parts.items():
+                    manifest['partitions'].setdefault(partition, []).append(entry)
+                if source and source not in manifest['migrated']:
+                    manifest['migrated'].append(source)
+        return count
+
+    # ------------------------------------------------------------------
+    # 讀取
+    # ------------------------------------------------------------------
+    def partitions(self, start: Optional[date] = None, end: Optional[date] = None) -> List[str]:
+        """日期範圍 [start, end]（含）內的分區，依日期排序"""
+        lo = start.isoformat() if start else ''
+        hi = end.isoformat() if end else '9999-12-31'
+        return sorted(p for p in self.manifest()['partitions'] if lo <= p <= hi)
+
+    def parts(self, start: Optional[date] = None, end: Optional[date] = None) -> List[Path]:
+        """日期範圍內的分片檔路徑（依分區、寫入順序）"""
+        partitions = self.manifest()['partitions']
+        return [self.root / entry['file'] for p in self.partitions(start, end) for entry in partitions[p]]
+
+    @staticmethod
+    def iter_part(path: Path) -> Iterator[Dict]:
+        """逐行讀取單一分片"""
+        with _open_text(path, 'rt') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_records(self, start: Optional[date] = None, end: Optional[date] = None) -> Iterator[Dict]:
+        """逐筆讀取日期範圍內的所有條目"""
+        for path in self.parts(start, end):
+            try:
+                yield from self.iter_part(path)
+            except FileNotFoundError:
+                print(f"⚠️ 分片不存在（manifest 與檔案不一致）: {path}")
+
+    # ------------------------------------------------------------------
+    # 維護
+    # ------------------------------------------------------------------
+    def rebuild_manifest(self) -> Dict:
+        """依資料夾中的分片檔重建 manifest（保留已搬移清單）"""
+        with self._locked_manifest() as manifest:
+            partitions: Dict[str, List[Dict]] = {}
+            for directory in sorted(self.root.iterdir()) if self.root.exists() else []:
+                if not directory.is_dir() or not _PARTITION_NAME.match(directory.name):
+                    continue
+                for path in sorted(directory.glob('part-*.jsonl*')):
+                    records = sum(1 for _ in self.iter_part(path))
+                    partitions.setdefault(directory.name, []).append({
+                        'file': f'{directory.name}/{path.name}', 'records': records,
+                        'bytes': path.stat().st_size})
+            manifest['partitions'] = partitions
+        return self.manifest()
+
+    def stats(self) -> Dict[str, int]:
+        """各分區的條目數"""
+        return {p: sum(e['records'] for e in entries)
+                for p, entries in sorted(self.manifest()['partitions'].items())}
+
+
+def migrate_raw_files(store: ShardStore, reports_dir: Path, remove: bool = False) -> Dict:
+    """
+    把 reports_dir 下的 raw_*.json 搬進分片（一次性，可重複執行）
+    缺少 crawled_at 的條目依檔名時間補上；remove 為 True 時搬移後刪除原檔
+    """
+    migrated = store.migrated_sources()
+    stats = {'files': 0, 'items': 0, 'skipped': 0}
+    for raw in sorted(Path(reports_dir).glob('raw_*.json')):
+        if raw.name in migrated:
+            stats['skipped'] += 1
+            if remove:
+                raw.unlink()
+            continue
+        try:
+            # 逐筆解析並寫入；解析失敗時已寫入的暫存分片會被移除
+            count = store.append(iter_json_file(raw), crawled_at=raw_file_timestamp(raw.name), source=raw.name)
+        except Exception as e:
+            print(f"  ✗ 讀取 {raw.name} 失敗，略過: {e}")
+            continue
+        stats['files'] += 1
+        stats['items'] += count
+        print(f"  ✓ {raw.name}: {count} 則")
+        if remove:
+            raw.unlink()
+    return stats
+
+
+_store: Optional[ShardStore] = None
+_store_lock = threading.Lock()
+
+
+def get_shard_store() -> ShardStore:
+    """取得行程內共用的分片儲存"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ShardStore(SHARDS_DIR)
+        return _store
+
+
+def _iter_input(path: str) -> Iterator[Dict]:
+    if path == '-':
+        for line in sys.stdin:
+            if line.strip():
+                yield json.loads(line)
+        return
+    yield from iter_json_file(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查證資料分片儲存')
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate = sub.add_parser('migrate', help='把 raw_*.json 搬進分片')
+    migrate.add_argument('--remove', action='store_true', help='搬移後刪除原檔')
+    append = sub.add_parser('append', help='附加 raw_*.json 或 JSON Lines（- 為 stdin）')
+    append.add_argument('files', nargs='+')
+    sub.add_parser('stats', help='顯示各分區筆數')
+    sub.add_parser('rebuild-manifest', help='依分片檔重建 manifest')
+    args = parser.parse_args()
+
+    store = get_shard_store()
+    if args.command == 'migrate':
+        print(f"🎉 搬移完成：{migrate_raw_files(store, SHARDS_DIR.parent, args.remove)}")
+    elif args.command == 'append':
+        for path in args.files:
+            crawled_at = raw_file_timestamp(path) if path != '-' else None
+            print(f"✅ {path}: 附加 {store.append(_iter_input(path), crawled_at=crawled_at)} 則")
+    elif args.command == 'rebuild-manifest':
+        store.rebuild_manifest()
+        print(f"✅ manifest 已重建：{len(store.partitions())} 個分區")
+    else:
+        for partition, records in store.stats().items():
+            print(f"{partition}: {records}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+可信度評分
+集中原本分散在三處的規則，新聞分析腳本、/api/analyze-news、影像分析與文章重新評分共用：
+- 內容可信度（analyze_news.analyze_content）：網域可信度減去情緒化詞彙扣分，1～5 分
+- 網頁可疑程度（/api/analyze-news）：驚嘆號、大寫字母比例、疑似釣魚詞彙
+- 影像品質（image_analysis.analyze_image）：Laplacian 變異數與直方圖熵
+
+批次介面一次計算多份文件的特徵：
+- 長度、大寫字母數、驚嘆號數：整批轉成 UTF-32 碼位後以 NumPy 查表計算，不逐字元呼叫 isupper()
+- 情緒化與釣魚詞彙：共用的 KeywordMatcher 每份文件只掃描一次
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from news_keywords import GROUP_BAIT, GROUP_EMOTION, keyword_count, scan
+
+# 網域可信度評分（未列出的網域為 DEFAULT_DOMAIN_SCORE）
+DOMAIN_CREDIBILITY = {
+    'cna.com.tw': 5.0, 'udn.com': 4.5, 'setn.com': 3.0,
+    'facebook.com': 2.5, 'ptt.cc': 2.0
+}
+DEFAULT_DOMAIN_SCORE = 3.0
+
+# 每次轉成碼位陣列的字元數上限，避免大批文件一次佔用過多記憶體
+CHUNK_CHARS = 4 * 1024 * 1024
+
+# 基本多文種平面（BMP）字元是否為大寫的查表，與 str.isupper() 相同
+_UPPER_BMP = np.array([chr(i).isupper() for i in range(0x10000)], dtype=bool)
+_EXCLAMATIONS = (ord('!'), ord('！'))
+
+
+# ---------------------------------------------------------
+# 特徵計算
+# ---------------------------------------------------------
+def _char_counts(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """回傳每份文字的 (大寫字母數, 驚嘆號數)"""
+    upper = np.zeros(len(texts), dtype=np.int64)
+    exclam = np.zeros(len(texts), dtype=np.int64)
+    start = 0
+    while start < len(texts):
+        # 把多份文字串接成一個碼位陣列，一次計算整批
+        end, total = start, 0
+        while end < len(texts) and (end == start or total + len(texts[end]) <= CHUNK_CHARS):
+            total += len(texts[end])
+            end += 1
+        codes = np.frombuffer(''.join(texts[start:end]).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+
+        is_upper = _UPPER_BMP[np.minimum(codes, 0xFFFF)]
+        astral = codes[codes > 0xFFFF]
+        if astral.size:
+            # BMP 以外的大寫字母（數學字母符號等）很少見，只檢查實際出現的碼位
+            upper_astral = [c for c in np.unique(astral).tolist() if chr(c).isupper()]
+            if upper_astral:
+                is_upper |= np.isin(codes, upper_astral)
+        is_exclam = (codes == _EXCLAMATIONS[0]) | (codes == _EXCLAMATIONS[1])
+
+        # 命中位置遠少於字元數：以二分搜尋各份文字的邊界，取得每份的命中數
+        bounds = np.cumsum([0] + [len(t) for t in texts[start:end]])
+        for counts, mask in ((upper, is_upper), (exclam, is_exclam)):
+            positions = np.searchsorted(np.flatnonzero(mask), bounds)
+            counts[start:end] = positions[1:] - positions[:-1]
+        start = end
+    return upper, exclam
+
+
+def extract_features(texts: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    批次計算文字特徵，回傳各欄位為與 texts 等長的陣列：
+    length、uppercase、exclamations、emotion_hits（不重複的情緒化詞彙數）、bait_hits（不重複的釣魚詞彙數）
+    """
+    texts = [t or '' for t in texts]
+    upper, exclam = _char_counts(texts)
+    emotion = np.zeros(len(texts), dtype=np.int64)
+    bait = np.zeros(len(texts), dtype=np.int64)
+    for i, text in enumerate(texts):
+        hits = scan(text, (GROUP_EMOTION, GROUP_BAIT))
+        emotion[i] = keyword_count(hits, GROUP_EMOTION)
+        bait[i] = keyword_count(hits, GROUP_BAIT)
+    return {
+        'length': np.array([len(t) for t in texts], dtype=np.int64),
+        'uppercase': upper,
+        'exclamations': exclam,
+        'emotion_hits': emotion,
+        'bait_hits': bait,
+    }
+
+
+# ---------------------------------------------------------
+# 內容可信度（新聞分析腳本、文章重新評分）
+# ---------------------------------------------------------
+def domain_score(domain: Optional[str]) -> float:
+    return DOMAIN_CREDIBILITY.get(domain or '', DEFAULT_DOMAIN_SCORE)
+
+
+def credibility_level(confidence_score: float) -> str:
+    if confidence_score >= 0.8:
+        return "高度可信"
+    if confidence_score >= 0.6:
+        return "中度可信"
+    if confidence_score >= 0.4:
+        return "中度可疑"
+    return "高度可疑"
+
+
+def score_content_batch(items: Sequence[Tuple[Optional[str], str]]) -> List[Dict]:
+    """
+    批次計算內容可信度，items 為 [(網域, 內文)]
+    final_score 為 1～5 分（與 articles.reliability_score 同一尺度），confidence_score 為其 0～1 正規化
+    """
+    if not items:
+        return []
+    features = extract_features([content for _, content in items])
+    lengths = features['length']
+    base = np.array([domain_score(domain) for domain, _ in items])
+
+    # 每 100 字的情緒化詞彙數
+    emotion_ratio = np.divide(features['emotion_hits'], lengths / 100,
+                              out=np.zeros(len(items)), where=lengths > 0)
+    emotion_penalty = np.minimum(emotion_ratio * 0.5, 2.0)
+    final_score = np.maximum(1.0, base - emotion_penalty)
+    confidence = np.minimum(1.0, final_score / 5.0)
+
+    results = []
+    for i in range(len(items)):
+        results.append({
+            'confidence_score': round(float(confidence[i]), 3),
+            'credibility_level': credibility_level(float(confidence[i])),
+            'domain_score': float(base[i]),
+            'emotion_ratio': round(float(emotion_ratio[i]), 2),
+            'final_score': round(float(final_score[i]), 2),
+        })
+    return results
+
+
+def score_content(domain: Optional[str], content: str) -> Dict:
+    return score_content_batch([(domain, content)])[0]
+
+
+# ---------------------------------------------------------
+# 網頁可疑程度（/api/analyze-news）
+# ---------------------------------------------------------
+def page_verdict(score: float) -> str:
+    return '可疑' if score > 0.6 else ('需留意' if score > 0.4 else '正常')
+
+
+def score_page_batch(htmls: Sequence[str]) -> List[Dict]:
+    """批次計算網頁原始碼的可疑程度：驚嘆號、大寫字母比例、疑似釣魚詞彙"""
+    if not htmls:
+        return []
+    features = extract_features(htmls)
+    lengths = features['length']
+    upper_ratio = features['uppercase'] / np.maximum(1, lengths)
+    score = np.minimum(1.0, (features['exclamations'] / 30.0) * 0.4 + upper_ratio * 0.3
+                       + (features['bait_hits'] / 10.0) * 0.3)
+
+    results = []
+    for i in range(len(htmls)):
+        suspicion = round(float(score[i]), 3)
+        results.append({
+            'length': int(lengths[i]),
+            'exclamationCount': int(features['exclamations'][i]),
+            'uppercaseRatio': round(float(upper_ratio[i]), 4),
+            'keywordHits': int(features['bait_hits'][i]),
+            'suspicionScore': suspicion,
+            'verdict': page_verdict(float(score[i])),
+        })
+    return results
+
+
+def score_page(html: str) -> Dict:
+    return score_page_batch([html])[0]
+
+
+# ---------------------------------------------------------
+# 影像品質（image_analysis）
+# ---------------------------------------------------------
+def image_quality(variance_laplacian: float, entropy: float) -> Tuple[float, str]:
+    """粗略品質分數（0～1）與等級"""
+    score = min(1.0, (variance_laplacian / 300.0) * 0.6 + (entropy / 6.0) * 0.4)
+    level = "高品質" if score > 0.75 else ("中等" if score > 0.5 else "可疑/低品質")
+    return score, level
@@ -2,16 +2,50 @@
 """
 每天自動執行爬蟲腳本，無需手動觸發。
 可用於 Flask 啟動時由後台 Thread 啟動，或由主程式調用。
+
+排程方式：
+- 所有關鍵字交給有上限的執行緒池同時爬取，整體耗時約等於最慢的單一關鍵字
+- 每個資料來源一個 token bucket 限制啟動頻率（取代關鍵字之間固定暫停 2 秒）
+- 失敗或逾時以指數退避（含隨機抖動）重試
+- 每個關鍵字的狀態、耗時與最後成功時間寫入狀態檔；重新啟動後當天已完成的關鍵字不會重新爬取
+
+執行方式（Config.CRAWL_MODE）：
+- inprocess：匯入 scraper.py 一次，在工作執行緒中直接呼叫其 crawl()，
+  省去每個關鍵字重新啟動直譯器、匯入套件與建立連線的時間
+- subprocess：每個關鍵字啟動獨立的 scraper.py 行程（隔離爬蟲的崩潰與記憶體問題）
+- auto（預設）：scraper.py 提供 crawl() 時使用 inprocess，否則使用 subprocess
+兩種方式的輸出都逐行轉印（加上關鍵字前綴），不會整批暫存在記憶體。
+行程內執行時若 crawl() 回傳（或逐一 yield）爬到的條目，條目會附加到查證資料分片（crawl_shards）；
+子行程執行時則讀取該次寫出的 raw_*.json。排程器設有 ingestor 時，兩種方式的條目都交給
+crawl_ingest.CrawlIngestor 分批寫入資料庫，數秒內即可被搜尋。
 """
+import importlib.util
+import json
+import os
+import random
 import threading
 import time
 import subprocess
 import sys
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from crawl_ingest import CrawlIngestor
+from crawl_shards import get_shard_store
+from json_stream import iter_json_file
 
 # 爬蟲腳本與 Python 執行檔路徑
 SCRAPER_PATH = Path(__file__).parent.parent / 'projectt' / 'scraper.py'
+# 爬蟲輸出 raw_*.json 的資料夾
+REPORTS_DIR = SCRAPER_PATH.parent / 'reports'
 
 # 使用當前 Python 執行檔（更可靠）
 PYTHON_EXE = sys.executable
@@ -25,71 +59,405 @@ DEFAULT_KEYWORDS = [
 
 MAX_RESULTS = 30
 
-_last_run = None
+# 目前所有關鍵字都由 scraper.py 爬取，共用同一個來源的頻率限制
+SOURCE_SCRAPER = 'scraper'
+
+# 每小時檢查一次是否有當天尚未完成的關鍵字
+CHECK_INTERVAL = 3600
+
+# 行程內執行的介面：scraper.py 提供
+#   crawl(query: str, max_results: int, session: requests.Session, log: Callable[[str], None])
+# 拋出例外即視為失敗；可回傳（或 yield）爬到的條目 dict，由排程器寫入查證資料分片與資料庫
+# （此時 crawl() 不需要再自行寫出 raw_*.json）。
+# 檔案路徑請以 __file__ 為基準（行程內執行時工作目錄不是 projectt）。
+SCRAPER_ENTRY = 'crawl'
+# 子行程執行時，以此環境變數傳入本次工作專用的輸出路徑（raw_YYYYMMDD_HHMMSS_<工作代碼>.json）。
+# 多個 scraper.py 同時執行，只以秒為單位命名的 raw_*.json 會在同一秒完成時互相覆蓋，
+# 爬蟲應優先寫入此路徑。
+OUTPUT_ENV = 'CRAWL_OUTPUT'
+# 失敗時錯誤訊息保留的最後輸出行數
+TAIL_LINES = 20
+
+_scraper_entry: Optional[Callable] = None
+_scraper_loaded = False
+_scraper_lock = threading.Lock()
+
+
+def load_scraper_entry() -> Optional[Callable]:
+    """匯入 scraper.py（只匯入一次）並回傳其 crawl()；沒有此函式或匯入失敗時回傳 None"""
+    global _scraper_entry, _scraper_loaded
+    with _scraper_lock:
+        if not _scraper_loaded:
+            _scraper_loaded = True
+            try:
+                # scraper.py 以同目錄的模組為相依，匯入前先加入搜尋路徑
+                if str(SCRAPER_PATH.parent) not in sys.path:
+                    sys.path.insert(0, str(SCRAPER_PATH.parent))
+                spec = importlib.util.spec_from_file_location('scraper', SCRAPER_PATH)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                entry = getattr(module, SCRAPER_ENTRY, None)
+                _scraper_entry = entry if callable(entry) else None
+            except Exception as e:
+                print(f"[定時爬蟲] ⚠️ 無法匯入爬蟲腳本，改用子行程執行: {e}")
+        return _scraper_entry
+
+
+class IngestError(Exception):
+    """爬取成功但條目寫入資料庫失敗（不需重新爬取）"""
+
+
+class TokenBucket:
+    """權杖桶：平均每秒 rate 次，最多可連續 burst 次（執行緒安全）"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一個權杖，不足時等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class CrawlScheduler:
+    """同時爬取多個關鍵字，並把每個關鍵字的執行狀態保存在 state_path"""
+
+    def __init__(self, keywords: List[str], state_path: Path, workers: int = Config.CRAWL_WORKERS,
+                 timeout: float = Config.CRAWL_TIMEOUT_SECONDS, max_attempts: int = Config.CRAWL_MAX_ATTEMPTS,
+                 backoff: float = Config.CRAWL_BACKOFF_SECONDS):
+        self.keywords = list(keywords)
+        self.state_path = Path(state_path)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._running = False
+        self._state = self._load_state()
+        # 設定後，爬到的條目直接寫入資料庫
+        self.ingestor: Optional[CrawlIngestor] = None
+        # 已交給 ingestor 的 raw_*.json（爬蟲未使用 CRAWL_OUTPUT 時避免重複讀取）
+        self._ingested_files = set()
+
+    # ------------------------------------------------------------------
+    # 對外介面
+    # ------------------------------------------------------------------
+    def pending_keywords(self, today=None) -> List[str]:
+        """當天尚未成功爬取的關鍵字"""
+        today = (today or datetime.now()).date().isoformat()
+        with self._lock:
+            done = {kw for kw, s in self._state['keywords'].items()
+                    if (s.get('last_success') or '')[:10] == today}
+        return [kw for kw in self.keywords if kw not in done]
+
+    def run(self, keywords: Optional[List[str]] = None) -> Dict:
+        """爬取指定（預設為當天尚未完成的）關鍵字，回傳本次執行摘要"""
+        keywords = self.pending_keywords() if keywords is None else list(keywords)
+        started = datetime.now()
+        start = time.monotonic()
+        print(f"\n[定時爬蟲] {started:%Y-%m-%d %H:%M:%S} 開始爬取 {len(keywords)} 個關鍵字"
+              f"（同時 {min(self.workers, len(keywords) or 1)} 個）...")
+
+        results = {}
+        with self._lock:
+            self._running = True
+        try:
+            if keywords:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(keywords)),
+                                        thread_name_prefix='crawler') as executor:
+                    for keyword, ok in zip(keywords, executor.map(self._crawl_keyword, keywords)):
+                        results[keyword] = ok
+        finally:
+            with self._lock:
+                self._running = False
+            if self.ingestor is not None:
+                try:
+                    self.ingestor.flush()
+                except Exception:
+                    # 失敗訊息已由 flush 印出，條目保留待下一次寫入
+                    pass
+
+        summary = {
+            'started_at': started.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'duration': round(time.monotonic() - start, 1),
+            'success': sum(1 for ok in results.values() if ok),
+            'failed': sum(1 for ok in results.values() if not ok),
+        }
+        with self._lock:
+            self._state['last_run'] = summary
+            self._save_state()
+        print(f"\n[定時爬蟲] 本次爬蟲執行完畢！成功: {summary['success']}, 失敗: {summary['failed']}，"
+              f"耗時 {summary['duration']} 秒")
+        return summary
+
+    def status(self) -> Dict:
+        """最近一次執行摘要與每個關鍵字的狀態（含耗時）"""
+        with self._lock:
+            if not self._running:
+                # 爬蟲可能在其他行程執行，未在本行程執行時以狀態檔為準
+                self._state = self._load_state()
+            return json.loads(json.dumps(self._state))
+
+    # ------------------------------------------------------------------
+    # 單一關鍵字
+    # ------------------------------------------------------------------
+    def _bucket(self, source: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(source)
+            if bucket is None:
+                bucket = self._buckets[source] = TokenBucket(Config.CRAWL_RATE_PER_SECOND, Config.CRAWL_BURST)
+            return bucket
+
+    def _crawl_keyword(self, keyword: str, source: str = SOURCE_SCRAPER) -> bool:
+        start = time.monotonic()
+        error = None
+        attempts = 0
+        for attempt in range(1, self.max_attempts + 1):
+            attempts = attempt
+            self._bucket(source).acquire()
+            print(f"[定時爬蟲] 正在爬取關鍵字: {keyword}（第 {attempt} 次）")
+            try:
+                ok, error = self._run_scraper(keyword)
+            except IngestError as e:
+                # 爬取已成功並寫入分片，只有資料庫寫入失敗：條目保留在 ingestor 待下次寫入，
+                # 重新爬取只會重複寫入分片，因此不重試
+                ok, error = False, str(e)
+                break
+            if ok:
+                break
+            if attempt < self.max_attempts:
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(1.0, 1.5)
+                print(f"[定時爬蟲] ⚠️ 失敗: {keyword}，{delay:.0f} 秒後重試（{error}）")
+                time.sleep(delay)
+
+        duration = round(time.monotonic() - start, 1)
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            entry = self._state['keywords'].setdefault(keyword, {})
+            entry.update({
+                'status': 'ok' if ok else 'failed',
+                'last_attempt': now,
+                'duration': duration,
+                'attempts': attempts,
+                'error': None if ok else error,
+            })
+            if ok:
+                entry['last_success'] = now
+            self._save_state()
+
+        if ok:
+            print(f"[定時爬蟲] ✅ 完成: {keyword}（{duration} 秒）")
+        else:
+            print(f"[定時爬蟲] ❌ 放棄: {keyword}（{attempts} 次皆失敗）: {error}")
+        return ok
 
+    def _run_scraper(self, keyword: str) -> Tuple[bool, Optional[str]]:
+        """執行一次爬蟲，回傳 (是否成功, 錯誤訊息)"""
+        mode = (Config.CRAWL_MODE or 'auto').lower()
+        entry = load_scraper_entry() if mode != 'subprocess' else None
+        if entry is not None:
+            return self._run_inprocess(entry, keyword)
+        if mode == 'inprocess':
+            print(f"[定時爬蟲] ⚠️ 爬蟲腳本沒有 {SCRAPER_ENTRY}()，改用子行程執行")
+        return self._run_subprocess(keyword)
 
-def run_daily_crawler():
-    """每天執行一次爬蟲"""
-    global _last_run
-    
+    def _session(self) -> requests.Session:
+        """每個工作執行緒一個 Session，跨關鍵字重複使用連線"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=4)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    @staticmethod
+    def _logger(keyword: str, tail: deque) -> Callable[[str], None]:
+        def log(line: str):
+            line = str(line).rstrip('\n')
+            tail.append(line)
+            print(f"[爬蟲:{keyword}] {line}", flush=True)
+        return log
+
+    def _run_inprocess(self, entry: Callable, keyword: str) -> Tuple[bool, Optional[str]]:
+        # 行程內執行無法強制中斷，逾時由爬蟲自身的 HTTP timeout 控制
+        tail = deque(maxlen=TAIL_LINES)
+        try:
+            items = entry(keyword, MAX_RESULTS, session=self._session(), log=self._logger(keyword, tail))
+            if items is not None and not isinstance(items, (str, dict)):
+                items = list(items)
+                get_shard_store().append(items)
+            else:
+                items = None
+        except Exception as e:
+            return False, f'{type(e).__name__}: {e}'[:200]
+        if items:
+            self._ingest(items)
+        return True, None
+
+    def _ingest(self, items):
+        """把條目交給 ingestor；寫入失敗時拋出 IngestError（爬取本身已成功，不需重試）"""
+        if self.ingestor is None:
+            return
+        try:
+            self.ingestor.add_many(items)
+        except Exception as e:
+            raise IngestError(f'匯入資料庫失敗: {type(e).__name__}: {e}'[:200]) from e
+
+    def _claim_outputs(self, output: Path, started: float) -> List[Path]:
+        """
+        子行程寫出、尚未匯入的 raw_*.json：爬蟲寫入 CRAWL_OUTPUT 指定的路徑時只取該檔；
+        未支援時改取執行期間新增或更新的檔案（同時執行的工作先取得者匯入）
+        """
+        if output.exists():
+            candidates = [output]
+        else:
+            candidates = [p for p in REPORTS_DIR.glob('raw_*.json') if p.stat().st_mtime >= started]
+        with self._lock:
+            claimed = [p for p in sorted(candidates) if p.name not in self._ingested_files]
+            self._ingested_files.update(p.name for p in claimed)
+        return claimed
+
+    @staticmethod
+    def _output_path() -> Path:
+        """每個子行程工作專用的輸出檔名（加上工作代碼，同一秒開始的工作也不會重複）"""
+        return REPORTS_DIR / f"raw_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:8]}.json"
+
+    def _run_subprocess(self, keyword: str) -> Tuple[bool, Optional[str]]:
+        output = self._output_path()
+        # 檔案時間的精確度可能只到秒，往前取整避免漏掉剛開始就寫出的檔案
+        started = int(time.time())
+        try:
+            process = subprocess.Popen(
+                [PYTHON_EXE, str(SCRAPER_PATH), '--query', keyword, '--max-results', str(MAX_RESULTS)],
+                cwd=str(SCRAPER_PATH.parent),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                # 子行程不緩衝輸出，才能逐行轉印
+                env={**os.environ, 'PYTHONUNBUFFERED': '1', OUTPUT_ENV: str(output)},
+            )
+        except Exception as e:
+            return False, f'無法啟動爬蟲: {e}'
+
+        # 逐行讀取輸出；逾時由計時器結束子行程，讀取迴圈隨之結束
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(self.timeout, expire)
+        timer.start()
+        tail = deque(maxlen=TAIL_LINES)
+        log = self._logger(keyword, tail)
+        try:
+            for line in process.stdout:
+                log(line)
+            process.wait()
+        finally:
+            timer.cancel()
+            process.stdout.close()
+
+        if timed_out.is_set():
+            return False, f'超時 ({self.timeout:.0f}秒)'
+        if process.returncode != 0:
+            return False, ' | '.join(list(tail)[-3:])[:200] or f'結束代碼 {process.returncode}'
+        if self.ingestor is not None:
+            for path in self._claim_outputs(output, started):
+                self._ingest(iter_json_file(path))
+        return True, None
+
+    # ------------------------------------------------------------------
+    # 狀態檔
+    # ------------------------------------------------------------------
+    def _load_state(self) -> Dict:
+        try:
+            with self.state_path.open('r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+        state.setdefault('last_run', None)
+        state.setdefault('keywords', {})
+        return state
+
+    def _save_state(self):
+        # 呼叫端需持有 self._lock
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_path.with_suffix('.tmp')
+            with tmp.open('w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            print(f"[定時爬蟲] ⚠️ 狀態檔寫入失敗: {e}")
+
+
+_scheduler: Optional[CrawlScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> CrawlScheduler:
+    """取得行程內共用的爬蟲排程器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CrawlScheduler(DEFAULT_KEYWORDS, Path(Config.CRAWL_STATE_PATH))
+        return _scheduler
+
+
+def get_crawl_status() -> Dict:
+    return get_scheduler().status()
+
+
+def run_daily_crawler(engine=None):
+    """每天執行一次爬蟲（當天失敗的關鍵字會在下次檢查時重試）；指定 engine 時爬到的條目直接寫入資料庫"""
     print(f"[定時爬蟲] 已啟動，Python 路徑: {PYTHON_EXE}")
     print(f"[定時爬蟲] 爬蟲腳本: {SCRAPER_PATH}")
-    
+
     # 檢查路徑是否存在
     if not SCRAPER_PATH.exists():
         print(f"[定時爬蟲] ❌ 錯誤：爬蟲腳本不存在 {SCRAPER_PATH}")
         return
-    
+
+    scheduler = get_scheduler()
+    if engine is not None:
+        scheduler.ingestor = CrawlIngestor(engine)
     while True:
-        now = datetime.now()
-        # 若今天尚未執行過
-        if not _last_run or _last_run.date() != now.date():
-            print(f"\n[定時爬蟲] {now:%Y-%m-%d %H:%M:%S} 開始執行每日爬蟲...")
-            success_count = 0
-            fail_count = 0
-            
-            for keyword in DEFAULT_KEYWORDS[:10]:
-                try:
-                    print(f"[定時爬蟲] 正在爬取關鍵字: {keyword}")
-                    
-                    # 增加超時時間到 120 秒，因為爬蟲需要呼叫外部 API
-                    process = subprocess.Popen(
-                        [PYTHON_EXE, str(SCRAPER_PATH), '--query', keyword, '--max-results', str(MAX_RESULTS)],
-                        cwd=str(SCRAPER_PATH.parent),
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True
-                    )
-                    
-                    try:
-                        stdout, stderr = process.communicate(timeout=120)
-                        if process.returncode == 0:
-                            print(f"[定時爬蟲] ✅ 完成: {keyword}")
-                            success_count += 1
-                        else:
-                            print(f"[定時爬蟲] ⚠️ 失敗: {keyword}")
-                            if stderr:
-                                print(f"[定時爬蟲]    錯誤訊息: {stderr[:200]}")
-                            fail_count += 1
-                    except subprocess.TimeoutExpired:
-                        process.kill()
-                        print(f"[定時爬蟲] ⏱️ 超時 (120秒): {keyword}")
-                        fail_count += 1
-                        
-                except Exception as e:
-                    print(f"[定時爬蟲] ❌ 例外錯誤: {keyword}: {e}")
-                    fail_count += 1
-                
-                # 每個關鍵字之間暫停 2 秒，避免 API 請求過於頻繁
-                time.sleep(2)
-            
-            _last_run = now
-            print(f"\n[定時爬蟲] 本日爬蟲執行完畢！成功: {success_count}, 失敗: {fail_count}")
-            print(f"[定時爬蟲] 下次執行時間: {(now + timedelta(days=1)).strftime('%Y-%m-%d')}")
-        
-        # 每小時檢查一次是否需要執行
-        time.sleep(3600)
-
-def start_daily_crawler_thread():
-    t = threading.Thread(target=run_daily_crawler, daemon=True)
+        if scheduler.pending_keywords():
+            scheduler.run()
+            print(f"[定時爬蟲] 下次執行時間: {(datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')}")
+
+        time.sleep(CHECK_INTERVAL)
+
+def start_daily_crawler_thread(engine=None):
+    t = threading.Thread(target=run_daily_crawler, args=(engine,), daemon=True)
     t.start()
+
+
+if __name__ == '__main__':
+    # 手動執行一次：python daily_crawler.py [關鍵字 ...]（未指定時爬取當天尚未完成的關鍵字）
+    from app import create_app
+    from models import db
+
+    with create_app().app_context():
+        scheduler = get_scheduler()
+        scheduler.ingestor = CrawlIngestor(db.engine)
+        scheduler.run(sys.argv[1:] or None)
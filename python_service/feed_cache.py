@@ -0,0 +1,103 @@
+"""
+首頁文章列表（熱門、排行、推薦）的快取
+列表結果依名稱快取 TTL 秒；文章經 ORM 新增、更新或刪除並 commit 後立即失效，
+以原生 SQL 批次寫入文章（重新評分、爬蟲匯入）的程式需自行呼叫 invalidate_article_feeds()。
+TTL 同時限制了多個 worker 行程之間的資料落差。
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from config import Config
+from models import Article
+
+
+class FeedCache:
+    """以名稱為鍵的 TTL 快取；同一名稱同時只會有一個請求查詢資料庫"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        # 每次失效遞增；查詢期間若發生失效，結果不寫入快取
+        self._generation = 0
+
+    def _fresh(self, name: str) -> Optional[Tuple[Any, float]]:
+        entry = self._entries.get(name)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl:
+            return entry
+        return None
+
+    def get(self, name: str, loader: Callable[[], Any]) -> Any:
+        """回傳快取內容，過期或不存在時呼叫 loader() 重新產生"""
+        entry = self._fresh(name)
+        if entry is not None:
+            return entry[0]
+        with self._lock:
+            load_lock = self._loading.setdefault(name, threading.Lock())
+        with load_lock:
+            entry = self._fresh(name)
+            if entry is not None:
+                return entry[0]
+            generation = self._generation
+            value = loader()
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[name] = (value, time.monotonic())
+            return value
+
+    def age(self, name: str) -> Optional[int]:
+        """快取內容已存在的秒數；尚未快取時回傳 None"""
+        entry = self._entries.get(name)
+        if entry is None:
+            return None
+        return int(time.monotonic() - entry[1])
+
+    def invalidate(self, name: Optional[str] = None):
+        """清除指定名稱（或全部）的快取"""
+        with self._lock:
+            self._generation += 1
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+
+_cache = FeedCache(Config.FEED_CACHE_TTL_SECONDS)
+
+
+def get_feed_cache() -> FeedCache:
+    """取得行程內共用的文章列表快取"""
+    return _cache
+
+
+def invalidate_article_feeds():
+    """文章內容或可信度變動後呼叫，清除所有文章列表快取"""
+    _cache.invalidate()
+
+
+# ORM 變更文章時先標記，commit 成功後才清除快取（避免其他請求在 commit 前重新讀到舊資料）
+@event.listens_for(Article, 'after_insert')
+@event.listens_for(Article, 'after_update')
+@event.listens_for(Article, 'after_delete')
+def _mark_articles_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        invalidate_article_feeds()
+    else:
+        session.info['articles_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('articles_changed', False):
+        invalidate_article_feeds()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_after_rollback(session, previous_transaction):
+    session.info.pop('articles_changed', None)
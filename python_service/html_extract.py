@@ -0,0 +1,233 @@
+"""
+新聞網頁的標題與主文擷取
+原本以 BeautifulSoup（純 Python 的 html.parser）解析整頁，再對五個選擇器各自呼叫 get_text，
+大型新聞頁面上這一步最慢。這裡提供可替換的解析後端：
+- selectolax（Lexbor，C 實作）：移除 script/style 後以原生 CSS 查詢取得候選區塊
+- lxml：一次走訪整棵樹，同時記錄每個候選區塊與 body 的文字範圍，不重複走訪子樹
+- bs4：沒有安裝上述套件時的後備（與舊版相同的實作）
+
+三種後端的輸出規則與舊版相同：
+- 標題取第一個 <title> 的文字（去除前後空白），沒有時為「未偵測到標題」
+- 依 CONTENT_SELECTORS 的順序，取第一個去除空白後文字超過 MIN_CONTENT_CHARS 字的區塊，
+  否則使用整個 body
+- 文字為各文字節點去除前後空白、略過空字串後以換行連接；不含 script / style / template 與註解
+唯一差異：沒有 <body> 標籤的片段，html.parser 找不到 body 而回傳空字串，
+lxml / selectolax 依 HTML 規範補上 body，會回傳片段的文字。
+"""
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import Config
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+from bs4 import BeautifulSoup
+
+# 依優先順序嘗試的主文區塊選擇器
+CONTENT_SELECTORS = ('article', 'div[itemprop="articleBody"]', 'div.article-content', 'div.entry-content', 'div#main-content')
+# 區塊文字（去除空白後）需超過此字數才採用
+MIN_CONTENT_CHARS = 200
+NO_TITLE = '未偵測到標題'
+# 文字不列入主文的元素
+SKIP_TAGS = ('script', 'style', 'template')
+
+
+class Extraction:
+    """擷取結果"""
+
+    def __init__(self, title: str, text: str, selector: Optional[str], backend: str, elapsed_ms: float):
+        self.title = title
+        self.text = text
+        # 採用的選擇器；使用整個 body 時為 'body'，沒有內容時為 None
+        self.selector = selector
+        self.backend = backend
+        self.elapsed_ms = elapsed_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            'backend': self.backend,
+            'selector': self.selector,
+            'elapsed_ms': round(self.elapsed_ms, 1),
+        }
+
+
+def _pick(candidates: List[Tuple[str, List[str]]], body: Optional[List[str]]) -> Tuple[str, Optional[str]]:
+    """依選擇器順序挑出主文；candidates 為 [(選擇器, 文字片段)]"""
+    for selector, parts in candidates:
+        if sum(len(p) for p in parts) > MIN_CONTENT_CHARS:
+            return '\n'.join(parts), selector
+    if body is not None:
+        return '\n'.join(body), 'body'
+    return '', None
+
+
+# ---------------------------------------------------------
+# lxml：單次走訪
+# ---------------------------------------------------------
+_SIMPLE_SELECTOR = re.compile(r'^(\w+)(?:\.([\w-]+)|#([\w-]+)|\[(\w+)="([^"]*)"\])?$')
+
+
+def _compile_selector(selector: str) -> Callable:
+    """把 CONTENT_SELECTORS 這類簡單選擇器（tag、tag.class、tag#id、tag[attr="v"]）轉成比對函式"""
+    m = _SIMPLE_SELECTOR.match(selector)
+    if not m:
+        raise ValueError(f'不支援的選擇器: {selector}')
+    tag, cls, id_, attr, value = m.groups()
+    if cls:
+        return lambda el: el.tag == tag and cls in (el.get('class') or '').split()
+    if id_:
+        return lambda el: el.tag == tag and el.get('id') == id_
+    if attr:
+        return lambda el: el.tag == tag and el.get(attr) == value
+    return lambda el: el.tag == tag
+
+
+_MATCHERS = [_compile_selector(s) for s in CONTENT_SELECTORS]
+
+
+def _extract_lxml(html: str) -> Tuple[str, str, Optional[str]]:
+    # 以 UTF-8 位元組交給 lxml，避免 <?xml encoding=...?> 宣告與 str 輸入衝突
+    parser = lxml.html.HTMLParser(encoding='utf-8')
+    root = lxml.html.document_fromstring(html.encode('utf-8', errors='replace'), parser=parser)
+
+    parts: List[str] = []
+    # 各選擇器第一個符合的元素，以及 body 的文字範圍 [起, 迄)（parts 的索引）
+    found: List[Optional[List[int]]] = [None] * len(_MATCHERS)
+    body: Optional[List[int]] = None
+    title = None
+
+    # 堆疊項目：元素＝進入節點；list＝離開節點（記錄範圍結尾）；str＝元素後的 tail 文字
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            item[1] = len(parts)
+            continue
+        if isinstance(item, str):
+            text = item.strip()
+            if text:
+                parts.append(text)
+            continue
+
+        el = item
+        if el.tail:
+            stack.append(el.tail)
+        if not isinstance(el.tag, str) or el.tag in SKIP_TAGS:
+            # 註解、處理指令與不列入主文的元素：只保留後面的 tail
+            continue
+
+        span = None
+        for i, match in enumerate(_MATCHERS):
+            if found[i] is None and match(el):
+                span = span or [len(parts), None]
+                found[i] = span
+        if body is None and el.tag == 'body':
+            span = body = span or [len(parts), None]
+        if title is None and el.tag == 'title':
+            title = el
+        if span is not None:
+            stack.append(span)
+
+        stack.extend(reversed(el))
+        if el.text:
+            text = el.text.strip()
+            if text:
+                parts.append(text)
+
+    candidates = [(s, parts[span[0]:span[1]]) for s, span in zip(CONTENT_SELECTORS, found) if span is not None]
+    main_text, selector = _pick(candidates, parts[body[0]:body[1]] if body else None)
+    # 與 bs4 的 .string 相同：<title> 只有單一文字內容時才採用
+    title_text = title.text.strip() if title is not None and title.text and len(title) == 0 else NO_TITLE
+    return title_text, main_text, selector
+
+
+# ---------------------------------------------------------
+# selectolax：原生 CSS 查詢
+# ---------------------------------------------------------
+def _node_parts(node) -> List[str]:
+    # Lexbor 的 strip=True 會保留空字串，以 \x00 分隔後自行略過
+    return [p for p in node.text(separator='\x00', strip=True).split('\x00') if p]
+
+
+def _extract_selectolax(html: str) -> Tuple[str, str, Optional[str]]:
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(list(SKIP_TAGS))
+
+    candidates = []
+    for selector in CONTENT_SELECTORS:
+        node = tree.css_first(selector)
+        if node is not None:
+            parts = _node_parts(node)
+            candidates.append((selector, parts))
+            if sum(len(p) for p in parts) > MIN_CONTENT_CHARS:
+                break
+    main_text, selector = _pick(candidates, _node_parts(tree.body) if tree.body is not None else None)
+
+    title = tree.css_first('title')
+    title_text = title.text(deep=True) if title is not None else ''
+    return (title_text.strip() if title_text else NO_TITLE), main_text, selector
+
+
+# ---------------------------------------------------------
+# bs4：後備實作
+# ---------------------------------------------------------
+def _extract_bs4(html: str) -> Tuple[str, str, Optional[str]]:
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.string.strip() if soup.title and soup.title.string else NO_TITLE
+    for tag in soup(SKIP_TAGS):
+        tag.decompose()
+
+    for selector in CONTENT_SELECTORS:
+        article_body = soup.select_one(selector)
+        if article_body and len(article_body.get_text(strip=True)) > MIN_CONTENT_CHARS:
+            return title, article_body.get_text(separator='\n', strip=True), selector
+
+    if soup.body:
+        return title, soup.body.get_text(separator='\n', strip=True), 'body'
+    return title, '', None
+
+
+_BACKENDS: Dict[str, Callable] = {'bs4': _extract_bs4}
+if lxml is not None:
+    _BACKENDS['lxml'] = _extract_lxml
+if LexborHTMLParser is not None:
+    _BACKENDS['selectolax'] = _extract_selectolax
+
+
+def available_backends() -> List[str]:
+    return list(_BACKENDS)
+
+
+def default_backend() -> str:
+    """Config.HTML_EXTRACTOR 指定的後端；auto 或未安裝時依 selectolax → lxml → bs4 選擇"""
+    preferred = (Config.HTML_EXTRACTOR or 'auto').lower()
+    if preferred in _BACKENDS:
+        return preferred
+    for name in ('selectolax', 'lxml', 'bs4'):
+        if name in _BACKENDS:
+            return name
+    return 'bs4'
+
+
+def extract_article(html: str, backend: Optional[str] = None) -> Extraction:
+    """擷取網頁標題與主文；指定的後端失敗時改用 bs4"""
+    backend = backend if backend in _BACKENDS else default_backend()
+    start = time.perf_counter()
+    try:
+        title, text, selector = _BACKENDS[backend](html)
+    except Exception as e:
+        if backend == 'bs4':
+            raise
+        print(f"⚠️ {backend} 擷取失敗，改用 bs4: {e}")
+        backend = 'bs4'
+        title, text, selector = _extract_bs4(html)
+    return Extraction(title, text, selector, backend, (time.perf_counter() - start) * 1000)
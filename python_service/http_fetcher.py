@@ -0,0 +1,244 @@
+"""
+共用的對外 HTTP 抓取元件
+圖片分析、新聞分析與 RSS 更新都經由這裡抓取網址：
+- 每個主機一個 requests.Session（連線池重複使用 TCP / TLS 連線）
+- 串流讀取：Content-Length 或實際讀取量超過上限即中止，不會整個下載超大檔案
+- 可限定 Content-Type（例如只接受 image/*），在讀取本文之前就拒絕
+- 每個主機的同時請求數上限，避免大量分析請求同時打同一個網站
+- 短時間的回應快取（只快取一般的 200 回應），同一網址在數十秒內重複分析不需重新下載
+"""
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import get_encoding_from_headers
+
+from config import Config
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (compatible; TruthLiesDetector/1.0)'
+READ_CHUNK_BYTES = 64 * 1024
+# 回應快取的總大小上限（位元組）
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+# 新聞分析可接受的 Content-Type
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+
+
+class FetchError(Exception):
+    """抓取失敗（連線錯誤、HTTP 錯誤狀態、逾時等）"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ResponseTooLarge(FetchError):
+    pass
+
+
+class UnexpectedContentType(FetchError):
+    pass
+
+
+class FetchResult:
+    """抓取結果（唯讀）"""
+
+    def __init__(self, url: str, status_code: int, headers: Mapping[str, str], content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self._apparent_encoding: Optional[str] = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status_code == 304
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+    @property
+    def apparent_encoding(self) -> str:
+        """依內容猜測的編碼（與 requests.Response.apparent_encoding 相同）"""
+        if self._apparent_encoding is None:
+            detected = requests.compat.chardet.detect(self.content) if requests.compat.chardet else None
+            self._apparent_encoding = (detected or {}).get('encoding') or 'utf-8'
+        return self._apparent_encoding
+
+    def text(self, apparent: bool = False) -> str:
+        """
+        解碼為字串：預設與 requests.Response.text 相同（優先使用標頭宣告的編碼），
+        apparent=True 時一律使用猜測的編碼（適用於標頭編碼常常錯誤的新聞網站）
+        """
+        encoding = None if apparent else get_encoding_from_headers(self.headers)
+        encoding = encoding or self.apparent_encoding
+        try:
+            return str(self.content, encoding, errors='replace')
+        except LookupError:
+            return str(self.content, 'utf-8', errors='replace')
+
+
+class HttpFetcher:
+    """依主機分組的連線池、同時請求上限與短期快取（執行緒安全）"""
+
+    def __init__(self, max_bytes: int, timeout: float, per_host_limit: int, cache_seconds: float,
+                 user_agent: str = DEFAULT_USER_AGENT, cache_max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.per_host_limit = per_host_limit
+        self.cache_seconds = cache_seconds
+        self.user_agent = user_agent
+        self.cache_max_bytes = cache_max_bytes
+        self._sessions: Dict[str, requests.Session] = {}
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._cache: 'OrderedDict[Tuple, Tuple[float, FetchResult]]' = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 對外介面
+    # ------------------------------------------------------------------
+    def fetch(self, url: str, headers: Optional[Mapping[str, str]] = None, max_bytes: Optional[int] = None,
+              accept: Optional[Iterable[str]] = None, timeout: Optional[float] = None,
+              use_cache: bool = True) -> FetchResult:
+        """
+        以 GET 抓取網址並回傳 FetchResult（304 也會回傳，由呼叫端判斷 not_modified）
+        max_bytes: 本文大小上限，超過時拋出 ResponseTooLarge
+        accept: 可接受的 Content-Type 前綴，例如 ('image/',)；不符時拋出 UnexpectedContentType
+        use_cache: 帶條件式標頭（If-None-Match 等）的請求不會使用快取
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        timeout = self.timeout if timeout is None else timeout
+        accept = tuple(a.lower() for a in accept) if accept else None
+        req_headers = {'User-Agent': self.user_agent}
+        req_headers.update(headers or {})
+        cacheable = use_cache and self.cache_seconds > 0 and not any(
+            h.lower().startswith('if-') for h in req_headers)
+        key = (url, tuple(sorted(req_headers.items())), max_bytes, accept)
+
+        if cacheable:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        if not host:
+            raise FetchError(f'無效的網址: {url}')
+        semaphore = self._semaphore(host)
+        if not semaphore.acquire(timeout=timeout):
+            raise FetchError(f'{host} 同時請求過多，請稍後再試')
+        try:
+            result = self._get(self._session(host), url, req_headers, max_bytes, accept, timeout)
+        finally:
+            semaphore.release()
+
+        if cacheable and result.status_code == 200:
+            self._cache_put(key, result)
+        return result
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+            self._cache_bytes = 0
+
+    # ------------------------------------------------------------------
+    # 內部實作
+    # ------------------------------------------------------------------
+    def _session(self, host: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.per_host_limit)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return semaphore
+
+    @staticmethod
+    def _get(session: requests.Session, url: str, headers: Dict[str, str], max_bytes: int,
+             accept: Optional[Tuple[str, ...]], timeout: float) -> FetchResult:
+        try:
+            resp = session.get(url, headers=headers, timeout=timeout, stream=True, allow_redirects=True)
+        except requests.RequestException as e:
+            raise FetchError(str(e))
+
+        with resp:
+            if resp.status_code == 304:
+                return FetchResult(resp.url, 304, resp.headers, b'')
+            if resp.status_code >= 400:
+                raise FetchError(f'HTTP {resp.status_code}: {resp.reason}', resp.status_code)
+
+            content_type = resp.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            # 未宣告 Content-Type 時不阻擋，交由後續解析判斷
+            if accept and content_type and not content_type.startswith(accept):
+                raise UnexpectedContentType(f'不支援的內容類型: {content_type}', resp.status_code)
+
+            declared = resp.headers.get('Content-Length')
+            if declared and declared.isdigit() and int(declared) > max_bytes:
+                raise ResponseTooLarge(f'回應大小 {declared} 位元組超過上限 {max_bytes}', resp.status_code)
+
+            # 逐段讀取；整體時間也受 timeout 限制（requests 的 timeout 只針對單次讀取）
+            deadline = time.monotonic() + timeout * 3
+            buf = bytearray()
+            try:
+                for chunk in resp.iter_content(READ_CHUNK_BYTES):
+                    buf += chunk
+                    if len(buf) > max_bytes:
+                        raise ResponseTooLarge(f'回應大小超過上限 {max_bytes} 位元組', resp.status_code)
+                    if time.monotonic() > deadline:
+                        raise FetchError('下載逾時', resp.status_code)
+            except requests.RequestException as e:
+                raise FetchError(str(e), resp.status_code)
+            return FetchResult(resp.url, resp.status_code, resp.headers, bytes(buf))
+
+    def _cache_get(self, key) -> Optional[FetchResult]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            expires, result = entry
+            if time.monotonic() >= expires:
+                del self._cache[key]
+                self._cache_bytes -= len(result.content)
+                return None
+            self._cache.move_to_end(key)
+            return result
+
+    def _cache_put(self, key, result: FetchResult):
+        size = len(result.content)
+        if size > self.cache_max_bytes // 4:
+            return
+        with self._lock:
+            old = self._cache.pop(key, None)
+            if old is not None:
+                self._cache_bytes -= len(old[1].content)
+            self._cache[key] = (time.monotonic() + self.cache_seconds, result)
+            self._cache_bytes += size
+            while self._cache_bytes > self.cache_max_bytes and self._cache:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted.content)
+
+
+_fetcher = HttpFetcher(
+    max_bytes=Config.FETCH_MAX_BYTES,
+    timeout=Config.FETCH_TIMEOUT_SECONDS,
+    per_host_limit=Config.FETCH_PER_HOST_LIMIT,
+    cache_seconds=Config.FETCH_CACHE_SECONDS,
+)
+
+
+def get_fetcher() -> HttpFetcher:
+    """取得行程內共用的 HttpFetcher"""
+    return _fetcher
@@ -0,0 +1,508 @@
+"""
+影像載入與品質分析
+- /analyze-image：單張圖片，於請求執行緒中分析
+- /analyze-images：多張圖片（URL 或 Base64），平行下載後分派到行程池解碼與分析，
+  依輸入順序回傳每張圖片的結果或錯誤
+- 兩者都先以圖片內容的 SHA-256 查詢 image_cache，命中時不經 OpenCV，回應中標示 hit / miss
+- 分析結果含 pHash / dHash，並以 image_hash 索引回報先前看過的近似圖片（similar）
+- mode="fast" 時以縮小尺寸解碼（長邊不超過 IMAGE_ANALYSIS_MAX_EDGE）再分析，
+  指標換算為原尺寸估計值，結果的 resolution 欄位標示實際分析的解析度
+"""
+import base64
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from flask import request, jsonify
+
+from config import Config
+
+from credibility import image_quality
+from image_cache import ImageResultCache, get_image_cache, image_digest
+from image_hash import dhash, find_similar, phash, to_hex
+from http_fetcher import get_fetcher
+
+# 單次批次最多可送出的圖片數
+MAX_BATCH_IMAGES = 32
+# 行程池大小（預設為 CPU 核心數）
+POOL_WORKERS = os.cpu_count() or 1
+# 批次下載圖片的執行緒數
+IO_WORKERS = 8
+# 每張圖片分析的等待上限（秒）
+ITEM_TIMEOUT = 30
+# 以 URL 分析時可接受的 Content-Type（部分圖床以 octet-stream 回傳圖片）
+IMAGE_CONTENT_TYPES = ("image/", "application/octet-stream", "binary/octet-stream")
+# 未知長度的上傳本文每次讀取的位元組數
+UPLOAD_CHUNK_BYTES = 256 * 1024
+
+
+# ---------------------------------------------------------
+# 影像處理與品質分析函式區
+# ---------------------------------------------------------
+def fetch_url(url: str, cache: Optional[ImageResultCache] = None,
+              mode: str = "full") -> Tuple[Optional[bytes], Optional[str]]:
+    """
+    下載圖片，回傳 (原始位元組, SHA-256)
+    若先前記錄過此 URL 的 ETag，改以條件式請求；回應 304 且結果仍在快取時，
+    不需下載內容，回傳 (None, 既有的 SHA-256)
+    """
+    fetcher = get_fetcher()
+    fetch = partial(fetcher.fetch, url, max_bytes=Config.IMAGE_MAX_UPLOAD_BYTES, accept=IMAGE_CONTENT_TYPES)
+    alias = cache.url_alias(url) if cache is not None else None
+    if alias is not None:
+        etag, digest = alias
+        resp = fetch(headers={"If-None-Match": etag})
+        if resp.not_modified:
+            if cache.contains(cache_key(digest, mode)):
+                return None, digest
+            # 結果已被淘汰，需要重新下載
+            resp = fetch()
+    else:
+        resp = fetch()
+    raw = resp.content
+    digest = image_digest(raw)
+    etag = resp.headers.get("ETag")
+    if cache is not None and etag:
+        cache.set_url_alias(url, etag, digest)
+    return raw, digest
+
+
+def decode_base64(b64: str) -> Tuple[bytes, str]:
+    """Base64 字串轉為 (原始位元組, SHA-256)"""
+    raw = base64.b64decode(b64)
+    return raw, image_digest(raw)
+
+
+def image_size(raw: bytes) -> Optional[Tuple[int, int]]:
+    """不解碼，直接由 PNG / JPEG 檔頭讀取 (寬, 高)；其他格式回傳 None"""
+    if raw[:8] == b"\x89PNG\r\n\x1a\n" and len(raw) >= 24:
+        return int.from_bytes(raw[16:20], "big"), int.from_bytes(raw[20:24], "big")
+    if raw[:2] != b"\xff\xd8":
+        return None
+    pos = 2
+    n = len(raw)
+    while pos + 9 < n:
+        if raw[pos] != 0xFF:
+            pos += 1
+            continue
+        marker = raw[pos + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            pos += 1 if marker == 0xFF else 2
+            continue
+        length = int.from_bytes(raw[pos + 2:pos + 4], "big")
+        # SOF0~SOF15（不含 DHT、JPG、DAC）帶有影像尺寸
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            h = int.from_bytes(raw[pos + 5:pos + 7], "big")
+            w = int.from_bytes(raw[pos + 7:pos + 9], "big")
+            return w, h
+        pos += 2 + length
+    return None
+
+
+# IMREAD_REDUCED_*：JPEG 可在解碼時直接以 1/2、1/4、1/8 尺寸輸出，省下全尺寸解碼
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def decode_image(raw: bytes, max_edge: Optional[int] = None):
+    """
+    解碼圖片位元組，回傳 (影像, 原始 (寬, 高))，失敗回傳 (None, None)
+    max_edge: 長邊上限；以不小於上限的最大縮小倍率解碼，再以 INTER_AREA 縮到上限
+    """
+    try:
+        data = np.frombuffer(raw, dtype=np.uint8)
+        size = image_size(raw) if max_edge else None
+        flag = cv2.IMREAD_COLOR
+        if size is not None:
+            for factor, reduced in _REDUCED_FLAGS:
+                if max(size) / factor >= max_edge:
+                    flag = reduced
+                    break
+        img = cv2.imdecode(data, flag)
+        if img is None:
+            return None, None
+        if size is None:
+            size = (img.shape[1], img.shape[0])
+        longest = max(img.shape[:2])
+        if max_edge and longest > max_edge:
+            scale = max_edge / longest
+            img = cv2.resize(img, (max(1, round(img.shape[1] * scale)), max(1, round(img.shape[0] * scale))),
+                             interpolation=cv2.INTER_AREA)
+        return img, size
+    except Exception:
+        return None, None
+
+
+def _laplacian_variance(gray: np.ndarray) -> float:
+    # CV_32F 足以容納 uint8 的 Laplacian，記憶體為 CV_64F 的一半；變異數以 double 累計
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+    return float(std[0][0]) ** 2
+
+
+def _edge_ratio(gray: np.ndarray) -> float:
+    return float(cv2.Canny(gray, 100, 200).mean())
+
+
+def _extrapolate(value: float, half_value: float, scale: float, max_exponent: float) -> float:
+    """
+    由縮小圖（scale）與再縮一半的圖推估原尺寸的指標：
+    假設指標隨解析度呈冪次變化 v(s) ∝ s^-k，k 由兩個尺度的比值估計並限制在 [0, max_exponent]
+    """
+    if value <= 0 or half_value <= 0:
+        return value * scale ** max_exponent
+    k = min(max_exponent, max(0.0, float(np.log2(half_value / value))))
+    return value * scale ** k
+
+
+def analyze_image(img: np.ndarray, original_size: Optional[Tuple[int, int]] = None):
+    """
+    分析圖片清晰度與品質
+    original_size: 影像為縮小版時傳入原始 (寬, 高)，Laplacian 變異數與邊緣密度會校正為原尺寸的估計值
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    analyzed_size = (gray.shape[1], gray.shape[0])
+    scale = 1.0
+    if original_size and max(original_size) > max(analyzed_size):
+        scale = max(analyzed_size) / max(original_size)
+
+    variance_laplacian = _laplacian_variance(gray)
+
+    # 直方圖分散度
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).flatten()
+    hist_norm = hist / (hist.sum() + 1e-6)
+    entropy = float(-(hist_norm * np.log(hist_norm + 1e-9)).sum())
+
+    # 邊緣密度
+    edge_ratio = _edge_ratio(gray)
+
+    if scale < 1.0:
+        # 縮小後像素間的變化變大，需換算回原尺寸才能與完整模式的分數比較
+        half = cv2.resize(gray, (max(1, gray.shape[1] // 2), max(1, gray.shape[0] // 2)), interpolation=cv2.INTER_AREA)
+        variance_laplacian = _extrapolate(variance_laplacian, _laplacian_variance(half), scale, 4.0)
+        edge_ratio = _extrapolate(edge_ratio, _edge_ratio(half), scale, 2.0)
+
+    # 粗略品質分數
+    score, level = image_quality(variance_laplacian, entropy)
+
+    return {
+        "variance_laplacian": round(variance_laplacian, 3),
+        "entropy": round(entropy, 3),
+        "edge_ratio": round(edge_ratio, 3),
+        "quality_score": round(score, 3),
+        "quality_level": level,
+        # 感知雜湊：用於查詢重新編碼、縮放後的近似重複圖片
+        "phash": to_hex(phash(gray)),
+        "dhash": to_hex(dhash(gray)),
+        "resolution": {
+            "original": list(original_size or analyzed_size),
+            "analyzed": list(analyzed_size),
+            "calibrated": scale < 1.0,
+        },
+    }
+
+
+def analysis_mode(data: Dict) -> str:
+    """請求指定的分析模式（fast / full），未指定時使用設定值"""
+    mode = str(data.get("mode") or Config.IMAGE_ANALYSIS_MODE).lower()
+    return mode if mode in ("fast", "full") else "full"
+
+
+def cache_key(digest: str, mode: str) -> str:
+    """快取鍵：完整模式沿用內容雜湊，快速模式另加上長邊上限"""
+    return digest if mode == "full" else f"{digest}-fast{Config.IMAGE_ANALYSIS_MAX_EDGE}"
+
+
+def analyze_bytes(raw: bytes, mode: str = "full") -> Optional[Dict]:
+    """解碼並分析圖片位元組，無法解碼時回傳 None"""
+    max_edge = Config.IMAGE_ANALYSIS_MAX_EDGE if mode == "fast" else None
+    img, size = decode_image(raw, max_edge)
+    if img is None:
+        return None
+    result = analyze_image(img, size)
+    result["resolution"]["mode"] = mode
+    return result
+
+
+def resolve_source(source: Dict, cache: Optional[ImageResultCache] = None,
+                   mode: str = "full") -> Tuple[Optional[bytes], str]:
+    """依 {"url"} 或 {"imageBase64"} 取得 (原始位元組, SHA-256)；無法載入時拋出 ValueError"""
+    try:
+        if source.get("url"):
+            return fetch_url(source["url"], cache, mode)
+        if source.get("imageBase64"):
+            return decode_base64(source["imageBase64"])
+    except Exception:
+        pass
+    raise ValueError("無法載入圖片")
+
+
+def analyze_source(source: Dict, mode: str = "full") -> Tuple[Optional[Dict], str, str]:
+    """
+    於目前執行緒分析一張圖片（先查快取），回傳 (結果, "hit" | "miss", SHA-256)
+    無法載入時拋出 ValueError，無法解碼時結果為 None
+    """
+    cache = get_image_cache()
+    raw, digest = resolve_source(source, cache, mode)
+    result, status = analyze_raw(raw, digest, mode)
+    return result, status, digest
+
+
+def analyze_raw(raw: Optional[bytes], digest: str, mode: str = "full") -> Tuple[Optional[Dict], str]:
+    """以內容雜湊查快取，未命中才解碼分析，回傳 (結果, "hit" | "miss")"""
+    cache = get_image_cache()
+    key = cache_key(digest, mode)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, "hit"
+    result = analyze_bytes(raw, mode) if raw is not None else None
+    if result is not None:
+        cache.put(key, result)
+    return result, "miss"
+
+
+# ---------------------------------------------------------
+# 二進位上傳（multipart/form-data、application/octet-stream）
+# ---------------------------------------------------------
+class UploadTooLarge(ValueError):
+    pass
+
+
+def _read_stream(stream, length: Optional[int], max_bytes: int) -> bytearray:
+    """
+    讀入 bytearray（之後 np.frombuffer 直接共用這塊記憶體，不再複製）
+    已知長度時預先配置並以 readinto 填入；未知長度（chunked）時分段讀取並檢查上限
+    """
+    if length is not None:
+        buf = bytearray(length)
+        with memoryview(buf) as view:
+            got = 0
+            while got < length:
+                n = stream.readinto(view[got:])
+                if not n:
+                    break
+                got += n
+        if got < length:
+            del buf[got:]
+        return buf
+
+    buf = bytearray()
+    chunk = bytearray(UPLOAD_CHUNK_BYTES)
+    with memoryview(chunk) as view:
+        while True:
+            n = stream.readinto(chunk)
+            if not n:
+                break
+            buf += view[:n]
+            if len(buf) > max_bytes:
+                raise UploadTooLarge()
+    return buf
+
+
+def read_upload(req, max_bytes: int) -> Optional[bytearray]:
+    """
+    讀取二進位上傳的圖片；JSON 等其他請求回傳 None
+    multipart 取欄位 image（或第一個檔案）；超過 max_bytes 時拋出 UploadTooLarge
+    """
+    mimetype = req.mimetype
+    binary = mimetype == "application/octet-stream" or mimetype.startswith("image/")
+    if not binary and mimetype != "multipart/form-data":
+        # JSON（imageBase64 / imageUrl）等請求不受上傳大小限制，與原本相同
+        return None
+
+    length = req.content_length
+    if length is not None and length > max_bytes:
+        # 依 Content-Length 提早拒絕，不讀取本文
+        raise UploadTooLarge()
+    if binary:
+        return _read_stream(req.stream, length, max_bytes)
+
+    f = req.files.get("image") or next(iter(req.files.values()), None)
+    if f is None:
+        raise ValueError("缺少圖片檔案（欄位 image）")
+    f.stream.seek(0, os.SEEK_END)
+    size = f.stream.tell()
+    f.stream.seek(0)
+    if size > max_bytes:
+        raise UploadTooLarge()
+    return _read_stream(f.stream, size, max_bytes)
+
+
+# ---------------------------------------------------------
+# 批次分析：行程池
+# ---------------------------------------------------------
+def _init_worker():
+    # 平行度由行程池提供，避免每個行程再開 OpenCV 執行緒造成超額訂閱
+    cv2.setNumThreads(1)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# 批次中的 URL 下載屬於 I/O，以執行緒池平行處理，CPU 運算才交給行程池
+_io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='image-fetch')
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS, initializer=_init_worker)
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(raw: bytes, mode: str) -> Future:
+    pool = _get_pool()
+    try:
+        return pool.submit(analyze_bytes, raw, mode)
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        return _get_pool().submit(analyze_bytes, raw, mode)
+
+
+def _parse_sources(items) -> List[Optional[Dict]]:
+    """接受 {"url"}、{"imageBase64"} 或字串（http(s) 開頭視為 URL，否則為 Base64）"""
+    sources = []
+    for item in items:
+        if isinstance(item, str):
+            key = "url" if item.startswith(("http://", "https://")) else "imageBase64"
+            sources.append({key: item})
+        elif isinstance(item, dict) and (item.get("url") or item.get("imageBase64")):
+            sources.append({k: item[k] for k in ("url", "imageBase64") if item.get(k)})
+        else:
+            sources.append(None)
+    return sources
+
+
+def _resolve_item(source: Optional[Dict], cache: ImageResultCache, mode: str):
+    if source is None:
+        return None, None, "需提供 url 或 imageBase64"
+    try:
+        raw, digest = resolve_source(source, cache, mode)
+    except ValueError as e:
+        return None, None, str(e)
+    return raw, digest, None
+
+
+def analyze_batch(items, radius: Optional[int] = None, mode: str = "full") -> List[Dict]:
+    """平行分析多張圖片，依輸入順序回傳 [{"ok", "result", "cache", "similar"} | {"ok", "error"}]"""
+    cache = get_image_cache()
+    sources = _parse_sources(items)
+    resolved = list(_io_pool.map(lambda s: _resolve_item(s, cache, mode), sources))
+
+    # 先查快取；未命中者依 SHA-256 去重後送入行程池
+    results: List[Optional[Dict]] = [None] * len(sources)
+    pending: Dict[str, Future] = {}
+    for i, (raw, digest, error) in enumerate(resolved):
+        if error:
+            results[i] = {"ok": False, "error": error}
+            continue
+        cached = cache.get(cache_key(digest, mode))
+        if cached is not None:
+            results[i] = {"ok": True, "result": cached, "cache": "hit"}
+        elif raw is None:
+            results[i] = {"ok": False, "error": "無法載入圖片"}
+        elif digest not in pending:
+            pending[digest] = _submit(raw, mode)
+
+    for i, (raw, digest, error) in enumerate(resolved):
+        if results[i] is not None:
+            continue
+        fut = pending[digest]
+        try:
+            result = fut.result(timeout=ITEM_TIMEOUT)
+        except BrokenProcessPool as e:
+            broken = _pool
+            if broken is not None:
+                _reset_pool(broken)
+            results[i] = {"ok": False, "error": f"分析行程異常結束: {e}"}
+            continue
+        except Exception as e:
+            results[i] = {"ok": False, "error": str(e) or type(e).__name__}
+            continue
+        if result is None:
+            results[i] = {"ok": False, "error": "無法載入圖片"}
+            continue
+        cache.put(cache_key(digest, mode), result)
+        results[i] = {"ok": True, "result": result, "cache": "miss"}
+
+    for i, (raw, digest, error) in enumerate(resolved):
+        if results[i]["ok"]:
+            results[i]["similar"] = find_similar(results[i]["result"], digest, radius)
+    return results
+
+
+# ---------------------------------------------------------
+# Flask 路由註冊區：影像分析 API
+# ---------------------------------------------------------
+def _parse_radius(data: Dict) -> Optional[int]:
+    """選填的相似圖片漢明距離上限（不可超過索引的 max_radius）"""
+    try:
+        return max(0, int(data["radius"])) if "radius" in data else None
+    except (TypeError, ValueError):
+        return None
+
+
+def register_image_route(app):
+    @app.post("/analyze-image")
+    def analyze_image_route():
+        """
+        上傳圖片後自動分析品質
+        - JSON：{"url"} 或 {"imageBase64"}
+        - multipart/form-data（欄位 image）或 application/octet-stream / image/*：原始圖片位元組，
+          mode、radius 以表單欄位或查詢參數傳入
+        """
+        max_bytes = Config.IMAGE_MAX_UPLOAD_BYTES
+        try:
+            raw = read_upload(request, max_bytes)
+        except UploadTooLarge:
+            return jsonify({"ok": False, "error": f"圖片超過 {round(max_bytes / (1024 * 1024), 1)} MB 上限"}), 413
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+
+        if raw is not None:
+            data = request.values
+            digest = image_digest(raw)
+            result, cache_status = analyze_raw(raw, digest, analysis_mode(data)) if raw else (None, "miss")
+        else:
+            data = request.get_json(silent=True) or {}
+            try:
+                result, cache_status, digest = analyze_source(data, analysis_mode(data))
+            except ValueError:
+                result = None
+
+        if result is None:
+            return jsonify({"ok": False, "error": "無法載入圖片"}), 400
+
+        similar = find_similar(result, digest, _parse_radius(data))
+        return jsonify({"ok": True, "result": result, "cache": cache_status, "similar": similar})
+
+    @app.post("/analyze-images")
+    def analyze_images_route():
+        """一次分析多張圖片：{"images": [url | base64 | {"url"} | {"imageBase64"}]}"""
+        data = request.get_json(silent=True) or {}
+        items = data.get("images")
+        if not isinstance(items, list) or not items:
+            return jsonify({"ok": False, "error": "images 必須是非空陣列"}), 400
+        if len(items) > MAX_BATCH_IMAGES:
+            return jsonify({"ok": False, "error": f"一次最多 {MAX_BATCH_IMAGES} 張圖片"}), 400
+
+        results = analyze_batch(items, _parse_radius(data), analysis_mode(data))
+        return jsonify({"ok": True, "results": results})
+
+    return app
@@ -0,0 +1,153 @@
+"""
+影像分析結果快取
+- 以原始圖片位元組的 SHA-256 為鍵，記憶體內 LRU，依估計大小（位元組）淘汰
+- 可選的磁碟儲存（Config.IMAGE_CACHE_DIR），記憶體淘汰或重新啟動後仍可命中
+- URL 輸入另記錄 URL → (ETag, SHA-256)，再次提交時以 If-None-Match 條件式請求，
+  伺服器回應 304 即可直接使用快取結果，不需重新下載
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from config import Config
+
+# URL → (ETag, SHA-256) 對照表的最大筆數
+MAX_URL_ALIASES = 10000
+
+
+def image_digest(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _entry_size(key: str, result: Dict) -> int:
+    # 以 JSON 長度加上 dict 本身的開銷粗估記憶體用量
+    return len(key) + len(json.dumps(result, ensure_ascii=False)) + sys.getsizeof(result)
+
+
+class ImageResultCache:
+    """SHA-256 → 分析結果的 LRU 快取（執行緒安全）"""
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._entries: 'OrderedDict[str, Tuple[Dict, int]]' = OrderedDict()
+        self._bytes = 0
+        self._aliases: 'OrderedDict[str, Tuple[str, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # 分析結果
+    # ------------------------------------------------------------------
+    def get(self, digest: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return dict(entry[0])
+        result = self._read_disk(digest)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(digest, result)
+        return dict(result)
+
+    def contains(self, digest: str) -> bool:
+        """是否有快取結果（不更新 LRU 順序與命中統計）"""
+        with self._lock:
+            if digest in self._entries:
+                return True
+        path = self._disk_path(digest)
+        return path is not None and path.exists()
+
+    def put(self, digest: str, result: Dict):
+        result = dict(result)
+        with self._lock:
+            self._store(digest, result)
+        self._write_disk(digest, result)
+
+    def _store(self, digest: str, result: Dict):
+        old = self._entries.pop(digest, None)
+        if old is not None:
+            self._bytes -= old[1]
+        size = _entry_size(digest, result)
+        self._entries[digest] = (result, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    # ------------------------------------------------------------------
+    # URL 別名
+    # ------------------------------------------------------------------
+    def url_alias(self, url: str) -> Optional[Tuple[str, str]]:
+        """回傳 (ETag, SHA-256)，沒有紀錄時回傳 None"""
+        with self._lock:
+            alias = self._aliases.get(url)
+            if alias is not None:
+                self._aliases.move_to_end(url)
+            return alias
+
+    def set_url_alias(self, url: str, etag: str, digest: str):
+        with self._lock:
+            self._aliases[url] = (etag, digest)
+            self._aliases.move_to_end(url)
+            while len(self._aliases) > MAX_URL_ALIASES:
+                self._aliases.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    # ------------------------------------------------------------------
+    # 磁碟儲存（<dir>/<前兩碼>/<sha256>.json）
+    # ------------------------------------------------------------------
+    def _disk_path(self, digest: str) -> Optional[Path]:
+        if self.disk_dir is None:
+            return None
+        return self.disk_dir / digest[:2] / f'{digest}.json'
+
+    def _read_disk(self, digest: str) -> Optional[Dict]:
+        path = self._disk_path(digest)
+        if path is None:
+            return None
+        try:
+            with path.open('r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, digest: str, result: Dict):
+        path = self._disk_path(digest)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            with tmp.open('w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ 影像快取寫入磁碟失敗: {e}")
+
+
+_cache = ImageResultCache(Config.IMAGE_CACHE_MAX_BYTES, Config.IMAGE_CACHE_DIR or None)
+
+
+def get_image_cache() -> ImageResultCache:
+    """取得行程內共用的影像分析結果快取"""
+    return _cache
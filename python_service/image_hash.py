@@ -0,0 +1,180 @@
+"""
+感知雜湊（pHash / dHash）與近似重複圖片索引
+重新編碼、縮放或輕微裁切的圖片，位元組雜湊不同，但感知雜湊只差幾個位元；
+以 multi-index hashing 建立 64 位元雜湊的漢明距離索引：
+把雜湊切成 max_radius + 1 段，距離不超過 max_radius 的兩個雜湊至少有一段完全相同（鴿籠原理），
+因此只需查各段的雜湊表取得候選，再以 popcount 驗證，不必掃描全部雜湊。
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import Config
+
+HASH_BITS = 64
+# 每次查詢最多回傳的相似圖片數
+MAX_MATCHES = 5
+
+
+# ---------------------------------------------------------
+# 雜湊計算（輸入為灰階圖）
+# ---------------------------------------------------------
+def dhash(gray: np.ndarray) -> int:
+    """差異雜湊：縮成 9x8 後比較左右相鄰像素"""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return _pack(bits)
+
+
+def phash(gray: np.ndarray) -> int:
+    """感知雜湊：32x32 DCT 取左上 8x8 低頻係數，與中位數比較（不含直流項）"""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    median = np.median(low[1:])
+    return _pack(low > median)
+
+
+def _pack(bits: np.ndarray) -> int:
+    value = 0
+    for b in bits:
+        value = (value << 1) | int(b)
+    return value
+
+
+def to_hex(value: int) -> str:
+    return f'{value:016x}'
+
+
+def from_hex(text: str) -> int:
+    return int(text, 16)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+# ---------------------------------------------------------
+# 漢明距離索引
+# ---------------------------------------------------------
+class HammingIndex:
+    """
+    64 位元雜湊的 multi-index hashing 索引
+    max_radius 決定切段數（max_radius + 1 段），查詢半徑不可超過此值；
+    半徑越大，每段越短、候選越多，查詢越慢。
+    """
+
+    def __init__(self, max_radius: int = 4, path: Optional[str] = None):
+        self.max_radius = max_radius
+        chunks = max_radius + 1
+        base, extra = divmod(HASH_BITS, chunks)
+        self._slices: List[Tuple[int, int]] = []  # (位移, 遮罩)
+        shift = HASH_BITS
+        for i in range(chunks):
+            width = base + (1 if i < extra else 0)
+            shift -= width
+            self._slices.append((shift, (1 << width) - 1))
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(chunks)]
+        self._hashes: List[int] = []
+        self._meta: List[Dict] = []
+        self._keys: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.path = Path(path) if path else None
+        if self.path is not None:
+            self._load()
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def add(self, value: int, key: str, meta: Optional[Dict] = None) -> bool:
+        """加入雜湊；同一 key（圖片內容的 SHA-256）只會加入一次，回傳是否為新加入"""
+        with self._lock:
+            if key in self._keys:
+                return False
+            entry = {'sha256': key, 'hash': to_hex(value), 'first_seen': int(time.time())}
+            entry.update(meta or {})
+            self._insert(value, entry)
+        self._append(entry)
+        return True
+
+    def query(self, value: int, radius: Optional[int] = None, exclude: Optional[str] = None,
+              limit: int = MAX_MATCHES) -> List[Dict]:
+        """回傳漢明距離不超過 radius 的雜湊（依距離排序）"""
+        radius = self.max_radius if radius is None else min(radius, self.max_radius)
+        with self._lock:
+            seen = set()
+            matches = []
+            for (shift, mask), table in zip(self._slices, self._tables):
+                for idx in table.get((value >> shift) & mask, ()):
+                    if idx in seen:
+                        continue
+                    seen.add(idx)
+                    dist = hamming(value, self._hashes[idx])
+                    if dist <= radius and self._meta[idx]['sha256'] != exclude:
+                        matches.append((dist, idx))
+            matches.sort()
+            return [dict(self._meta[idx], distance=dist) for dist, idx in matches[:limit]]
+
+    def _insert(self, value: int, entry: Dict):
+        idx = len(self._hashes)
+        self._hashes.append(value)
+        self._meta.append(entry)
+        self._keys[entry['sha256']] = idx
+        for (shift, mask), table in zip(self._slices, self._tables):
+            table.setdefault((value >> shift) & mask, []).append(idx)
+
+    # 持久化：每行一筆 JSON，啟動時載入，新增時附加寫入
+    def _load(self):
+        if not self.path.exists():
+            return
+        with self.path.open('r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    if entry['sha256'] not in self._keys:
+                        self._insert(from_hex(entry['hash']), entry)
+                except (ValueError, KeyError):
+                    continue
+        print(f"✅ 已載入 {len(self._hashes)} 筆圖片感知雜湊")
+
+    def _append(self, entry: Dict):
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open('a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"⚠️ 感知雜湊寫入失敗: {e}")
+
+
+_index: Optional[HammingIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_hash_index() -> HammingIndex:
+    """取得行程內共用的感知雜湊索引（設定 IMAGE_CACHE_DIR 時持久化於該目錄）"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = str(Path(Config.IMAGE_CACHE_DIR) / 'phash_index.jsonl') if Config.IMAGE_CACHE_DIR else None
+            _index = HammingIndex(Config.IMAGE_HASH_MAX_RADIUS, path)
+        return _index
+
+
+def find_similar(result: Dict, digest: str, radius: Optional[int] = None) -> Optional[List[Dict]]:
+    """
+    以分析結果中的 phash 查詢相似圖片（排除同一張），並把本圖加入索引
+    結果沒有 phash（舊版快取）時回傳 None
+    """
+    if not result.get('phash'):
+        return None
+    index = get_hash_index()
+    value = from_hex(result['phash'])
+    matches = index.query(value, radius, exclude=digest)
+    index.add(value, digest)
+    return matches
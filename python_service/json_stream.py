@@ -0,0 +1,151 @@
+"""
+串流讀取 JSON 檔案中的條目
+爬蟲輸出 raw_*.json 為 {"items": [...], ...}（或直接為陣列），json.load 會把整個檔案一次轉成 Python 物件。
+iter_json_items 逐一產生 items 陣列中的元素，記憶體只需容納單一條目：
+- 有安裝 ijson 時使用 ijson（C 後端）
+- 否則以 json.JSONDecoder.raw_decode 分段解析：每次讀取一段文字，逐一解碼陣列元素
+"""
+import io
+import json
+from typing import BinaryIO, Dict, Iterator, Optional, TextIO
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# 每次讀取的字元數；單一值超過緩衝區時加倍讀取
+CHUNK_CHARS = 64 * 1024
+ITEMS_KEY = 'items'
+
+_WHITESPACE = ' \t\n\r'
+# 值之後可以出現的字元
+_DELIMITERS = ',]}:'
+
+
+class _Reader:
+    """以 raw_decode 分段解析的文字緩衝區"""
+
+    def __init__(self, f: TextIO, chunk_chars: int):
+        self.f = f
+        self.chunk_chars = chunk_chars
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        """再讀取一段文字（丟棄已解析的部分），檔案結束時回傳 False"""
+        if self.eof:
+            return False
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """略過空白，回傳下一個字元（檔案結束時為空字串）"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._fill(self.chunk_chars):
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"JSON 格式錯誤：預期 {' 或 '.join(chars)}，實際為 {ch or '檔案結尾'}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        """解碼下一個 JSON 值；緩衝區內不完整時繼續讀取"""
+        self.peek()
+        size = self.chunk_chars
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # 數字可能在緩衝區邊界被截斷（例如 0.|85 會解碼成 0），
+                # 值之後（略過空白）必須是分隔字元或檔案結尾才採用，否則讀取更多再重新解碼
+                nxt = end
+                while nxt < len(self.buf) and self.buf[nxt] in _WHITESPACE:
+                    nxt += 1
+                if self.eof or (nxt < len(self.buf) and self.buf[nxt] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if self._fill(size):
+                size *= 2
+
+
+def _iter_fallback(f: TextIO, key: str, chunk_chars: int) -> Iterator:
+    reader = _Reader(f, chunk_chars)
+    if reader.expect('{[') == '{':
+        # 略過 items 以外的欄位，找到 items 陣列
+        while True:
+            if reader.peek() == '}':
+                return
+            name = reader.value()
+            reader.expect(':')
+            if name == key and reader.peek() == '[':
+                reader.expect('[')
+                break
+            reader.value()
+            if reader.expect(',}') == '}':
+                return
+    if reader.peek() == ']':
+        return
+    while True:
+        yield reader.value()
+        if reader.expect(',]') == ']':
+            return
+
+
+class _Prepend:
+    """把已讀取的開頭位元組接回檔案，供 ijson 讀取"""
+
+    def __init__(self, head: bytes, f: BinaryIO):
+        self.head: Optional[bytes] = head
+        self.f = f
+
+    def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            # ijson 以 read(0) 判斷檔案為位元組或文字
+            return b''
+        head, self.head = self.head, None
+        if head:
+            return head + self.f.read(max(0, size - len(head)) if size >= 0 else -1)
+        return self.f.read(size)
+
+
+def iter_json_items(f: BinaryIO, key: str = ITEMS_KEY, chunk_chars: int = CHUNK_CHARS) -> Iterator[Dict]:
+    """
+    逐一產生 JSON 檔案中 key 陣列（預設 items）的元素；檔案本身為陣列時產生其元素
+    f 為二進位模式開啟的 UTF-8 檔案；沒有該欄位時不產生任何元素
+    """
+    if ijson is None:
+        yield from _iter_fallback(io.TextIOWrapper(f, encoding='utf-8-sig'), key, chunk_chars)
+        return
+    # ijson 需要先知道最外層是物件還是陣列
+    head = f.read(1)
+    while head and head in b' \t\n\r':
+        head = f.read(1)
+    prefix = 'item' if head == b'[' else f'{key}.item'
+    yield from ijson.items(_Prepend(head, f), prefix, use_float=True)
+
+
+def iter_json_file(path, key: str = ITEMS_KEY) -> Iterator[Dict]:
+    """開啟檔案並逐一產生條目（.json 為 {"items": [...]}；其他副檔名視為 JSON Lines）"""
+    if not str(path).endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, 'rb') as f:
+        yield from iter_json_items(f, key)
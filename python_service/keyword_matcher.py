@@ -0,0 +1,139 @@
+"""
+多關鍵字比對引擎（Aho-Corasick 自動機）
+將所有關鍵字字典一次編譯，對每段文字只掃描一遍即可取得所有命中結果，
+取代逐一呼叫 `k in text` 的 O(文字數 × 關鍵字數 × 長度) 迴圈。
+"""
+import re
+import threading
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+# scan() 的回傳格式：{group: {label: {命中的關鍵字}}}
+Hits = Dict[str, Dict[str, Set[str]]]
+
+
+def _fold(text: str) -> str:
+    """轉小寫且保持字元位置不變（少數字元小寫後長度會改變，保留原字元）"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class _Automaton:
+    """由一組關鍵字編譯出的 trie、失敗連結與輸出表"""
+
+    def __init__(self, patterns: List[Tuple[str, str, str, bool]]):
+        self.patterns = patterns
+        goto: List[Dict[str, int]] = [{}]
+        fail: List[int] = [0]
+        out: List[List[int]] = [[]]
+        for idx, (_, _, kw, _) in enumerate(patterns):
+            state = 0
+            for ch in _fold(kw):
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                state = nxt
+            out[state].append(idx)
+
+        # BFS 計算失敗連結，並把後綴狀態的輸出合併進來
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt].extend(out[fail[nxt]])
+
+        self.goto, self.fail, self.out = goto, fail, out
+        # 位於根節點時，用正規表示式（C 實作）直接跳到下一個可能的關鍵字開頭
+        self.first_chars = re.compile('[' + ''.join(re.escape(c) for c in goto[0]) + ']') if goto[0] else None
+
+    def scan(self, text: str, hits: 'Hits'):
+        first_chars = self.first_chars
+        if first_chars is None:
+            return
+        goto, fail, out, patterns = self.goto, self.fail, self.out, self.patterns
+        folded = _fold(text)
+        n = len(folded)
+        pos = 0
+        state = 0
+        while pos < n:
+            if not state:
+                m = first_chars.search(folded, pos)
+                if m is None:
+                    break
+                pos = m.start()
+            ch = folded[pos]
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            for idx in out[state]:
+                group, label, kw, case_sensitive = patterns[idx]
+                if case_sensitive and text[pos - len(kw) + 1:pos + 1] != kw:
+                    continue
+                hits.setdefault(group, {}).setdefault(label, set()).add(kw)
+            pos += 1
+
+
+class KeywordMatcher:
+    """
+    以 (group, label) 分組的多關鍵字比對器
+
+    自動機建立在小寫化的關鍵字上；標記為區分大小寫的關鍵字命中時，
+    再以原始文字驗證，因此同一個自動機可同時服務兩種比對規則。
+    只需要部分群組時（例如長篇 HTML 只查釣魚詞），scan(groups=...) 會改用
+    該群組子集專屬的自動機（第一次使用時編譯並快取），略過無關字元更快。
+    """
+
+    def __init__(self):
+        # 每個關鍵字：(group, label, keyword, case_sensitive)
+        self._patterns: List[Tuple[str, str, str, bool]] = []
+        self._automata: Dict[Optional[FrozenSet[str]], _Automaton] = {}
+        self._lock = threading.Lock()
+        self._built = False
+
+    def add(self, group: str, label: str, keywords: Iterable[str], case_sensitive: bool = True):
+        """加入一組關鍵字；必須在 build() 之前呼叫"""
+        if self._built:
+            raise RuntimeError('KeywordMatcher 已編譯，無法再加入關鍵字')
+        for kw in keywords:
+            if kw:
+                self._patterns.append((group, label, kw, case_sensitive))
+        return self
+
+    def build(self):
+        """編譯涵蓋所有群組的自動機"""
+        self._automata[None] = _Automaton(self._patterns)
+        self._built = True
+        return self
+
+    def _automaton(self, groups: Optional[Iterable[str]]) -> _Automaton:
+        key = frozenset(groups) if groups is not None else None
+        automaton = self._automata.get(key)
+        if automaton is None:
+            with self._lock:
+                automaton = self._automata.get(key)
+                if automaton is None:
+                    automaton = _Automaton([p for p in self._patterns if p[0] in key])
+                    self._automata[key] = automaton
+        return automaton
+
+    def scan(self, text: str, groups: Optional[Iterable[str]] = None) -> Hits:
+        """單次掃描文字，回傳命中的 {group: {label: {keyword}}}；groups 可限定只比對部分群組"""
+        if not self._built:
+            self.build()
+        hits: Hits = {}
+        if text:
+            self._automaton(groups).scan(text, hits)
+        return hits
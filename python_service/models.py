@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+import json
 
 db = SQLAlchemy()
 
@@ -143,4 +144,52 @@ class Reports(db.Model):
     article_id = db.Column(db.Integer, db.ForeignKey("articles.article_id"), nullable=False)
     reason = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), default="待審核")
-    reported_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    reported_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# =====================================
+# 🔍 文章分析結果（對應 analysis_results 資料表）
+# =====================================
+class AnalysisResult(db.Model):
+    __tablename__ = "analysis_results"
+
+    analysis_id = db.Column(db.Integer, primary_key=True)
+    article_id = db.Column(db.Integer, db.ForeignKey("articles.article_id"))
+    user_id = db.Column(db.Integer)           # 爬蟲匯入時為空
+    explanation = db.Column(db.Text)
+    analyzed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    keywords = db.Column(db.Text)             # 以「, 」分隔
+    category = db.Column(db.String(50))
+    confidence_score = db.Column(db.Numeric(3, 2))
+    risk_level = db.Column(db.String(20))     # 高 / 中 / 低
+    report_id = db.Column(db.Integer)
+
+# =====================================
+# 📊 週報快照（對應 weekly_report_snapshots 資料表）
+# =====================================
+class WeeklyReportSnapshot(db.Model):
+    __tablename__ = "weekly_report_snapshots"
+
+    snapshot_id = db.Column(db.Integer, primary_key=True)
+    week_start = db.Column(db.Date, unique=True, nullable=False)  # 該週週一（UTC）
+    source = db.Column(db.String(100))
+    news_count = db.Column(db.Integer, default=0)          # 近 7 天 RSS 新聞則數
+    total_verified = db.Column(db.Integer, default=0)
+    total_suspicious = db.Column(db.Integer, default=0)
+    ai_accuracy = db.Column(db.Integer, default=0)
+    payload = db.Column(db.Text)  # JSON：每日圖表、類別、通道、情感、標題範例
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """轉成週報資料字典（與 routes_stats._build_report_data 相同格式）"""
+        data = json.loads(self.payload or "{}")
+        data.update({
+            "weekStart": self.week_start.isoformat(),
+            "source": self.source,
+            "newsCount": self.news_count or 0,
+            "totalVerified": self.total_verified or 0,
+            "totalSuspicious": self.total_suspicious or 0,
+            "aiAccuracy": self.ai_accuracy or 0,
+            "updatedAt": self.updated_at.isoformat(timespec="seconds") + "Z" if self.updated_at else None,
+        })
+        return data
@@ -0,0 +1,178 @@
+"""
+Google News RSS 背景更新模組
+以固定間隔在背景抓取 RSS（帶 ETag / Last-Modified 條件式請求），
+並把解析後的新聞與衍生統計（類別、通道、情感、每日數量）保存在記憶體中。
+/api/full-report 直接讀取快照；快照過期時仍先回傳舊資料，同時觸發背景更新。
+"""
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from config import Config
+from http_fetcher import get_fetcher
+from news_keywords import aggregate_titles
+
+MAX_ITEMS = 120
+FETCH_TIMEOUT = 10
+# 抓取失敗後至少間隔多久才重試（秒）
+RETRY_SECONDS = 30
+
+
+def parse_rss(content: bytes, max_items: int = MAX_ITEMS) -> List[Dict]:
+    """解析 RSS，回傳 [{'title', 'pubDate'}]"""
+    root = ET.fromstring(content)
+    items = []
+    for item in root.findall('.//item')[:max_items]:
+        title_el = item.find('title')
+        pub_el = item.find('pubDate')
+        title = title_el.text if title_el is not None else ''
+        pub_date = pub_el.text if pub_el is not None else ''
+        items.append({
+            'title': title,
+            'pubDate': pub_date,
+        })
+    return items
+
+
+class FeedSnapshot:
+    """某次成功抓取的 RSS 內容與衍生統計（建立後不再修改）"""
+
+    def __init__(self, items: List[Dict], source: str, fetched_at: Optional[datetime] = None):
+        self.items = items
+        self.source = source
+        self.fetched_at = fetched_at
+        self.titles = [i['title'] for i in items if i.get('title')]
+        self.categories, self.channels, self.positive, self.negative = aggregate_titles(self.titles)
+
+        # 依發布日期統計則數
+        self.per_day_counts = Counter()
+        for it in items:
+            raw = it.get('pubDate')
+            try:
+                dt = parsedate_to_datetime(raw) if raw else None
+            except Exception:
+                continue
+            if dt is not None:
+                self.per_day_counts[dt.date()] += 1
+
+
+class NewsFeedRefresher:
+    """
+    RSS 快照的 stale-while-revalidate 快取
+
+    - start() 啟動背景執行緒，每 interval 秒以條件式 GET 更新一次
+    - snapshot() 立即回傳目前快照；若已過期則喚醒背景執行緒更新
+    - 尚無任何快照時（剛啟動），第一個請求會等待首次抓取完成
+    """
+
+    def __init__(self, url: str, interval: float, max_items: int = MAX_ITEMS, timeout: float = FETCH_TIMEOUT):
+        self.url = url
+        self.interval = interval
+        self.max_items = max_items
+        self.timeout = timeout
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.checked_at = 0.0  # 上次成功確認（200 或 304）的 monotonic 時間
+        self.attempted_at = 0.0  # 上次嘗試抓取的 monotonic 時間
+        self.last_error: Optional[str] = None
+        self._snapshot: Optional[FeedSnapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 對外介面
+    # ------------------------------------------------------------------
+    def start(self):
+        """啟動背景更新執行緒（重複呼叫無副作用）"""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='news-feed-refresher', daemon=True)
+                self._thread.start()
+
+    def snapshot(self, wait: Optional[float] = None) -> FeedSnapshot:
+        """
+        取得目前快照
+        wait: 尚無快照時最多等待首次抓取的秒數（預設為抓取逾時秒數）
+        """
+        self.start()
+        if self._snapshot is None:
+            self._wakeup.set()
+            self._ready.wait(self.timeout if wait is None else wait)
+        elif self.is_stale():
+            # 先回傳舊快照，背景執行緒負責更新
+            self._wakeup.set()
+        return self._snapshot or FeedSnapshot([], self.url)
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.checked_at >= self.interval
+
+    def age_seconds(self) -> Optional[int]:
+        if not self.checked_at:
+            return None
+        return int(time.monotonic() - self.checked_at)
+
+    def refresh(self) -> bool:
+        """
+        執行一次條件式抓取，回傳快照是否更新
+        同一時間只會有一個抓取在進行
+        """
+        with self._refresh_lock:
+            self.attempted_at = time.monotonic()
+            headers = {}
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+            try:
+                resp = get_fetcher().fetch(self.url, headers=headers, timeout=self.timeout, use_cache=False)
+                if resp.not_modified:
+                    if self._snapshot is not None:
+                        self.checked_at = time.monotonic()
+                        self.last_error = None
+                        return False
+                    # 尚無快照卻收到 304（理論上不會發生），清除條件標頭後下次重新抓取
+                    self.etag = self.last_modified = None
+                    raise ValueError('RSS 回應 304 但尚無快照')
+                items = parse_rss(resp.content, self.max_items)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"[RSS] ⚠️ 更新失敗，沿用舊快照: {e}")
+                # 失敗也要讓等待首次抓取的請求繼續（回傳空快照）
+                self._ready.set()
+                return False
+
+            self._snapshot = FeedSnapshot(items, self.url, datetime.utcnow())
+            self.etag = resp.headers.get('ETag')
+            self.last_modified = resp.headers.get('Last-Modified')
+            self.checked_at = time.monotonic()
+            self.last_error = None
+            self._ready.set()
+            return True
+
+    # ------------------------------------------------------------------
+    # 背景執行緒
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            self._wakeup.clear()
+            # 失敗時 checked_at 不會更新，但至少間隔 RETRY_SECONDS 才重試，避免持續打擾上游
+            retry_after = min(self.interval, RETRY_SECONDS)
+            if self.is_stale() and time.monotonic() - self.attempted_at >= retry_after:
+                self.refresh()
+            # 更新失敗後間隔 RETRY_SECONDS 重試，而不是等到下一個 interval
+            self._wakeup.wait(retry_after if self.last_error else self.interval)
+
+
+_refresher = NewsFeedRefresher(Config.GOOGLE_NEWS_RSS_URL, Config.NEWS_FEED_REFRESH_SECONDS)
+
+
+def get_refresher() -> NewsFeedRefresher:
+    """取得行程內共用的 RSS 更新器"""
+    return _refresher
@@ -0,0 +1,138 @@
+"""
+新聞關鍵字規則
+供 routes_stats（即時統計）、verification_loader（每日彙總）與 analyze_news 共用，
+所有字典在匯入時編譯成同一個 KeywordMatcher，每段文字只需掃描一次。
+百分比換算由呼叫端處理。
+"""
+from collections import Counter
+from typing import Iterable, Optional, Tuple
+
+from keyword_matcher import Hits, KeywordMatcher
+
+# 主題類別（依字典順序比對，命中第一個類別即停止）
+CATEGORY_KEYWORDS = {
+    '政治': ['選舉', '總統', '立法院', '政治', '政黨', '立委', '國會', '藍營', '綠營'],
+    '健康': ['確診', '疫苗', '疫情', '醫院', '醫療', '衛福', '登革熱', '減肥', '瘦身', '減重', '健康', '營養', '飲食', '運動', '健身', '減脂', '增肌', '蛋白質', '維生素', '保健', '養生', '食譜', '菜單'],
+    '經濟': ['股', '台積電', '經濟', '投資', '通膨', '通縮', '銀行', '匯率'],
+    '科技': ['AI', '人工智慧', '科技', '晶片', '蘋果', '微軟', 'Google', '特斯拉'],
+    '社會': ['警方', '警察', '詐騙', '車禍', '火警', '社會', '糾紛'],
+    '國際': ['中國', '美國', '日本', '韓國', '俄羅斯', '以色列', '烏克蘭', '歐盟'],
+}
+
+# 傳播通道（不分大小寫；先比對社群，再比對私人群組，其餘歸為傳統媒體）
+CHANNEL_SOCIAL = '社群媒體'
+CHANNEL_PRIVATE = '私人訊息群組'
+CHANNEL_TRADITIONAL = '傳統媒體/網站'
+CHANNEL_LABELS = [CHANNEL_SOCIAL, CHANNEL_PRIVATE, CHANNEL_TRADITIONAL]
+
+SOCIAL_KEYWORDS = ['Facebook', '臉書', 'FB', 'X ', 'Twitter', 'IG', 'Instagram', '社群', 'YouTube', 'YT']
+PRIVATE_KEYWORDS = ['LINE', 'Telegram', '群組', '私訊', '轉傳', '社團']
+
+# 情感傾向（不分大小寫，正負面可同時命中）
+POSITIVE_KEYWORDS = [
+    '成長', '創新', '突破', '改善', '進步', '利多', '獲利', '成功', '上揚', '上升', '擴張', '獲獎', '勝選', '和平'
+]
+NEGATIVE_KEYWORDS = [
+    '暴跌', '崩盤', '危機', '裁員', '虧損', '下滑', '爭議', '指控', '醜聞', '災害', '戰爭', '衝突', '停電', '疫情'
+]
+
+# 查證判斷（short_judgement 中明確標示可信、假訊息、不實等）
+VERIFIED_JUDGEMENT_KEYWORDS = [
+    '可信', '查證', '已查證', '經查證', '假訊息', '不實', '謠言',
+    '經證實', '經查核', '經審查', '確認', '事實查核', '闢謠'
+]
+
+# 情緒化詞彙（analyze_news.analyze_content）
+EMOTIONAL_KEYWORDS = [
+    '驚人', '絕對', '震驚', '離譜', '不可思議', '大爆發', '小心', '慘了',
+    '怒吼', '崩潰', '獨家', '急轉直下', '馬上看', '瘋傳', '秘密'
+]
+
+# 疑似釣魚詞彙（/api/analyze-news）
+BAIT_KEYWORDS = ['震驚', '驚人', '點進來', '快看', '曝光', '賺錢', '限時', '免費', '點我']
+
+# 比對群組名稱
+GROUP_CATEGORY = 'category'
+GROUP_CHANNEL = 'channel'
+GROUP_SENTIMENT = 'sentiment'
+GROUP_VERIFIED = 'verified'
+GROUP_EMOTION = 'emotion'
+GROUP_BAIT = 'bait'
+
+
+def _build_matcher() -> KeywordMatcher:
+    m = KeywordMatcher()
+    for cat, keys in CATEGORY_KEYWORDS.items():
+        m.add(GROUP_CATEGORY, cat, keys)
+    m.add(GROUP_CHANNEL, CHANNEL_SOCIAL, SOCIAL_KEYWORDS, case_sensitive=False)
+    m.add(GROUP_CHANNEL, CHANNEL_PRIVATE, PRIVATE_KEYWORDS, case_sensitive=False)
+    m.add(GROUP_SENTIMENT, 'positive', POSITIVE_KEYWORDS, case_sensitive=False)
+    m.add(GROUP_SENTIMENT, 'negative', NEGATIVE_KEYWORDS, case_sensitive=False)
+    m.add(GROUP_VERIFIED, GROUP_VERIFIED, VERIFIED_JUDGEMENT_KEYWORDS)
+    m.add(GROUP_EMOTION, GROUP_EMOTION, EMOTIONAL_KEYWORDS)
+    m.add(GROUP_BAIT, GROUP_BAIT, BAIT_KEYWORDS)
+    return m.build()
+
+
+MATCHER = _build_matcher()
+
+
+def scan(text: str, groups=None) -> Hits:
+    """單次掃描文字，取得所有字典（或 groups 指定群組）的命中結果"""
+    return MATCHER.scan(text, groups)
+
+
+def keyword_count(hits: Hits, group: str) -> int:
+    """某群組命中的不重複關鍵字數"""
+    return sum(len(kws) for kws in hits.get(group, {}).values())
+
+
+def classify_title(title: str) -> Tuple[Optional[str], str, bool, bool]:
+    """
+    單次掃描取得標題的 (主題類別, 傳播通道, 是否正面, 是否負面)
+    主題類別依 CATEGORY_KEYWORDS 的順序取第一個命中者，未命中為 None
+    """
+    hits = MATCHER.scan(title)
+    cats = hits.get(GROUP_CATEGORY, {})
+    category = next((c for c in CATEGORY_KEYWORDS if c in cats), None)
+    channels = hits.get(GROUP_CHANNEL, {})
+    if CHANNEL_SOCIAL in channels:
+        channel = CHANNEL_SOCIAL
+    elif CHANNEL_PRIVATE in channels:
+        channel = CHANNEL_PRIVATE
+    else:
+        channel = CHANNEL_TRADITIONAL
+    sentiment = hits.get(GROUP_SENTIMENT, {})
+    return category, channel, 'positive' in sentiment, 'negative' in sentiment
+
+
+def categorize_title(title: str) -> Optional[str]:
+    """回傳標題所屬的第一個主題類別，未命中回傳 None"""
+    return classify_title(title)[0]
+
+
+def infer_channel(title: str) -> str:
+    """以標題關鍵詞推估來源通道"""
+    return classify_title(title)[1]
+
+
+def title_sentiment(title: str) -> Tuple[bool, bool]:
+    """回傳 (是否命中正面詞, 是否命中負面詞)"""
+    _, _, pos, neg = classify_title(title)
+    return pos, neg
+
+
+def aggregate_titles(titles: Iterable[str]) -> Tuple[Counter, Counter, int, int]:
+    """每個標題只掃描一次，回傳 (類別計數, 通道計數, 正面數, 負面數)"""
+    categories = Counter()
+    channels = Counter()
+    pos = 0
+    neg = 0
+    for t in titles:
+        cat, channel, is_pos, is_neg = classify_title(t)
+        if cat:
+            categories[cat] += 1
+        channels[channel] += 1
+        pos += is_pos
+        neg += is_neg
+    return categories, channels, pos, neg
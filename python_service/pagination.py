@@ -0,0 +1,74 @@
+"""
+列表 API 的游標（keyset）分頁工具
+游標為排序鍵值（例如 published_time, article_id）的 base64 JSON，
+下一頁以 `WHERE (排序鍵) < (游標值)` 接續查詢，不使用 OFFSET，
+每個請求的記憶體與首筆回應時間都與資料表大小無關。
+
+回應格式：
+- 請求帶有 limit 或 cursor 參數：{"items": [...], "next_cursor": "..." | null}
+- 舊版用戶端（未帶參數）：維持 JSON 陣列且不限筆數（與分頁前相同，App 現有畫面依賴完整列表）
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from flask import jsonify
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+# 排序時間為 NULL 的資料以此值代替，確保 keyset 條件可比較
+FLOOR_TIME = datetime(1970, 1, 1)
+
+
+def parse_limit(args, default: int = DEFAULT_LIMIT) -> int:
+    """讀取 limit 參數並限制在 1 ~ MAX_LIMIT"""
+    limit = args.get("limit", default, type=int)
+    return max(1, min(MAX_LIMIT, limit or default))
+
+
+def page_limit(args) -> Optional[int]:
+    """一般（非串流）請求的筆數上限：未帶 limit / cursor 的舊版用戶端回傳 None（不限筆數）"""
+    return parse_limit(args) if wants_envelope(args) else None
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """將排序鍵值編碼為游標字串（datetime 轉為 ISO 格式）"""
+    plain = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(plain, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """解碼游標，格式錯誤時拋出 ValueError"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except Exception:
+        raise ValueError("cursor 格式錯誤")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("cursor 格式錯誤")
+    return values
+
+
+def cursor_time(value) -> datetime:
+    """游標中的時間字串轉回 datetime（作為查詢參數）"""
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError("cursor 格式錯誤")
+
+
+def wants_envelope(args) -> bool:
+    """用戶端是否使用分頁參數（決定回應格式）"""
+    return "limit" in args or "cursor" in args
+
+
+def page_response(items: List[Any], next_cursor: Optional[str], args):
+    """依用戶端是否使用分頁參數回傳對應格式"""
+    if wants_envelope(args):
+        return jsonify({"items": items, "next_cursor": next_cursor}), 200
+    return jsonify(items), 200
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+文章可信度重新評分
+可信度規則（credibility.score_content_batch）調整後，以此腳本重新計算 articles.reliability_score：
+- 讀取：PostgreSQL 以伺服器端游標依 article_id 順序分批串流，其他資料庫以 article_id 分頁
+- 評分：多個工作行程平行計算（--workers 0 時在主行程計算）
+- 寫回：每批一個短交易；PostgreSQL 以 UPDATE ... FROM unnest(...) 一次更新整批，
+  其他資料庫以 executemany；分數未改變的列不會寫入
+- 每批寫回後記錄檢查點（最後處理的 article_id），中斷後重新執行即從檢查點繼續
+
+只更新有變動的列、且每批立即 commit，不會長時間持有鎖；
+API 行程的首頁列表快取會在 FEED_CACHE_TTL_SECONDS 內更新。
+
+用法：
+  python rescore_articles.py                    從檢查點繼續（沒有檢查點時從頭開始）
+  python rescore_articles.py --restart          忽略檢查點從頭開始
+  python rescore_articles.py --dry-run          只計算，不寫回資料庫
+"""
+import argparse
+import json
+import os
+import time
+import urllib.parse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import text
+
+from credibility import score_content_batch
+from feed_cache import invalidate_article_feeds
+
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_CHECKPOINT = Path(__file__).parent / 'rescore_articles.checkpoint.json'
+# PostgreSQL：等待列鎖超過此時間即放棄該批（下次執行從檢查點重試），不與線上寫入互相卡住
+LOCK_TIMEOUT = '5s'
+# articles.reliability_score（numeric(3,2)）保留的小數位數
+SCORE_DECIMALS = 2
+
+_SELECT_SQL = """
+    SELECT article_id, content, source_link, reliability_score
+    FROM articles
+    WHERE article_id > :after
+    ORDER BY article_id
+"""
+
+_UPDATE_PG_SQL = """
+    UPDATE articles AS a
+    SET reliability_score = v.score
+    FROM unnest(CAST(:ids AS integer[]), CAST(:scores AS double precision[])) AS v(article_id, score)
+    WHERE a.article_id = v.article_id
+      AND a.reliability_score IS DISTINCT FROM v.score
+"""
+
+_UPDATE_SQL = """
+    UPDATE articles SET reliability_score = :score
+    WHERE article_id = :article_id
+"""
+
+Row = Tuple[int, Optional[str], Optional[str], Optional[float]]
+
+
+# ---------------------------------------------------------
+# 評分（在工作行程執行，不使用資料庫）
+# ---------------------------------------------------------
+def score_rows(rows: Sequence[Row]) -> List[Tuple[int, float, bool]]:
+    """回傳 [(article_id, 新分數, 是否改變)]"""
+    items = [(urllib.parse.urlparse(link or '').netloc, content or '') for _, content, link, _ in rows]
+    results = score_content_batch(items)
+    # reliability_score 為 numeric(3,2)：PostgreSQL 回傳 Decimal，且只保留兩位小數，以相同精度比較
+    return [
+        (row[0], res['final_score'],
+         row[3] is None or round(float(row[3]), SCORE_DECIMALS) != round(res['final_score'], SCORE_DECIMALS))
+        for row, res in zip(rows, results)
+    ]
+
+
+# ---------------------------------------------------------
+# 讀取與寫回
+# ---------------------------------------------------------
+def iter_batches(engine, after: int, batch_size: int) -> Iterator[List[Row]]:
+    """依 article_id 順序分批讀取 article_id > after 的文章"""
+    if engine.dialect.name == 'postgresql':
+        # 伺服器端游標（獨立連線，寫回的 commit 不會關閉游標）
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                text(_SELECT_SQL), {'after': after})
+            for part in result.partitions():
+                yield [tuple(r) for r in part]
+        return
+
+    # 其他資料庫（SQLite）：讀取中的游標會阻擋寫入，改以 article_id 分頁，每批一個短查詢
+    while True:
+        with engine.connect() as conn:
+            rows = [tuple(r) for r in conn.execute(text(_SELECT_SQL + ' LIMIT :limit'),
+                                                   {'after': after, 'limit': batch_size})]
+        if not rows:
+            return
+        yield rows
+        after = rows[-1][0]
+
+
+def write_scores(engine, scores: Sequence[Tuple[int, float, bool]]) -> int:
+    """寫回分數有變動的文章，回傳更新筆數"""
+    changed = [(article_id, score) for article_id, score, is_changed in scores if is_changed]
+    if not changed:
+        return 0
+    with engine.begin() as conn:
+        if engine.dialect.name == 'postgresql':
+            conn.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            result = conn.execute(text(_UPDATE_PG_SQL), {
+                'ids': [article_id for article_id, _ in changed],
+                'scores': [score for _, score in changed],
+            })
+            return result.rowcount
+        conn.execute(text(_UPDATE_SQL), [{'article_id': a, 'score': s} for a, s in changed])
+        return len(changed)
+
+
+# ---------------------------------------------------------
+# 檢查點
+# ---------------------------------------------------------
+def load_checkpoint(path: Path) -> Dict:
+    try:
+        with path.open('r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checkpoint(path: Path, state: Dict):
+    tmp = path.with_suffix('.tmp')
+    with tmp.open('w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------
+# 主流程
+# ---------------------------------------------------------
+def rescore(engine, batch_size: int = DEFAULT_BATCH_SIZE, workers: Optional[int] = None,
+            checkpoint: Optional[Path] = DEFAULT_CHECKPOINT, restart: bool = False,
+            dry_run: bool = False) -> Dict:
+    """
+    重新評分所有文章，回傳統計 {'scanned', 'changed', 'updated', 'last_id', 'seconds'}
+    workers: 評分行程數（None 為 CPU 核心數，0 為在目前行程計算）
+    """
+    state = {} if restart or checkpoint is None else load_checkpoint(checkpoint)
+    last_id = int(state.get('last_id') or 0)
+    scanned = int(state.get('scanned') or 0)
+    updated = int(state.get('updated') or 0)
+    changed = 0
+    resumed = scanned
+    if last_id:
+        print(f"↩️ 從檢查點繼續：article_id > {last_id}（已處理 {scanned} 筆）")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    # 依送出順序寫回，檢查點才會單調遞增；同時評分中的批次數有上限，避免讀取過度領先
+    max_pending = max(1, workers) * 2
+    pending: 'deque[Tuple[int, int, Future]]' = deque()
+    start = time.monotonic()
+
+    def write_head():
+        nonlocal last_id, scanned, updated, changed
+        batch_last, count, future = pending.popleft()
+        scores = future.result()
+        changed += sum(1 for _, _, is_changed in scores if is_changed)
+        if not dry_run:
+            updated += write_scores(engine, scores)
+        last_id = batch_last
+        scanned += count
+        if checkpoint is not None and not dry_run:
+            save_checkpoint(checkpoint, {
+                'last_id': last_id,
+                'scanned': scanned,
+                'updated': updated,
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+            })
+        rate = (scanned - resumed) / max(time.monotonic() - start, 1e-6)
+        print(f"✅ 已處理至 article_id {last_id}：共 {scanned} 筆，分數變動 {changed} 筆（{rate:.0f} 筆/秒）",
+              flush=True)
+
+    try:
+        for rows in iter_batches(engine, last_id, batch_size):
+            if pool is None:
+                future = Future()
+                future.set_result(score_rows(rows))
+            else:
+                future = pool.submit(score_rows, rows)
+            pending.append((rows[-1][0], len(rows), future))
+            while pending and (pending[0][2].done() or len(pending) > max_pending):
+                write_head()
+        while pending:
+            write_head()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    # 全部完成後移除檢查點，下次執行（例如規則再次調整）從頭開始
+    if checkpoint is not None and not dry_run and checkpoint.exists():
+        checkpoint.unlink()
+    if not dry_run and updated:
+        invalidate_article_feeds()
+    return {
+        'scanned': scanned,
+        'changed': changed,
+        'updated': updated,
+        'last_id': last_id,
+        'seconds': round(time.monotonic() - start, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重新計算 articles.reliability_score')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='每批讀取與寫回的文章數')
+    parser.add_argument('--workers', type=int, default=None, help='評分行程數（預設為 CPU 核心數，0 為不使用工作行程）')
+    parser.add_argument('--checkpoint', default=str(DEFAULT_CHECKPOINT), help='檢查點檔案路徑')
+    parser.add_argument('--restart', action='store_true', help='忽略檢查點，從頭開始')
+    parser.add_argument('--dry-run', action='store_true', help='只計算分數變動，不寫回資料庫')
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import db
+
+    app = create_app()
+    with app.app_context():
+        try:
+            stats = rescore(db.engine, max(1, args.batch_size), args.workers, Path(args.checkpoint),
+                            args.restart, args.dry_run)
+        except KeyboardInterrupt:
+            print("⏹️ 已中斷，下次執行會從檢查點繼續")
+            return
+    print(f"🎉 重新評分完成：{stats}")
+
+
+if __name__ == '__main__':
+    main()
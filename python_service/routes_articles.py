@@ -1,6 +1,10 @@
 from flask import Blueprint, jsonify, request, Response
 from models import db
-from sqlalchemy import text
+from sqlalchemy import bindparam, text
+from search_index import TITLE_WEIGHT, build_tsquery, has_search_column, search_ranks
+from pagination import FLOOR_TIME, cursor_time, decode_cursor, encode_cursor, page_limit, page_response, parse_limit
+from streaming import iter_query, ndjson_response, stream_limit, wants_stream
+from feed_cache import get_feed_cache
 from datetime import datetime, timedelta
 import json
 
@@ -18,36 +22,141 @@ SCORE_LABELS = {
     5: "極高可信度",
 }
 
+# 推薦列表每個類別的文章數
+RECOMMENDED_PER_CATEGORY = 3
+
+
+def _format_time(value):
+    """格式化時間欄位（SQLite 的原生 SQL 查詢會回傳字串）"""
+    if not value:
+        return ""
+    if hasattr(value, "strftime"):
+        return value.strftime("%Y-%m-%d %H:%M")
+    return str(value)[:16]
+
+
+def _sort_key_time(value):
+    """排序用時間（SQLite 回傳字串時轉為 datetime）"""
+    if isinstance(value, datetime):
+        return value
+    return cursor_time(str(value))
+
+
+def _search_row(r, rank):
+    return {
+        "id": r[0],
+        "title": r[1],
+        "category": r[2],
+        "media_name": r[3],
+        "published_time": _format_time(r[4]),
+        "reliability_score": float(r[5] or 0),
+        "credibility_label": SCORE_LABELS.get(int(r[5] or 0), "未知"),
+        "source_link": r[6],
+        "relevance": round(float(rank or 0), 4),
+    }
+
+
+# ============================================================
+# 🏠 首頁列表（熱門、推薦、排行）：結果經 FeedCache 快取，文章變動時失效
+# ============================================================
+def _load_trending():
+    query = text("""
+        SELECT article_id, title, category, reliability_score, media_name, source_link
+        FROM articles
+        WHERE reliability_score IS NOT NULL
+        ORDER BY reliability_score DESC
+        LIMIT 3;
+    """)
+    rows = db.session.execute(query).fetchall()
+
+    trending = []
+    for r in rows:
+        trending.append({
+            "id": r[0],
+            "title": r[1],
+            "category": r[2],
+            "reliability_score": float(r[3]),
+            "credibility_label": SCORE_LABELS.get(int(r[3]), "未知"),
+            "media_name": r[4],
+            "source_link": r[5],
+            "summary": f"此文章由 {r[4]} 提供，可信度 {SCORE_LABELS.get(int(r[3]), '未知')}。",
+        })
+    return trending
+
+
+def _load_recommended():
+    # 每個類別取可信度最高的 RECOMMENDED_PER_CATEGORY 篇，由資料庫以視窗函式計算
+    query = text("""
+        SELECT category, article_id, title, reliability_score, source_link
+        FROM (
+            SELECT category, article_id, title, reliability_score, source_link,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY category
+                       ORDER BY reliability_score DESC, article_id
+                   ) AS rn
+            FROM articles
+            WHERE category IS NOT NULL
+        ) ranked
+        WHERE rn <= :per_category
+        ORDER BY category, rn;
+    """)
+    rows = db.session.execute(query, {"per_category": RECOMMENDED_PER_CATEGORY}).fetchall()
+
+    recommended = []
+    for cat, aid, title, score, link in rows:
+        recommended.append({
+            "id": aid,
+            "title": title,
+            "reliability_score": float(score) if score else None,
+            "credibility_label": SCORE_LABELS.get(int(score or 0), "未知"),
+            "source_link": link
+        })
+    return recommended
+
+
+def _load_ranking():
+    query = text("""
+        SELECT article_id, title, category, published_time, reliability_score, source_link
+        FROM articles
+        WHERE reliability_score IS NOT NULL
+        ORDER BY reliability_score DESC
+        LIMIT 10;
+    """)
+    rows = db.session.execute(query).fetchall()
+
+    ranking = []
+    for r in rows:
+        ranking.append({
+            "id": r[0],
+            "title": r[1],
+            "category": r[2],
+            "published_time": _format_time(r[3]),
+            "reliability_score": float(r[4]),
+            "credibility_label": SCORE_LABELS.get(int(r[4]), "未知"),
+            "source_link": r[5],
+        })
+    return ranking
+
+
+def trending_feed():
+    return get_feed_cache().get("trending", _load_trending)
+
+
+def recommended_feed():
+    return get_feed_cache().get("recommended", _load_recommended)
+
+
+def ranking_feed():
+    return get_feed_cache().get("ranking", _load_ranking)
+
+
 # ============================================================
 # 🔥 熱門趨勢
 # ============================================================
 @bp.route("/trending", methods=["GET"])
 def get_trending_articles():
     try:
-        query = text("""
-            SELECT article_id, title, category, reliability_score, media_name, source_link
-            FROM articles
-            WHERE reliability_score IS NOT NULL
-            ORDER BY reliability_score DESC
-            LIMIT 3;
-        """)
-        result = db.session.execute(query)
-        rows = result.fetchall()
-
-        trending = []
-        for r in rows:
-            trending.append({
-                "id": r[0],
-                "title": r[1],
-                "category": r[2],
-                "reliability_score": float(r[3]),
-                "credibility_label": SCORE_LABELS.get(int(r[3]), "未知"),
-                "media_name": r[4],
-                "source_link": r[5],
-                "summary": f"此文章由 {r[4]} 提供，可信度 {SCORE_LABELS.get(int(r[3]), '未知')}。",
-            })
-
-        return jsonify(trending), 200
+        return jsonify(trending_feed()), 200
 
     except Exception as e:
         print("❌ 熱門趨勢查詢失敗:", e)
@@ -60,32 +169,7 @@ def get_trending_articles():
 @bp.route("/recommended", methods=["GET"])
 def get_recommended_articles():
     try:
-        query = text("""
-            SELECT category, article_id, title, reliability_score, source_link
-            FROM articles
-            WHERE category IS NOT NULL
-            ORDER BY category, reliability_score DESC;
-        """)
-        result = db.session.execute(query)
-        rows = result.fetchall()
-
-        categories = {}
-        for cat, aid, title, score, link in rows:
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append({
-                "id": aid,
-                "title": title,
-                "reliability_score": float(score) if score else None,
-                "credibility_label": SCORE_LABELS.get(int(score or 0), "未知"),
-                "source_link": link
-            })
-
-        flat_list = []
-        for cat, articles in categories.items():
-            flat_list.extend(articles[:3])
-
-        return jsonify(flat_list), 200
+        return jsonify(recommended_feed()), 200
 
     except Exception as e:
         print("❌ 推薦文章查詢失敗:", e)
@@ -98,29 +182,7 @@ def get_recommended_articles():
 @bp.route("/ranking", methods=["GET"])
 def get_ranking_articles():
     try:
-        query = text("""
-            SELECT article_id, title, category, published_time, reliability_score, source_link
-            FROM articles
-            WHERE reliability_score IS NOT NULL
-            ORDER BY reliability_score DESC
-            LIMIT 10;
-        """)
-        result = db.session.execute(query)
-        rows = result.fetchall()
-
-        ranking = []
-        for r in rows:
-            ranking.append({
-                "id": r[0],
-                "title": r[1],
-                "category": r[2],
-                "published_time": r[3].strftime("%Y-%m-%d %H:%M") if r[3] else "",
-                "reliability_score": float(r[4]),
-                "credibility_label": SCORE_LABELS.get(int(r[4]), "未知"),
-                "source_link": r[5],
-            })
-
-        return jsonify(ranking), 200
+        return jsonify(ranking_feed()), 200
 
     except Exception as e:
         print("❌ 排行榜查詢失敗:", e)
@@ -137,16 +199,41 @@ def search_articles():
         category = request.args.get("category", "").strip()
         confidence = request.args.get("confidence", "").strip()
         time_filter = request.args.get("time_filter", "").strip()
+        # 有關鍵字時預設依相關度排序，sort=latest 則依發布時間
+        sort = request.args.get("sort", "relevance" if keyword else "latest").strip()
+        stream = wants_stream(request)
+
+        engine = db.engine
+        is_pg = engine.dialect.name == "postgresql"
+        like = "ILIKE" if is_pg else "LIKE"
 
         # SQL 組合條件
         conditions = []
         params = {}
+        rank_expr = "0"
+        fallback_ranks = None
 
         if keyword:
-            conditions.append("(title ILIKE :kw OR content ILIKE :kw)")
             params["kw"] = f"%{keyword}%"
+            tsquery = build_tsquery(keyword) if is_pg else None
+            if is_pg and tsquery and has_search_column(engine):
+                # 先以 GIN 索引縮小候選，再以 ILIKE 確認，結果與原本相同
+                conditions.append("search_bigrams @@ CAST(:tsq AS tsquery)")
+                conditions.append("(title ILIKE :kw OR content ILIKE :kw)")
+                params["tsq"] = tsquery
+                rank_expr = f"(CASE WHEN title ILIKE :kw THEN {TITLE_WEIGHT} ELSE 0 END) + ts_rank(search_bigrams, CAST(:tsq AS tsquery))"
+            elif is_pg:
+                conditions.append("(title ILIKE :kw OR content ILIKE :kw)")
+                rank_expr = f"(CASE WHEN title ILIKE :kw THEN {TITLE_WEIGHT} ELSE 0 END)"
+            else:
+                # SQLite 等環境：行程內二元組索引
+                fallback_ranks = search_ranks(keyword, engine)
+                if not fallback_ranks:
+                    return ndjson_response([], None) if stream else page_response([], None, request.args)
+                conditions.append("article_id IN :ids")
+                params["ids"] = list(fallback_ranks)
         if category:
-            conditions.append("category ILIKE :cat")
+            conditions.append(f"category {like} :cat")
             params["cat"] = f"%{category}%"
 
         if confidence:
@@ -166,30 +253,78 @@ def search_articles():
             params["start_time"] = datetime.now() - timedelta(days=30)
 
         where_clause = " AND ".join(conditions) if conditions else "TRUE"
-
-        query = text(f"""
-            SELECT article_id, title, category, media_name, published_time, reliability_score, source_link
+        by_relevance = sort == "relevance" and bool(keyword)
+
+        # keyset 分頁：排序鍵為 (相關度,) 發布時間, article_id；發布時間為 NULL 者視為最舊
+        # 串流模式與未帶 limit / cursor 的舊版用戶端不限筆數；串流也不需要多取一筆來判斷下一頁
+        limit = stream_limit(request.args, parse_limit) if stream else page_limit(request.args)
+        fetch = None if limit is None else limit + (0 if stream else 1)
+        key_cols = ["rank", "sort_time", "article_id"] if by_relevance else ["sort_time", "article_id"]
+        try:
+            cursor = decode_cursor(request.args.get("cursor"), len(key_cols))
+            if cursor is not None and is_pg:
+                # SQLite 的時間以字串儲存與比較，游標保留原字串即可
+                cursor[-2] = cursor_time(cursor[-2])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        params["floor_time"] = FLOOR_TIME
+        inner = f"""
+            SELECT article_id, title, category, media_name, published_time, reliability_score, source_link,
+                   CAST({rank_expr} AS FLOAT) AS rank,
+                   COALESCE(published_time, :floor_time) AS sort_time
             FROM articles
             WHERE {where_clause}
-            ORDER BY published_time DESC;
-        """)
-        result = db.session.execute(query, params)
-        rows = result.fetchall()
-
-        articles = []
-        for r in rows:
-            articles.append({
-                "id": r[0],
-                "title": r[1],
-                "category": r[2],
-                "media_name": r[3],
-                "published_time": r[4].strftime("%Y-%m-%d %H:%M") if r[4] else "",
-                "reliability_score": float(r[5] or 0),
-                "credibility_label": SCORE_LABELS.get(int(r[5] or 0), "未知"),
-                "source_link": r[6],
-            })
-
-        return jsonify(articles), 200
+        """
+        order_by = ", ".join(f"s.{c} DESC" for c in key_cols)
+
+        def serialize(r):
+            return _search_row(r, fallback_ranks.get(r[0], 0.0) if fallback_ranks is not None else r[7])
+
+        if fallback_ranks is not None and by_relevance:
+            # 行程內索引的相關度無法在 SQL 中排序，候選集合已由索引限定，改在此排序與切頁
+            query = text(f"SELECT * FROM ({inner}) s").bindparams(bindparam("ids", expanding=True))
+            rows = [
+                (*r[:7], fallback_ranks.get(r[0], 0.0), r[8])
+                for r in db.session.execute(query, params).fetchall()
+            ]
+            rows.sort(key=lambda r: (r[7], _sort_key_time(r[8]), r[0]), reverse=True)
+            if cursor is not None:
+                c_key = (cursor[0], _sort_key_time(cursor[1]), cursor[2])
+                rows = [r for r in rows if (r[7], _sort_key_time(r[8]), r[0]) < c_key]
+            rows = rows[:fetch]
+            if stream:
+                return ndjson_response(rows, serialize)
+        else:
+            seek = ""
+            if cursor is not None:
+                names = [f"c{i}" for i in range(len(key_cols))]
+                seek = "WHERE ({}) < ({})".format(
+                    ", ".join(f"s.{c}" for c in key_cols), ", ".join(f":{n}" for n in names)
+                )
+                params.update(zip(names, cursor))
+            limit_sql = ""
+            if fetch is not None:
+                limit_sql = "LIMIT :limit"
+                params["limit"] = fetch
+            query = text(f"SELECT * FROM ({inner}) s {seek} ORDER BY {order_by} {limit_sql}")
+            if fallback_ranks is not None:
+                query = query.bindparams(bindparam("ids", expanding=True))
+            if stream:
+                return ndjson_response(iter_query(query, params), serialize)
+            rows = db.session.execute(query, params).fetchall()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            key = [last[8], last[0]]
+            if by_relevance:
+                key.insert(0, float(last[7] or 0))
+            next_cursor = encode_cursor(key)
+
+        articles = [serialize(r) for r in rows]
+        return page_response(articles, next_cursor, request.args)
 
     except Exception as e:
         print("❌ 搜尋文章失敗:", e)
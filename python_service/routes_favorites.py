@@ -2,43 +2,76 @@ from flask import Blueprint, request, jsonify
 from models import db
 from sqlalchemy import text
 from datetime import datetime
+from pagination import FLOOR_TIME, cursor_time, decode_cursor, encode_cursor, page_limit, page_response, parse_limit
+from streaming import iter_query, ndjson_response, stream_limit, wants_stream
 
 bp = Blueprint('favorites', __name__)
 
+
+def _favorite_row(r):
+    favorited_time = r[4]
+    favorited_time_str = (
+        favorited_time.strftime("%Y-%m-%d %H:%M:%S")
+        if isinstance(favorited_time, datetime)
+        else str(favorited_time)
+    )
+    return {
+        "article_id": r[0],
+        "title": r[1],
+        "media_name": r[2],
+        "source_link": r[3],
+        "favorited_at": favorited_time_str,
+        "reliability_score": r[5]
+    }
+
+
 # ✅ 取得使用者收藏清單
 @bp.route('/favorites/<int:user_id>', methods=['GET'])
 def get_favorites(user_id):
     try:
-        query = text("""
+        # keyset 分頁：依 (收藏時間, favorite_id) 由新到舊；串流模式預設不限筆數
+        stream = wants_stream(request)
+        # 未帶 limit / cursor 的舊版用戶端不限筆數
+        limit = stream_limit(request.args, parse_limit) if stream else page_limit(request.args)
+        params = {"user_id": user_id, "floor_time": FLOOR_TIME}
+        seek = ""
+        try:
+            cursor = decode_cursor(request.args.get("cursor"), 2)
+            if cursor is not None:
+                # 收藏時間為 NULL 者以 FLOOR_TIME 排序（視為最舊）；SQLite 的時間以字串比較，保留原字串
+                seek = "AND (COALESCE(f.favorited_at, :floor_time), f.favorite_id) < (:c_time, :c_id)"
+                params["c_time"] = cursor_time(cursor[0]) if db.engine.dialect.name == "postgresql" else cursor[0]
+                params["c_id"] = cursor[1]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        limit_sql = "LIMIT :limit" if limit is not None else ""
+        query = text(f"""
             SELECT a.article_id, a.title, a.media_name, a.source_link, 
-                   f.favorited_at, a.reliability_score
+                   f.favorited_at, a.reliability_score, f.favorite_id,
+                   COALESCE(f.favorited_at, :floor_time) AS sort_time
             FROM favorites f
             JOIN articles a ON f.article_id = a.article_id
-            WHERE f.user_id = :user_id
-            ORDER BY f.favorited_at DESC;
+            WHERE f.user_id = :user_id {seek}
+            ORDER BY sort_time DESC, f.favorite_id DESC
+            {limit_sql};
         """)
-        result = db.session.execute(query, {"user_id": user_id})
+        if stream:
+            params["limit"] = limit
+            return ndjson_response(iter_query(query, params), _favorite_row)
+
+        if limit is not None:
+            params["limit"] = limit + 1
+        result = db.session.execute(query, params)
         rows = result.fetchall()
 
-        favorites = []
-        for r in rows:
-            favorited_time = r[4]
-            favorited_time_str = (
-                favorited_time.strftime("%Y-%m-%d %H:%M:%S")
-                if isinstance(favorited_time, datetime)
-                else str(favorited_time)
-            )
-
-            favorites.append({
-                "article_id": r[0],
-                "title": r[1],
-                "media_name": r[2],
-                "source_link": r[3],
-                "favorited_at": favorited_time_str,
-                "reliability_score": r[5]
-            })
-
-        return jsonify(favorites), 200, {"Content-Type": "application/json"}
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][7], rows[-1][6]])
+
+        favorites = [_favorite_row(r) for r in rows]
+        return page_response(favorites, next_cursor, request.args)
 
     except Exception as e:
         print("❌ 讀取收藏失敗:", e)
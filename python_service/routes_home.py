@@ -0,0 +1,61 @@
+"""
+首頁一次載入 API
+/api/home 合併 /api/trending、/api/recommended、/api/ranking 與 /api/fake-news-stats，
+讓 App 首頁只需一次往返：
+- 查證統計（讀取檔案彙總，不使用資料庫）在背景執行緒計算
+- 同時以本請求的同一個資料庫連線依序取得三個文章列表（多半直接命中 FeedCache）
+- 回傳各區塊的快取秒數（cacheAges），單一區塊失敗不影響其他區塊
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, request, jsonify
+
+from models import db
+from feed_cache import get_feed_cache
+from routes_articles import ranking_feed, recommended_feed, trending_feed
+from routes_stats import parse_days, build_fake_news_stats
+from verification_loader import get_store
+
+bp = Blueprint('home', __name__)
+
+# 查證統計等待上限（秒），逾時則該區塊回傳 null
+STATS_TIMEOUT = 10
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='home-stats')
+
+_FEEDS = (
+    ('trending', trending_feed),
+    ('recommended', recommended_feed),
+    ('ranking', ranking_feed),
+)
+
+
+@bp.get('/home')
+def home():
+    days = parse_days(request.args.get('days'))
+    stats_future = _executor.submit(build_fake_news_stats, days)
+
+    payload = {'ok': True}
+    errors = {}
+    cache = get_feed_cache()
+    for name, loader in _FEEDS:
+        try:
+            payload[name] = loader()
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ 首頁區塊 {name} 查詢失敗:", e)
+            payload[name] = []
+            errors[name] = str(e)
+
+    try:
+        payload['stats'] = stats_future.result(timeout=STATS_TIMEOUT)
+    except Exception as e:
+        print("❌ 首頁統計產生失敗:", e)
+        payload['stats'] = None
+        errors['stats'] = str(e) or type(e).__name__
+
+    payload['cacheAges'] = {name: cache.age(name) for name, _ in _FEEDS}
+    payload['cacheAges']['stats'] = get_store().age_seconds()
+    if errors:
+        payload['errors'] = errors
+    return jsonify(payload)
@@ -3,43 +3,80 @@ from flask import Blueprint, request, jsonify
 from models import db
 from sqlalchemy import text
 from datetime import datetime
+from pagination import FLOOR_TIME, cursor_time, decode_cursor, encode_cursor, page_limit, page_response, parse_limit
+from streaming import iter_query, ndjson_response, stream_limit, wants_stream
 
 bp = Blueprint('search_logs', __name__)
 
+
+def _history_row(r):
+    ts = r['last_viewed_at']
+    ts_str = ts.strftime("%Y-%m-%d %H:%M:%S") if isinstance(ts, datetime) else ""
+    return {
+        "article_id": r["article_id"],
+        "title": r["title"],
+        "media_name": r["media_name"],
+        "source_link": r["source_link"],
+        "viewed_at": ts_str,
+        "reliability_score": r["reliability_score"]
+    }
+
+
 # ✅ 取得使用者瀏覽歷史（依最近一次 searched_at 排序）
 @bp.route('/history/<int:user_id>', methods=['GET'])
 def get_history(user_id):
     try:
-        query = text("""
+        # keyset 分頁：依 (最近瀏覽時間, article_id) 由新到舊；串流模式預設不限筆數
+        stream = wants_stream(request)
+        # 未帶 limit / cursor 的舊版用戶端不限筆數
+        limit = stream_limit(request.args, parse_limit) if stream else page_limit(request.args)
+        params = {"user_id": user_id, "floor_time": FLOOR_TIME}
+        having = ""
+        try:
+            cursor = decode_cursor(request.args.get("cursor"), 2)
+            if cursor is not None:
+                # 瀏覽時間為 NULL 者以 FLOOR_TIME 排序（視為最舊）；SQLite 的時間以字串比較，保留原字串
+                having = "HAVING (COALESCE(MAX(s.searched_at), :floor_time), a.article_id) < (:c_time, :c_id)"
+                params["c_time"] = cursor_time(cursor[0]) if db.engine.dialect.name == "postgresql" else cursor[0]
+                params["c_id"] = cursor[1]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        limit_sql = "LIMIT :limit" if limit is not None else ""
+        query = text(f"""
             SELECT
                 a.article_id,
                 a.title,
                 a.media_name,
                 a.source_link,
                 MAX(s.searched_at) AS last_viewed_at,
-                a.reliability_score
+                a.reliability_score,
+                COALESCE(MAX(s.searched_at), :floor_time) AS sort_time
             FROM search_logs s
             JOIN articles a ON s.article_id = a.article_id
             WHERE s.user_id = :user_id
             GROUP BY a.article_id, a.title, a.media_name, a.source_link, a.reliability_score
-            ORDER BY last_viewed_at DESC;
+            {having}
+            ORDER BY sort_time DESC, a.article_id DESC
+            {limit_sql};
         """)
-        result = db.session.execute(query, {"user_id": user_id}).mappings().all()
-
-        history = []
-        for r in result:
-            ts = r['last_viewed_at']
-            ts_str = ts.strftime("%Y-%m-%d %H:%M:%S") if isinstance(ts, datetime) else ""
-            history.append({
-                "article_id": r["article_id"],
-                "title": r["title"],
-                "media_name": r["media_name"],
-                "source_link": r["source_link"],
-                "viewed_at": ts_str,
-                "reliability_score": r["reliability_score"]
-            })
-
-        return jsonify(history), 200
+        if stream:
+            params["limit"] = limit
+            rows = (r._mapping for r in iter_query(query, params))
+            return ndjson_response(rows, _history_row)
+
+        if limit is not None:
+            params["limit"] = limit + 1
+        result = db.session.execute(query, params).mappings().all()
+
+        next_cursor = None
+        if limit is not None and len(result) > limit:
+            result = result[:limit]
+            last = result[-1]
+            next_cursor = encode_cursor([last["sort_time"], last["article_id"]])
+
+        history = [_history_row(r) for r in result]
+        return page_response(history, next_cursor, request.args)
     except Exception as e:
         print("❌ 讀取瀏覽紀錄失敗:", e)
         return jsonify({"error": str(e)}), 500
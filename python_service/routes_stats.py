@@ -1,52 +1,20 @@
 from flask import Blueprint, request, jsonify
-import requests
-import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
-from email.utils import parsedate_to_datetime
-from collections import Counter
-from verification_loader import get_verification_stats, get_daily_distribution
+from datetime import datetime, date, timedelta
+from news_keywords import CATEGORY_KEYWORDS, CHANNEL_LABELS
+from news_feed import get_refresher
+import weekly_reports
+from weekly_reports import week_start_of
+from verification_loader import get_window_stats
+from http_fetcher import FetchError, HTML_CONTENT_TYPES, get_fetcher
+from credibility import score_page
+from daily_crawler import get_crawl_status
 
 bp = Blueprint('stats', __name__)
 
 
-def _fetch_google_news_rss(max_items: int = 100):
-    # Google News Taiwan Chinese RSS
-    url = 'https://news.google.com/rss?hl=zh-TW&gl=TW&ceid=TW:zh-Hant'
-    try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        root = ET.fromstring(resp.content)
-        items = []
-        for item in root.findall('.//item')[:max_items]:
-            title_el = item.find('title')
-            pub_el = item.find('pubDate')
-            title = title_el.text if title_el is not None else ''
-            pub_date = pub_el.text if pub_el is not None else ''
-            items.append({
-                'title': title,
-                'pubDate': pub_date,
-            })
-        return items
-    except Exception:
-        return []
-
-
-def _categorize_titles(titles):
-    # 簡單的關鍵字類別對應
-    mapping = {
-        '政治': ['選舉', '總統', '立法院', '政治', '政黨', '立委', '國會', '藍營', '綠營'],
-        '健康': ['確診', '疫苗', '疫情', '醫院', '醫療', '衛福', '登革熱', '減肥', '瘦身', '減重', '健康', '營養', '飲食', '運動', '健身', '減脂', '增肌', '蛋白質', '維生素', '保健', '養生', '食譜', '菜單'],
-        '經濟': ['股', '台積電', '經濟', '投資', '通膨', '通縮', '銀行', '匯率'],
-        '科技': ['AI', '人工智慧', '科技', '晶片', '蘋果', '微軟', 'Google', '特斯拉'],
-        '社會': ['警方', '警察', '詐騙', '車禍', '火警', '社會', '糾紛'],
-        '國際': ['中國', '美國', '日本', '韓國', '俄羅斯', '以色列', '烏克蘭', '歐盟'],
-    }
-    counts = {k: 0 for k in mapping}
-    for t in titles:
-        for cat, keys in mapping.items():
-            if any(k in t for k in keys):
-                counts[cat] += 1
-                break
+def _category_percentages(counts):
+    # counts: {類別: 命中標題數}
+    counts = {k: counts.get(k, 0) for k in CATEGORY_KEYWORDS}
     total = sum(counts.values()) or 1
     top = sorted(({'name': k, 'percentage': int(v * 100 / total)} for k, v in counts.items()), key=lambda x: x['percentage'], reverse=True)
     # 只取有比例的
@@ -54,29 +22,9 @@ def _categorize_titles(titles):
     return top
 
 
-def _infer_channels(titles):
-    # 以標題關鍵詞推估來源通道分佈（社群/私人群組/傳統媒體）
-    social_keys = ['Facebook', '臉書', 'FB', 'X ', 'Twitter', 'IG', 'Instagram', '社群', 'YouTube', 'YT']
-    private_keys = ['LINE', 'Telegram', '群組', '私訊', '轉傳', '社團']
-
-    counts = {'社群媒體': 0, '私人訊息群組': 0, '傳統媒體/網站': 0}
-    for t in titles:
-        matched = False
-        for k in social_keys:
-            if k.lower() in t.lower():
-                counts['社群媒體'] += 1
-                matched = True
-                break
-        if matched:
-            continue
-        for k in private_keys:
-            if k.lower() in t.lower():
-                counts['私人訊息群組'] += 1
-                matched = True
-                break
-        if not matched:
-            counts['傳統媒體/網站'] += 1
-
+def _channel_percentages(counts):
+    # 以標題關鍵詞推估的來源通道分佈（社群/私人群組/傳統媒體）
+    counts = {k: counts.get(k, 0) for k in CHANNEL_LABELS}
     total = sum(counts.values()) or 1
     # 百分比並確保總和為 100（最後一項補差）
     labels = list(counts.keys())
@@ -95,27 +43,11 @@ def _infer_channels(titles):
     ]
 
 
-def _sentiment_from_titles(titles):
+def _sentiment_percentages(pos, neg):
     """非常輕量的情感傾向估計：
-    - 以關鍵詞粗略計數，無模型依賴
+    - 以關鍵詞粗略計數（正面/負面命中標題數），無模型依賴
     - 回傳百分比分佈，並確保總和為 100
     """
-    positive = [
-        '成長', '創新', '突破', '改善', '進步', '利多', '獲利', '成功', '上揚', '上升', '擴張', '獲獎', '勝選', '和平'
-    ]
-    negative = [
-        '暴跌', '崩盤', '危機', '裁員', '虧損', '下滑', '爭議', '指控', '醜聞', '災害', '戰爭', '衝突', '停電', '疫情'
-    ]
-
-    pos = 0
-    neg = 0
-    for t in titles:
-        tl = t.lower()
-        if any(k.lower() in tl for k in positive):
-            pos += 1
-        if any(k.lower() in tl for k in negative):
-            neg += 1
-
     total_hits = pos + neg
     if total_hits == 0:
         # 若沒有命中任何關鍵詞，視為大多中性
@@ -136,24 +68,25 @@ def _sentiment_from_titles(titles):
     return {'neutral': neu, 'negative': n, 'positive': p}
 
 
-@bp.get('/fake-news-stats')
-def fake_news_stats():
-    import sys
-    sys.stdout.flush()
-    sys.stderr.write("[DEBUG-ERR] /fake-news-stats API 被調用\n")
-    sys.stderr.flush()
-    print("[DEBUG-OUT] /fake-news-stats API 被調用", flush=True)
-    # 改用真實查證資料
-    verified_count, unverified_count, verified_items, unverified_items = get_verification_stats()
-    print(f"[DEBUG-OUT] verified_count={verified_count}, unverified_count={unverified_count}", flush=True)
-    sys.stderr.write(f"[DEBUG-ERR] verified_count={verified_count}, unverified_count={unverified_count}\n")
-    sys.stderr.flush()
-    
-
-    # 只統計近7天的資料
-    verified_daily = get_daily_distribution(verified_items, 7)
-    unverified_daily = get_daily_distribution(unverified_items, 7)
-    # 近7天總數
+# 統計區間可查詢的最長天數
+MAX_STATS_DAYS = 90
+
+
+def parse_days(raw, default=7):
+    """解析統計區間天數參數（?days=），無效時回傳 default，並限制在 1～MAX_STATS_DAYS"""
+    try:
+        days = int(raw)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(MAX_STATS_DAYS, days))
+
+
+def build_fake_news_stats(days: int = 7):
+    """由查證資料的每日彙總組出首頁統計（近 N 天）"""
+    window = get_window_stats(days)
+    verified_daily = window['daily']['verified']
+    unverified_daily = window['daily']['unverified']
+    # 近 N 天總數
     verified_week = sum(verified_daily.values())
     unverified_week = sum(unverified_daily.values())
     total_week = verified_week + unverified_week
@@ -162,57 +95,49 @@ def fake_news_stats():
     else:
         ai_accuracy = round((verified_week / total_week) * 100)
 
-    # 週報圖表資料
-    now = datetime.utcnow()
-    start = (now - timedelta(days=6)).date()
+    # 週報圖表資料（由舊到新）
+    today = date.today()
     weekly = []
-    for i in range(7):
-        d = start + timedelta(days=i)
-        day_offset = 6 - i
-        verified = verified_daily.get(day_offset, 0)
-        suspicious = unverified_daily.get(day_offset, 0)
+    for day_offset in range(days - 1, -1, -1):
+        d = today - timedelta(days=day_offset)
         weekly.append({
             'day': ['一','二','三','四','五','六','日'][d.weekday()],
-            'verified': verified,
-            'suspicious': suspicious,
+            'date': d.isoformat(),
+            'verified': verified_daily.get(day_offset, 0),
+            'suspicious': unverified_daily.get(day_offset, 0),
         })
 
-    # 只用近7天的標題做分類
-    week_items = []
-    for item in verified_items + unverified_items:
-        crawled_at = item.get('crawled_at')
-        if crawled_at:
-            try:
-                crawled_time = datetime.fromisoformat(crawled_at)
-                if (datetime.utcnow().date() - crawled_time.date()).days < 7:
-                    week_items.append(item)
-            except Exception:
-                continue
-        else:
-            week_items.append(item)  # 沒有時間戳的也算進來
-    all_titles = [item.get('title', '') for item in week_items if item.get('title')]
-    top_categories = _categorize_titles(all_titles)
-    propagation_channels = _infer_channels(all_titles)
-    sentiment = _sentiment_from_titles(all_titles)
     meta = {
         'fetchedAt': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
         'source': 'Verification Database (projectt/reports)',
         'sourceCount': total_week,
-        'headlineSamples': all_titles[:3],
+        'days': days,
+        'headlineSamples': window['titles'],
+    }
+    return {
+        'totalVerified': verified_week,
+        'totalSuspicious': unverified_week,
+        'aiAccuracy': ai_accuracy,
+        'weeklyReports': weekly,
+        'topCategories': _category_percentages(window['categories']),
+        'propagationChannels': _channel_percentages(window['channels']),
+        'sentiment': _sentiment_percentages(window['positive'], window['negative']),
+        'meta': meta,
     }
-    return jsonify({
-        'ok': True,
-        'stats': {
-            'totalVerified': verified_week,
-            'totalSuspicious': unverified_week,
-            'aiAccuracy': ai_accuracy,
-            'weeklyReports': weekly,
-            'topCategories': top_categories,
-            'propagationChannels': propagation_channels,
-            'sentiment': sentiment,
-            'meta': meta,
-        }
-    })
+
+
+@bp.get('/fake-news-stats')
+def fake_news_stats():
+    # 改用真實查證資料；days 可指定 30、90 天等區間
+    days = parse_days(request.args.get('days'))
+    stats = build_fake_news_stats(days)
+    return jsonify({'ok': True, 'stats': stats})
+
+
+@bp.get('/crawler-status')
+def crawler_status():
+    # 每日爬蟲最近一次執行摘要與各關鍵字的狀態、耗時
+    return jsonify({'ok': True, 'status': get_crawl_status()})
 
 
 @bp.post('/analyze-news')
@@ -222,54 +147,29 @@ def analyze_news():
     if not url:
         return jsonify({'ok': False, 'error': '缺少 url'}), 400
     try:
-        resp = requests.get(url, timeout=10, headers={'User-Agent': 'Mozilla/5.0'})
-        resp.raise_for_status()
-        html = resp.text
-        # 極簡「可疑程度」計算：標題黏著、驚嘆號、全形字、疑似釣魚詞彙
-        suspicious_keywords = ['震驚', '驚人', '點進來', '快看', '曝光', '賺錢', '限時', '免費', '點我']
-        exclam = html.count('!') + html.count('！')
-        upper_ratio = sum(1 for c in html if c.isupper()) / max(1, len(html))
-        keyword_hits = sum(1 for k in suspicious_keywords if k in html)
-        score = min(1.0, (exclam / 30.0) * 0.4 + upper_ratio * 0.3 + (keyword_hits / 10.0) * 0.3)
-
-        return jsonify({'ok': True, 'analysis': {
-            'length': len(html),
-            'exclamationCount': exclam,
-            'uppercaseRatio': round(upper_ratio, 4),
-            'keywordHits': keyword_hits,
-            'suspicionScore': round(score, 3),
-            'verdict': '可疑' if score > 0.6 else ('需留意' if score > 0.4 else '正常')
-        }})
+        resp = get_fetcher().fetch(url, accept=HTML_CONTENT_TYPES)
+        # 極簡「可疑程度」計算：驚嘆號、大寫字母比例、疑似釣魚詞彙（規則見 credibility.score_page）
+        return jsonify({'ok': True, 'analysis': score_page(resp.text())})
+    except FetchError as e:
+        # 對方網站錯誤、逾時、檔案過大或不是網頁
+        return jsonify({'ok': False, 'error': str(e)}), 502
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
 
 
-@bp.get('/full-report')
-def full_report():
-    # 生成完整報告（3 分頁）所需的動態資料與文字，來源為 Google News RSS
-    items = _fetch_google_news_rss(120)
-    titles = [i['title'] for i in items if i.get('title')]
-    top_categories = _categorize_titles(titles)
+def _build_report_data(feed, now):
+    """由 RSS 快照計算本週報告所需的統計（寫入週報快照的內容）"""
+    titles = feed.titles
 
     # 週別統計
-    now = datetime.utcnow()
     start = (now - timedelta(days=6)).date()
-    per_day_counts = {d: 0 for d in [(start + timedelta(days=i)) for i in range(7)]}
-    for it in items:
-        raw = it.get('pubDate')
-        try:
-            dt = parsedate_to_datetime(raw) if raw else None
-            if dt is None:
-                continue
-            d = dt.date()
-            if d in per_day_counts:
-                per_day_counts[d] += 1
-        except Exception:
-            continue
+    per_day_counts = feed.per_day_counts
     weekly = []
+    news_count = 0
     for i in range(7):
         d = start + timedelta(days=i)
         count = per_day_counts.get(d, 0)
+        news_count += count
         suspicious = max(3, int(count * 0.6) or 5)
         verified = max(2, int(suspicious * 0.35))
         weekly.append({
@@ -283,81 +183,72 @@ def full_report():
     # 計算 AI 辨識率：已驗證的假訊息佔總偵測數量的百分比
     total_detected = total_verified + total_suspicious
     ai_accuracy = round((total_verified / total_detected * 100)) if total_detected > 0 else 0
-    line_series = [float((w['suspicious'] + w['verified'])) for w in weekly]
-    channels = _infer_channels(titles)
-    sent = _sentiment_from_titles(titles)
 
-    meta = {
-        'fetchedAt': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+    return {
+        'reportDate': now.date().isoformat(),
+        'fetchedAt': (feed.fetched_at or now).isoformat(timespec='seconds') + 'Z',
         'source': 'Google News RSS (zh-TW)',
         'sourceCount': len(titles),
         'headlineSamples': titles[:3],
+        'newsCount': news_count,
+        'totalVerified': total_verified,
+        'totalSuspicious': total_suspicious,
+        'aiAccuracy': ai_accuracy,
+        'weeklyReports': weekly,
+        'line': [float((w['suspicious'] + w['verified'])) for w in weekly],
+        'categories': _category_percentages(feed.categories),
+        'channels': _channel_percentages(feed.channels),
+        'sentiment': _sentiment_percentages(feed.positive, feed.negative),
     }
 
-    # 動態敘述
-    def cats_to_lines(cats):
-        return '\n'.join([f"* {c['name']} ({c['percentage']}%)" for c in cats]) or '（本週無顯著主題）'
-
-    detection_title = f"假訊息監測完整報告 (週報) - {now.year}/{str(now.month).zfill(2)}/{str(now.day).zfill(2)}"
-    detection_content = (
-        f"本週共偵測到 **{int(sum(line_series))}** 條疑似假訊息，其中 **{total_verified} 條**經 AI 交叉比對後確認為假消息，AI 準確率達 **{ai_accuracy}%**。\n\n"
-        f"**熱門趨勢分析:**\n{cats_to_lines(top_categories)}\n\n"
-        f"**建議:** 立即對高傳播風險的假訊息進行人工複核和澄清。"
-    )
-
-    trend_title = '新聞趨勢與熱度完整分析'
-    trend_content = (
-        f"本週新聞總量相較上週增長 **15%**。熱度最高的關鍵詞如下：\n{cats_to_lines(top_categories)}\n\n"
-        f"**情感分佈:**\n* 中性: {sent['neutral']}%\n* 負面: {sent['negative']}%\n* 正面: {sent['positive']}%\n\n"
-        f"**預測:** 預計下週主題將持續主導輿論，建議準備相關事實查核素材，以防衍生假消息。"
-    )
-
-    propagation_title = '假訊息傳播網路完整報告'
-    propagation_lines = '\n'.join([f"* {c['channel']} ({c['percentage']}%)" for c in channels])
-    # 依通道比例動態選出前兩名當作本週主要風險來源
-    top_channels = sorted(channels, key=lambda c: c.get('percentage', 0), reverse=True)
-    if len(top_channels) >= 2:
-        risk_label = f"「{top_channels[0]['channel']}」和「{top_channels[1]['channel']}」"
-    elif len(top_channels) == 1:
-        risk_label = f"「{top_channels[0]['channel']}」"
+
+def _parse_week(raw):
+    try:
+        return week_start_of(date.fromisoformat(raw))
+    except (TypeError, ValueError):
+        return None
+
+
+@bp.get('/full-report')
+def full_report():
+    # 生成完整報告（3 分頁），來源為 Google News RSS
+    # 本週統計每週保存一份快照（RSS 更新時覆寫），上週快照用來計算真實的週增減幅度
+    week = request.args.get('week')
+    if week:
+        week_start = _parse_week(week)
+        if week_start is None:
+            return jsonify({'ok': False, 'error': 'week 格式應為 YYYY-MM-DD'}), 400
+        data = weekly_reports.get_snapshot(week_start)
+        if data is None:
+            return jsonify({'ok': False, 'error': '找不到該週週報'}), 404
+        meta_extra = {'persisted': True}
     else:
-        risk_label = "主要通道"
-
-    propagation_content = (
-        f"傳播速度比上週加快 **25%**。\n\n**主要傳播途徑分佈:**\n{propagation_lines}\n\n"
-        f"**高風險通道:** {risk_label} 被識別為本週較主要的假訊息擴散來源。"
-    )
-
-    report = {
-        'tabs': [
-            {
-                'key': 'detection',
-                'title': detection_title,
-                'content': detection_content,
-                'chartType': 'bar',
-                'weeklyReports': weekly,
-                'meta': meta,
-            },
-            {
-                'key': 'trend',
-                'title': trend_title,
-                'content': trend_content,
-                'chartType': 'line',
-                'line': line_series,
-                'categories': top_categories,
-                'meta': meta,
-            },
-            {
-                'key': 'propagation',
-                'title': propagation_title,
-                'content': propagation_content,
-                'chartType': 'pie',
-                'channels': channels,
-                'meta': meta,
-            },
-        ]
-    }
+        # RSS 由背景執行緒定期更新，這裡只讀取記憶體中的快照（過期時先回傳舊資料）
+        refresher = get_refresher()
+        feed = refresher.snapshot()
+        now = datetime.utcnow()
+        data, persisted = weekly_reports.ensure_current_week(feed.fetched_at, lambda: _build_report_data(feed, now), now)
+        week_start = date.fromisoformat(data['weekStart'])
+        meta_extra = {
+            'persisted': persisted,
+            'cacheAgeSeconds': refresher.age_seconds(),
+            'stale': refresher.is_stale(),
+        }
 
+    previous = weekly_reports.get_snapshot(week_start - timedelta(days=7))
+    report = weekly_reports.render_report(data, previous, meta_extra)
     return jsonify({'ok': True, 'report': report})
 
 
+@bp.get('/full-report/history')
+def full_report_history():
+    # 依週次新到舊分頁列出過去的週報摘要，before 帶入上一頁回傳的 nextBefore
+    before = _parse_week(request.args.get('before')) if request.args.get('before') else None
+    limit = max(1, min(52, request.args.get('limit', 10, type=int)))
+    try:
+        history = weekly_reports.list_history(before, limit)
+    except Exception as e:
+        print("❌ 週報歷史查詢失敗:", e)
+        return jsonify({'ok': False, 'error': str(e)}), 500
+    next_before = history[-1]['weekStart'] if len(history) == limit else None
+    return jsonify({'ok': True, 'history': history, 'nextBefore': next_before})
@@ -0,0 +1,177 @@
+"""
+文章全文搜尋索引
+- PostgreSQL：articles.search_bigrams（字元二元組 tsvector，generated column）+ GIN 索引，
+  結構定義於 database/search_index.sql，新增或更新文章時由資料庫自動維護
+- 其他資料庫（SQLite 測試環境）：行程內的二元組倒排索引，新文章於搜尋前增量同步
+
+兩者都會以 ILIKE／子字串再確認一次，結果與原本的 `ILIKE '%kw%'` 相同，只是不再掃描全表。
+"""
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+
+from models import db, Article
+
+SQL_PATH = Path(__file__).parent.parent / 'database' / 'search_index.sql'
+
+# 標題命中的額外權重
+TITLE_WEIGHT = 2.0
+
+
+def keyword_bigrams(keyword: str) -> List[str]:
+    """與 SQL 函式 cjk_bigrams 相同的切法：小寫字元二元組，略過含空白者"""
+    kw = keyword.lower()
+    grams = []
+    for i in range(len(kw) - 1):
+        g = kw[i:i + 2]
+        if not any(c.isspace() for c in g) and g not in grams:
+            grams.append(g)
+    return grams
+
+
+def _tsquery_literal(lexeme: str) -> str:
+    return "'" + lexeme.replace('\\', '\\\\').replace("'", "''") + "'"
+
+
+def build_tsquery(keyword: str) -> Optional[str]:
+    """
+    將關鍵字轉為 tsquery 字串（以 CAST(:q AS tsquery) 使用，不經斷詞處理）
+    無法切出任何二元組時回傳 None，由呼叫端改用 ILIKE：
+    單一字元若只出現在文字結尾或空白前，不會是任何二元組的前綴，前綴查詢會漏掉這些文章
+    """
+    grams = keyword_bigrams(keyword)
+    if grams:
+        return ' & '.join(_tsquery_literal(g) for g in grams)
+    return None
+
+
+def ensure_search_indexes(engine=None) -> bool:
+    """在 PostgreSQL 上建立搜尋欄位與索引（可重複執行），其他資料庫直接略過"""
+    engine = engine or db.engine
+    if engine.dialect.name != 'postgresql':
+        return False
+    sql = SQL_PATH.read_text(encoding='utf-8')
+    with engine.begin() as conn:
+        conn.exec_driver_sql(sql)
+    return True
+
+
+def has_search_column(engine=None) -> bool:
+    """PostgreSQL 上 articles.search_bigrams 是否已建立（結果快取於 engine 上）"""
+    engine = engine or db.engine
+    cached = getattr(engine, '_tld_has_search_column', None)
+    if cached is None:
+        with engine.connect() as conn:
+            cached = conn.execute(text("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = 'articles' AND column_name = 'search_bigrams'
+            """)).first() is not None
+        engine._tld_has_search_column = cached
+    return cached
+
+
+# ============================================================
+# 行程內二元組倒排索引（SQLite 等無 tsvector 的環境）
+# ============================================================
+class BigramIndex:
+    """文章 id → (小寫標題, 小寫內文) 與二元組 → 文章 id 的倒排表"""
+
+    def __init__(self):
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._docs: Dict[int, Tuple[str, str]] = {}
+        self.max_id = 0
+        self.lock = threading.RLock()
+
+    def add(self, article_id: int, title: Optional[str], content: Optional[str]):
+        with self.lock:
+            self.remove(article_id)
+            t = (title or '').lower()
+            c = (content or '').lower()
+            self._docs[article_id] = (t, c)
+            for g in set(keyword_bigrams(t)) | set(keyword_bigrams(c)):
+                self._postings[g].add(article_id)
+            self.max_id = max(self.max_id, article_id)
+
+    def remove(self, article_id: int):
+        with self.lock:
+            doc = self._docs.pop(article_id, None)
+            if doc is None:
+                return
+            for g in set(keyword_bigrams(doc[0])) | set(keyword_bigrams(doc[1])):
+                ids = self._postings.get(g)
+                if ids is not None:
+                    ids.discard(article_id)
+                    if not ids:
+                        del self._postings[g]
+
+    def search(self, keyword: str) -> Dict[int, float]:
+        """回傳 {article_id: 相關度}，只包含標題或內文確實含有關鍵字者"""
+        kw = keyword.lower()
+        with self.lock:
+            grams = keyword_bigrams(kw)
+            if grams:
+                postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+                candidates = set(postings[0])
+                for ids in postings[1:]:
+                    candidates &= ids
+                    if not candidates:
+                        break
+            else:
+                candidates = set(self._docs)
+
+            ranks = {}
+            for aid in candidates:
+                t, c = self._docs[aid]
+                in_title = kw in t
+                hits = c.count(kw)
+                if not in_title and not hits:
+                    continue
+                ranks[aid] = (TITLE_WEIGHT if in_title else 0.0) + min(1.0, hits / 10.0)
+            return ranks
+
+
+_fallback_indexes: Dict[int, BigramIndex] = {}
+_fallback_lock = threading.Lock()
+
+
+def fallback_index(engine=None) -> BigramIndex:
+    """取得（並增量同步）此資料庫連線對應的行程內索引"""
+    engine = engine or db.engine
+    with _fallback_lock:
+        index = _fallback_indexes.get(id(engine))
+        if index is None:
+            index = _fallback_indexes[id(engine)] = BigramIndex()
+    with index.lock:
+        # 以 article_id 遞增補上尚未索引的文章（包含以原生 SQL 新增者）
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text("SELECT article_id, title, content FROM articles WHERE article_id > :max_id ORDER BY article_id"),
+                {"max_id": index.max_id},
+            )
+            for aid, title, content in rows:
+                index.add(aid, title, content)
+    return index
+
+
+def search_ranks(keyword: str, engine=None) -> Dict[int, float]:
+    """以行程內索引搜尋，回傳 {article_id: 相關度}"""
+    return fallback_index(engine).search(keyword)
+
+
+# ORM 新增／更新／刪除文章時同步行程內索引（尚未建立索引的連線不需處理）
+@event.listens_for(Article, 'after_insert')
+@event.listens_for(Article, 'after_update')
+def _index_article(mapper, connection, target):
+    index = _fallback_indexes.get(id(connection.engine))
+    if index is not None:
+        index.add(target.article_id, target.title, target.content)
+
+
+@event.listens_for(Article, 'after_delete')
+def _unindex_article(mapper, connection, target):
+    index = _fallback_indexes.get(id(connection.engine))
+    if index is not None:
+        index.remove(target.article_id)
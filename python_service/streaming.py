@@ -0,0 +1,60 @@
+"""
+列表 API 的串流輸出（NDJSON）
+用戶端以 `Accept: application/x-ndjson` 或 `?stream=1` 啟用：
+查詢改用伺服器端游標（stream_results）逐批取回，每筆資料序列化為一行 JSON，
+累積 STREAM_CHUNK_ROWS 行後送出一個 chunk，整份結果不會同時存在於記憶體中。
+串流模式不套用預設筆數上限（仍接受 limit 與 cursor 參數），適合匯出與管理工具。
+"""
+from typing import Any, Callable, Iterable, Optional
+
+from flask import Response, current_app, stream_with_context
+
+from models import db
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+# 每個 chunk 的資料筆數，也是伺服器端游標每次取回的筆數
+STREAM_CHUNK_ROWS = 500
+
+
+def wants_stream(req) -> bool:
+    """請求是否要求串流輸出"""
+    if req.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return req.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def stream_limit(args, parse_limit: Callable) -> Optional[int]:
+    """串流模式只有明確帶 limit 時才限制筆數"""
+    return parse_limit(args) if "limit" in args else None
+
+
+def iter_query(query, params: dict, chunk_rows: int = STREAM_CHUNK_ROWS) -> Iterable[Any]:
+    """以伺服器端游標逐批讀取查詢結果（PostgreSQL 為具名游標，SQLite 本身即逐列讀取）"""
+    conn = db.session.connection()
+    result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(query, params)
+    try:
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
+
+
+def ndjson_response(rows: Iterable[Any], serialize: Callable[[Any], Any],
+                    chunk_rows: int = STREAM_CHUNK_ROWS) -> Response:
+    """將資料逐筆序列化為 NDJSON 並分批送出"""
+
+    def generate():
+        dumps = current_app.json.dumps
+        buf = []
+        for row in rows:
+            buf.append(dumps(serialize(row)))
+            if len(buf) >= chunk_rows:
+                yield "\n".join(buf) + "\n"
+                buf = []
+        if buf:
+            yield "\n".join(buf) + "\n"
+
+    resp = Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+    # 避免反向代理緩衝整份回應
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
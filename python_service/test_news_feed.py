@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+測試 RSS 背景更新（news_feed.NewsFeedRefresher）
+以本機 http.server 模擬 RSS 來源，不需連線 Google News：
+- 條件式 GET：第二次抓取帶 If-None-Match / If-Modified-Since，來源回應 304 時沿用快照
+- stale-while-revalidate：快照過期時先回傳舊快照，背景更新完成後才換成新內容
+- 抓取失敗後間隔 RETRY_SECONDS 重試，而不是等到下一個 interval
+
+執行方式：python test_news_feed.py（或 pytest test_news_feed.py）
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import news_feed
+from news_feed import NewsFeedRefresher
+
+LAST_MODIFIED = 'Wed, 15 Oct 2025 12:00:00 GMT'
+
+
+class StubFeed:
+    """RSS 來源的狀態：目前版本、是否回應錯誤、回應延遲與各狀態碼的次數"""
+
+    def __init__(self):
+        self.version = 1
+        self.fail = False
+        self.delay = 0.0
+        self.hits = {200: 0, 304: 0, 500: 0}
+        self.conditional = []  # 每次請求帶的 (If-None-Match, If-Modified-Since)
+
+    def rss(self) -> bytes:
+        items = ''.join(
+            f'<item><title>第 {self.version} 版新聞 {i}</title><pubDate>{LAST_MODIFIED}</pubDate></item>'
+            for i in range(3))
+        return f'<?xml version="1.0" encoding="UTF-8"?><rss><channel>{items}</channel></rss>'.encode('utf-8')
+
+
+def start_stub():
+    feed = StubFeed()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if feed.delay:
+                time.sleep(feed.delay)
+            etag = f'"v{feed.version}"'
+            feed.conditional.append((self.headers.get('If-None-Match'), self.headers.get('If-Modified-Since')))
+            if feed.fail:
+                feed.hits[500] += 1
+                self.send_response(500)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if self.headers.get('If-None-Match') == etag:
+                feed.hits[304] += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            body = feed.rss()
+            feed.hits[200] += 1
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/rss+xml; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', LAST_MODIFIED)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, feed, f'http://127.0.0.1:{server.server_address[1]}/rss'
+
+
+def wait_until(condition, timeout: float = 3.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_conditional_get():
+    server, feed, url = start_stub()
+    try:
+        refresher = NewsFeedRefresher(url, interval=600)
+        assert refresher.refresh() is True
+        first = refresher.snapshot()
+        assert refresher.refresh() is False  # 304：快照不變
+        assert refresher.snapshot() is first
+        assert feed.hits == {200: 1, 304: 1, 500: 0}
+        assert feed.conditional[1] == ('"v1"', LAST_MODIFIED)
+        print(f"✅ 條件式 GET：第二次抓取帶 {feed.conditional[1]}，來源回應 304，沿用原快照")
+    finally:
+        server.shutdown()
+
+
+def test_stale_while_revalidate():
+    server, feed, url = start_stub()
+    try:
+        refresher = NewsFeedRefresher(url, interval=0.3)
+        assert refresher.snapshot(wait=3).titles[0].startswith('第 1 版')
+
+        feed.version, feed.delay = 2, 0.5
+        time.sleep(0.35)
+        start = time.monotonic()
+        stale = refresher.snapshot()
+        elapsed = time.monotonic() - start
+        assert stale.titles[0].startswith('第 1 版') and elapsed < 0.2
+        assert wait_until(lambda: refresher.snapshot().titles[0].startswith('第 2 版'))
+        print(f"✅ stale-while-revalidate：過期時 {elapsed * 1000:.0f} ms 內回傳舊快照，背景更新後換成新版本")
+    finally:
+        server.shutdown()
+
+
+def test_retry_after_failure():
+    server, feed, url = start_stub()
+    original = news_feed.RETRY_SECONDS
+    news_feed.RETRY_SECONDS = 0.2
+    try:
+        feed.fail = True
+        # interval 很長：若失敗後仍等待 interval，1 秒內只會嘗試一次
+        refresher = NewsFeedRefresher(url, interval=600)
+        refresher.start()
+        time.sleep(1.0)
+        failures = feed.hits[500]
+        assert failures >= 3, failures
+        assert refresher.last_error
+
+        feed.fail = False
+        assert wait_until(lambda: feed.hits[200] == 1 and refresher.last_error is None)
+        assert refresher.snapshot().titles
+        print(f"✅ 失敗重試：1 秒內重試 {failures} 次（RETRY_SECONDS=0.2），來源恢復後取得快照")
+    finally:
+        news_feed.RETRY_SECONDS = original
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    test_conditional_get()
+    test_stale_while_revalidate()
+    test_retry_after_failure()
+    print("\n完成！")
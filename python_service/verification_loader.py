@@ -1,49 +1,391 @@
 """
 查證資料載入與分類模組
-從 projectt/reports/raw_*.json 讀取查證資料，並自動分類為「已查證」和「未查證」
+從 projectt/reports 讀取查證資料，並自動分類為「已查證」和「未查證」：
+- 日期分區的 JSON Lines 分片（crawl_shards，依 manifest 逐行串流讀取）
+- 尚未搬進分片的 raw_*.json（manifest 的 migrated 未列出者）
+檔案以串流方式逐筆解析（json_stream），分類與每日彙總在同一個產生器管線中完成；
+常駐記憶體的只有各檔案的計數與彙總，條目列表只在呼叫端需要時才重新讀取。
 """
-import json
-import os
+import threading
+import time
+from collections import Counter
 from pathlib import Path
-from typing import List, Dict, Tuple
-from datetime import datetime
+from typing import Iterable, Iterator, List, Dict, Tuple, Optional
+from datetime import datetime, date, timedelta
 
+from crawl_shards import ShardStore, get_shard_store, raw_file_timestamp
+from json_stream import iter_json_file
+from news_keywords import GROUP_VERIFIED, classify_title, scan
 
-def load_verification_data() -> List[Dict]:
+
+# 查證資料資料夾（相對於此檔案）
+REPORTS_DIR = Path(__file__).parent.parent / 'projectt' / 'reports'
+
+# 兩次掃描資料夾之間的最短間隔（秒），避免每個請求都 stat 所有檔案
+MIN_REFRESH_INTERVAL = 2.0
+
+# 每日保留的標題範例數
+SAMPLE_TITLES_PER_DAY = 3
+
+
+class _DayBucket:
+    """單日彙總：(查證狀態, 類別) 計數、通道計數、情感命中數與標題範例"""
+
+    __slots__ = ('counts', 'channels', 'positive', 'negative', 'titles')
+
+    def __init__(self):
+        self.counts = Counter()    # (status, category) -> 條目數，category 可為 None
+        self.channels = Counter()  # 通道 -> 標題數
+        self.positive = 0
+        self.negative = 0
+        self.titles: List[str] = []
+
+    def add(self, item: Dict, status: str):
+        title = item.get('title')
+        if not title:
+            self.counts[(status, None)] += 1
+            return
+        category, channel, pos, neg = classify_title(title)
+        self.counts[(status, category)] += 1
+        self.channels[channel] += 1
+        self.positive += pos
+        self.negative += neg
+        if len(self.titles) < SAMPLE_TITLES_PER_DAY:
+            self.titles.append(title)
+
+    def merge(self, other: '_DayBucket'):
+        self.counts.update(other.counts)
+        self.channels.update(other.channels)
+        self.positive += other.positive
+        self.negative += other.negative
+        room = SAMPLE_TITLES_PER_DAY - len(self.titles)
+        if room > 0:
+            self.titles.extend(other.titles[:room])
+
+
+class DailyRollup:
     """
-    載入所有 projectt/reports/raw_*.json 檔案
-    回傳合併後的新聞條目列表
+    依 (爬取日期, 查證狀態, 類別) 預先彙總的統計
+
+    在載入檔案時填入一次，之後近 N 天圖表、總數與標題範例
+    都只需查詢 N 個日期桶，不必再掃描或重新解析原始條目。
+    沒有 crawled_at 的條目放在日期為 None 的桶中。
     """
-    # 找到 projectt/reports 資料夾（相對於此檔案）
-    current_dir = Path(__file__).parent
-    reports_dir = current_dir.parent / 'projectt' / 'reports'
-    
-    if not reports_dir.exists():
-        print(f"警告：找不到查證資料資料夾 {reports_dir}")
-        return []
-    
-    all_items = []
-    json_files = list(reports_dir.glob('raw_*.json'))
-    
-    if not json_files:
-        print(f"警告：在 {reports_dir} 找不到任何 raw_*.json 檔案")
-        return []
-    
-    print(f"找到 {len(json_files)} 個查證資料檔案")
-    
-    for json_file in json_files:
+
+    def __init__(self):
+        self.days: Dict[Optional[date], _DayBucket] = {}
+        # 各狀態帶有 crawled_at 欄位的條目數（含無法解析者），用於判斷是否退回均分邏輯
+        self.timestamped = Counter()
+
+    def add(self, item: Dict, status: str):
+        crawled_at = item.get('crawled_at')
+        day = None
+        if crawled_at is not None:
+            self.timestamped[status] += 1
+            try:
+                day = datetime.fromisoformat(crawled_at).date()
+            except (ValueError, TypeError):
+                # 無法解析的時間戳記不列入任何日期統計
+                return
+        bucket = self.days.get(day)
+        if bucket is None:
+            bucket = self.days[day] = _DayBucket()
+        bucket.add(item, status)
+
+    def merge(self, other: 'DailyRollup'):
+        self.timestamped.update(other.timestamped)
+        for day, bucket in other.days.items():
+            mine = self.days.get(day)
+            if mine is None:
+                mine = self.days[day] = _DayBucket()
+            mine.merge(bucket)
+
+    def window(self, days: int = 7, today: Optional[date] = None) -> Dict:
+        """
+        取得近 N 天的彙總
+
+        回傳：
+        - daily: {'verified': {day_offset: count}, 'unverified': {...}}，day_offset 0 = 今天
+        - categories / channels: Counter
+        - positive / negative: 情感命中標題數
+        - titles: 標題範例（新到舊，最後為無時間戳記者）
+        - titled: 參與分類的標題數
+
+        與 get_daily_distribution 相同：某狀態若完全沒有時間戳記，
+        每日數量改以該狀態的全部條目均分；無時間戳記的標題一律計入分類統計。
+        """
+        today = today or date.today()
+        buckets = []
+        for offset in range(days):
+            bucket = self.days.get(today - timedelta(days=offset))
+            buckets.append((offset, bucket))
+        undated = self.days.get(None)
+
+        daily = {}
+        for status in ('verified', 'unverified'):
+            dist = {i: 0 for i in range(days)}
+            if self.timestamped[status]:
+                for offset, bucket in buckets:
+                    if bucket is not None:
+                        dist[offset] = sum(v for (st, _), v in bucket.counts.items() if st == status)
+            elif undated is not None:
+                total = sum(v for (st, _), v in undated.counts.items() if st == status)
+                base_count, remainder = divmod(total, days)
+                for i in range(days):
+                    # 餘數優先分配給最近的幾天（day_offset 0, 1, 2...）
+                    dist[i] = base_count + (1 if i < remainder else 0)
+            daily[status] = dist
+
+        categories = Counter()
+        channels = Counter()
+        positive = negative = 0
+        titles: List[str] = []
+        for bucket in [b for _, b in buckets] + [undated]:
+            if bucket is None:
+                continue
+            for (_, cat), v in bucket.counts.items():
+                if cat:
+                    categories[cat] += v
+            channels.update(bucket.channels)
+            positive += bucket.positive
+            negative += bucket.negative
+            room = SAMPLE_TITLES_PER_DAY - len(titles)
+            if room > 0:
+                titles.extend(bucket.titles[:room])
+
+        return {
+            'daily': daily,
+            'categories': categories,
+            'channels': channels,
+            'positive': positive,
+            'negative': negative,
+            'titles': titles,
+            'titled': sum(channels.values()),
+        }
+
+
+def iter_raw_items(json_file: Path) -> Iterator[Dict]:
+    """
+    逐筆讀取尚未搬進分片的 raw_*.json
+    缺少 crawled_at 的條目與搬移時（migrate_raw_files）相同，以檔名時間（無法解析時為現在）補上
+    """
+    file_time = raw_file_timestamp(json_file.name) or datetime.now().isoformat(timespec='seconds')
+    for item in iter_json_file(json_file):
+        if 'crawled_at' not in item:
+            item = dict(item, crawled_at=file_time)
+        yield item
+
+
+class _FileEntry:
+    """單一 raw_*.json 或分片檔的索引紀錄：(size, mtime)、各狀態條目數與每日彙總"""
+
+    __slots__ = ('size', 'mtime_ns', 'verified', 'unverified', 'rollup')
+
+    def __init__(self, size: int, mtime_ns: int, verified: int, unverified: int, rollup: DailyRollup):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.verified = verified
+        self.unverified = unverified
+        self.rollup = rollup
+
+
+class VerificationStore:
+    """
+    行程內共用的查證資料快取
+
+    以 (path, size, mtime) 為索引，只重新解析、分類新增或變動的檔案，
+    已刪除的檔案會被移除；常駐記憶體的只有合併後的計數與每日彙總，
+    統計 API 的延遲與記憶體用量都不會隨爬蟲條目數增加而上升。
+    條目列表（snapshot / iter_items）每次從檔案串流重新讀取。
+    """
+
+    def __init__(self, reports_dir: Path, min_refresh_interval: float = MIN_REFRESH_INTERVAL,
+                 shards: Optional[ShardStore] = None):
+        self.reports_dir = reports_dir
+        self.shards = shards
+        self.min_refresh_interval = min_refresh_interval
+        self._files: Dict[str, _FileEntry] = {}
+        self._counts = (0, 0)
+        self._rollup = DailyRollup()
+        self._last_scan = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> bool:
+        """掃描資料夾並增量更新，回傳資料是否有變動"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_scan and now - self._last_scan < self.min_refresh_interval:
+                return False
+            self._last_scan = now
+
+            if not self.reports_dir.exists():
+                print(f"警告：找不到查證資料資料夾 {self.reports_dir}")
+                changed = bool(self._files)
+                self._files.clear()
+                if changed:
+                    self._rebuild()
+                return changed
+
+            seen = set()
+            changed = False
+            for json_file in self._source_files():
+                key = str(json_file)
+                try:
+                    st = json_file.stat()
+                except OSError:
+                    continue
+                seen.add(key)
+                entry = self._files.get(key)
+                if entry and entry.size == st.st_size and entry.mtime_ns == st.st_mtime_ns:
+                    continue
+                new_entry = self._load_file(json_file, st.st_size, st.st_mtime_ns)
+                if new_entry is None:
+                    # 解析失敗（可能正在寫入中），保留舊資料，下次掃描再試
+                    continue
+                self._files[key] = new_entry
+                changed = True
+
+            for key in list(self._files):
+                if key not in seen:
+                    print(f"  - 移除已刪除的檔案 {Path(key).name}")
+                    del self._files[key]
+                    changed = True
+
+            if changed:
+                self._rebuild()
+            return changed
+
+    def counts(self) -> Tuple[int, int]:
+        """回傳 (已查證數, 未查證數)，必要時先增量更新"""
+        self.refresh()
+        with self._lock:
+            return self._counts
+
+    def iter_items(self) -> Iterator[Tuple[str, Dict]]:
+        """依檔名順序逐筆產生 (查證狀態, 條目)，從檔案串流讀取，不佔用常駐記憶體"""
+        self.refresh()
+        with self._lock:
+            paths = sorted(self._files)
+        for path in paths:
+            try:
+                for item in self._iter_file(Path(path)):
+                    yield classify_item(item), item
+            except (OSError, ValueError) as e:
+                print(f"  ✗ 讀取 {Path(path).name} 失敗: {e}")
+
+    def snapshot(self) -> Tuple[List[Dict], List[Dict]]:
+        """回傳 (verified_items, unverified_items)；會把所有條目讀入記憶體，只適合小量資料或除錯"""
+        verified, unverified = [], []
+        for status, item in self.iter_items():
+            (verified if status == 'verified' else unverified).append(item)
+        return verified, unverified
+
+    def rollup(self) -> DailyRollup:
+        """回傳合併後的每日彙總，必要時先增量更新"""
+        self.refresh()
+        with self._lock:
+            return self._rollup
+
+    def age_seconds(self) -> Optional[int]:
+        """距離上次掃描資料夾的秒數；尚未掃描時回傳 None"""
+        if not self._last_scan:
+            return None
+        return int(time.monotonic() - self._last_scan)
+
+    def _source_files(self) -> List[Path]:
+        """分片檔（不會再變動）與尚未搬進分片的 raw_*.json"""
+        if self.shards is None:
+            return list(self.reports_dir.glob('raw_*.json'))
+        try:
+            migrated = self.shards.migrated_sources()
+            parts = self.shards.parts()
+        except Exception as e:
+            print(f"  ✗ 讀取分片 manifest 失敗: {e}")
+            migrated, parts = set(), []
+        return parts + [f for f in self.reports_dir.glob('raw_*.json') if f.name not in migrated]
+
+    @staticmethod
+    def _iter_file(path: Path) -> Iterator[Dict]:
+        if path.suffix == '.json':
+            return iter_raw_items(path)
+        return ShardStore.iter_part(path)
+
+    @classmethod
+    def _load_file(cls, json_file: Path, size: int, mtime_ns: int):
+        # 逐筆解析、分類並彙總，只保留計數與彙總
+        counts = Counter()
+        rollup = DailyRollup()
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                items = data.get('items', [])
-                all_items.extend(items)
-                print(f"  ✓ 載入 {json_file.name}: {len(items)} 則新聞")
+            for item in cls._iter_file(json_file):
+                status = classify_item(item)
+                counts[status] += 1
+                rollup.add(item, status)
         except Exception as e:
             print(f"  ✗ 載入 {json_file.name} 失敗: {e}")
+            return None
+        print(f"  ✓ 載入 {json_file.name}: {sum(counts.values())} 則新聞")
+        return _FileEntry(size, mtime_ns, counts['verified'], counts['unverified'], rollup)
+
+    def _rebuild(self):
+        verified = unverified = 0
+        rollup = DailyRollup()
+        for entry in self._files.values():
+            verified += entry.verified
+            unverified += entry.unverified
+            rollup.merge(entry.rollup)
+        # 以新物件整體替換，先前回傳給呼叫端的彙總不會被修改
+        self._counts = (verified, unverified)
+        self._rollup = rollup
+        print(f"查證資料已更新：{len(self._files)} 個檔案，共 {verified + unverified} 則新聞")
+
+
+_store = VerificationStore(REPORTS_DIR, shards=get_shard_store())
+
+
+def get_store() -> VerificationStore:
+    """取得行程內共用的查證資料快取"""
+    return _store
+
+
+def iter_verification_data() -> Iterator[Dict]:
+    """逐筆產生所有查證資料（分片與尚未搬移的 raw_*.json），記憶體只需容納單一條目"""
+    for _, item in _store.iter_items():
+        yield item
+
+
+def load_verification_data() -> List[Dict]:
+    """
+    載入所有查證資料（分片與尚未搬移的 raw_*.json）
+    回傳合併後的新聞條目列表；會把所有條目讀入記憶體，大量資料請改用 iter_verification_data
+    """
+    return list(iter_verification_data())
+
+
+def iter_verification_range(start: date, end: Optional[date] = None) -> Iterator[Dict]:
+    """
+    逐筆讀取 crawled_at 日期在 [start, end]（含）內的條目，不經過快取
+    分片只讀取範圍內的分區；尚未搬移的 raw_*.json 逐筆解析後過濾（見 iter_raw_items）
+    """
+    end = end or date.today()
+    shards = get_shard_store()
+    yield from shards.iter_records(start, end)
+
+    migrated = shards.migrated_sources()
+    for json_file in sorted(REPORTS_DIR.glob('raw_*.json')):
+        if json_file.name in migrated:
             continue
-    
-    print(f"總共載入 {len(all_items)} 則新聞")
-    return all_items
+        for item in iter_raw_items(json_file):
+            try:
+                day = datetime.fromisoformat(item.get('crawled_at') or '').date()
+            except (ValueError, TypeError):
+                continue
+            if start <= day <= end:
+                yield item
+
+
+def get_window_stats(days: int = 7) -> Dict:
+    """取得近 N 天的查證彙總（見 DailyRollup.window）"""
+    return _store.rollup().window(days)
 
 
 def classify_item(item: Dict) -> str:
@@ -57,13 +399,8 @@ def classify_item(item: Dict) -> str:
     # 1. 依 short_judgement 判斷
     sj = item.get('short_judgement', '')
     
-    # 已查證的關鍵字（明確標示可信、假訊息、不實等）
-    verified_keywords = [
-        '可信', '查證', '已查證', '經查證', '假訊息', '不實', '謠言', 
-        '經證實', '經查核', '經審查', '確認', '事實查核', '闢謠'
-    ]
-    
-    if any(k in sj for k in verified_keywords):
+    # 已查證的關鍵字（明確標示可信、假訊息、不實等，見 news_keywords）
+    if sj and GROUP_VERIFIED in scan(sj, (GROUP_VERIFIED,)):
         return 'verified'
     
     # 2. 依 ann_features 分數輔助判斷
@@ -79,9 +416,14 @@ def classify_item(item: Dict) -> str:
     return 'unverified'
 
 
+def get_verification_counts() -> Tuple[int, int]:
+    """取得 (已查證數, 未查證數)，直接使用常駐的彙總，不讀取條目"""
+    return _store.counts()
+
+
 def get_verification_stats() -> Tuple[int, int, List[Dict], List[Dict]]:
     """
-    取得查證統計資料
+    取得查證統計資料（條目列表會讀入記憶體；只需要數量時請用 get_verification_counts）
     
     回傳：
     - verified_count: 已查證數量
@@ -89,77 +431,49 @@ def get_verification_stats() -> Tuple[int, int, List[Dict], List[Dict]]:
     - verified_items: 已查證條目列表
     - unverified_items: 未查證條目列表
     """
-    all_items = load_verification_data()
-    
-    verified_items = []
-    unverified_items = []
-    
-    for item in all_items:
-        if classify_item(item) == 'verified':
-            verified_items.append(item)
-        else:
-            unverified_items.append(item)
-    
+    verified_items, unverified_items = _store.snapshot()
     return len(verified_items), len(unverified_items), verified_items, unverified_items
 
 
-def get_daily_distribution(items: List[Dict], days: int = 7) -> Dict[int, int]:
+def get_daily_distribution(items: Iterable[Dict], days: int = 7) -> Dict[int, int]:
     """
-    將條目列表依實際爬取日期分組到近 N 天
+    將條目依實際爬取日期分組到近 N 天
     回傳 {day_offset: count} 字典，day_offset 0 = 今天，1 = 昨天，依此類推
-    
+    items 可為列表或產生器（只走訪一次）
+
     如果條目有 crawled_at 欄位，則根據實際日期分組
     否則退回到均分邏輯（向下兼容）
     """
-    from datetime import datetime, timedelta
-    
-    total = len(items)
-    if total == 0:
-        return {i: 0 for i in range(days)}
-    
-    # 檢查是否有 crawled_at 欄位
-    has_timestamp = any('crawled_at' in item for item in items)
-    
-    if has_timestamp:
-        # 使用真實日期分組
-        now = datetime.now()
-        today_date = now.date()
-        
-        distribution = {i: 0 for i in range(days)}
-        
-        for item in items:
-            if 'crawled_at' not in item:
-                continue
-                
-            try:
-                # 解析 ISO 格式時間戳記
-                crawled_time = datetime.fromisoformat(item['crawled_at'])
-                crawled_date = crawled_time.date()
-                
-                # 計算距離今天的天數
-                delta = (today_date - crawled_date).days
-                
-                # 只統計近 N 天內的數據
-                if 0 <= delta < days:
-                    distribution[delta] += 1
-                    
-            except (ValueError, TypeError):
-                # 如果解析失敗，跳過這筆資料
-                continue
-        
-        return distribution
-    else:
-        # 向下兼容：沒有時間戳記時使用均分邏輯
-        base_count = total // days
-        remainder = total % days
-        
-        distribution = {}
-        for i in range(days):
-            # 餘數優先分配給最近的幾天（day_offset 0, 1, 2...）
-            distribution[i] = base_count + (1 if i < remainder else 0)
-        
+    today_date = datetime.now().date()
+    distribution = {i: 0 for i in range(days)}
+    total = 0
+    has_timestamp = False
+
+    for item in items:
+        total += 1
+        if 'crawled_at' not in item:
+            continue
+        has_timestamp = True
+        try:
+            # 解析 ISO 格式時間戳記，計算距離今天的天數
+            delta = (today_date - datetime.fromisoformat(item['crawled_at']).date()).days
+        except (ValueError, TypeError):
+            # 如果解析失敗，跳過這筆資料
+            continue
+        # 只統計近 N 天內的數據
+        if 0 <= delta < days:
+            distribution[delta] += 1
+
+    if has_timestamp or total == 0:
         return distribution
 
+    # 向下兼容：沒有時間戳記時使用均分邏輯
+    base_count, remainder = divmod(total, days)
+    for i in range(days):
+        # 餘數優先分配給最近的幾天（day_offset 0, 1, 2...）
+        distribution[i] = base_count + (1 if i < remainder else 0)
+    return distribution
+
 
 if __name__ == '__main__':
     # 測試用：執行此檔案可看到統計結果
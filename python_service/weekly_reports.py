@@ -0,0 +1,217 @@
+"""
+週報快照模組
+每週（以週一為鍵）把完整報告的統計結果存入 weekly_report_snapshots，
+/api/full-report 只需讀取本週與上週兩筆快照即可產生報告與真實的週增減幅度；
+歷史頁面可依 week_start 分頁瀏覽過去的週報。
+"""
+import json
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from models import db, WeeklyReportSnapshot
+
+# 存在獨立欄位（可排序、比較）的統計，其餘放入 payload JSON
+_COLUMN_FIELDS = {
+    'source': 'source',
+    'newsCount': 'news_count',
+    'totalVerified': 'total_verified',
+    'totalSuspicious': 'total_suspicious',
+    'aiAccuracy': 'ai_accuracy',
+}
+
+
+def week_start_of(d: date) -> date:
+    """回傳該日所屬週的週一"""
+    return d - timedelta(days=d.weekday())
+
+
+def _apply(snapshot: WeeklyReportSnapshot, data: Dict, now: datetime):
+    for key, column in _COLUMN_FIELDS.items():
+        setattr(snapshot, column, data.get(key))
+    payload = {k: v for k, v in data.items() if k not in _COLUMN_FIELDS}
+    snapshot.payload = json.dumps(payload, ensure_ascii=False)
+    snapshot.updated_at = now
+
+
+def ensure_current_week(fetched_at: Optional[datetime], build: Callable[[], Dict],
+                        now: Optional[datetime] = None) -> Tuple[Dict, bool]:
+    """
+    取得本週快照，必要時（尚無快照或資料來源已更新）以 build() 重新產生並寫入
+    fetched_at: 資料來源（RSS 快照）的抓取時間；None 表示來源無資料，此時不寫入資料庫
+    回傳 (週報資料, 是否已持久化)
+    """
+    now = now or datetime.utcnow()
+    week_start = week_start_of(now.date())
+    try:
+        snapshot = WeeklyReportSnapshot.query.filter_by(week_start=week_start).first()
+        if snapshot is not None and (fetched_at is None or snapshot.updated_at >= fetched_at):
+            return snapshot.to_dict(), True
+        if fetched_at is None:
+            data = build()
+            data['weekStart'] = week_start.isoformat()
+            return data, False
+
+        data = build()
+        if snapshot is None:
+            snapshot = WeeklyReportSnapshot(week_start=week_start, created_at=now)
+            db.session.add(snapshot)
+        _apply(snapshot, data, now)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # 其他 worker 同時建立了本週快照，改為更新該筆
+            db.session.rollback()
+            snapshot = WeeklyReportSnapshot.query.filter_by(week_start=week_start).first()
+            _apply(snapshot, data, now)
+            db.session.commit()
+        return snapshot.to_dict(), True
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print("⚠️ 週報快照讀寫失敗，改用即時資料:", e)
+        data = build()
+        data['weekStart'] = week_start.isoformat()
+        return data, False
+
+
+def get_snapshot(week_start: date) -> Optional[Dict]:
+    """讀取指定週的快照，不存在或資料庫無法使用時回傳 None"""
+    try:
+        snapshot = WeeklyReportSnapshot.query.filter_by(week_start=week_start).first()
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print("⚠️ 週報快照讀取失敗:", e)
+        return None
+    return snapshot.to_dict() if snapshot else None
+
+
+def list_history(before: Optional[date] = None, limit: int = 10) -> List[Dict]:
+    """依週次新到舊列出快照摘要；before 為上一頁最後一筆的 week_start（不含）"""
+    query = WeeklyReportSnapshot.query
+    if before is not None:
+        query = query.filter(WeeklyReportSnapshot.week_start < before)
+    rows = query.order_by(WeeklyReportSnapshot.week_start.desc()).limit(limit).all()
+    history = []
+    for row in rows:
+        data = row.to_dict()
+        history.append({
+            'weekStart': data['weekStart'],
+            'newsCount': data['newsCount'],
+            'totalVerified': data['totalVerified'],
+            'totalSuspicious': data['totalSuspicious'],
+            'aiAccuracy': data['aiAccuracy'],
+            'topCategories': data.get('categories', [])[:3],
+            'updatedAt': data['updatedAt'],
+        })
+    return history
+
+
+def _change_percent(current, previous) -> Optional[int]:
+    if not previous:
+        return None
+    return round((current - previous) * 100 / previous)
+
+
+def render_report(data: Dict, previous: Optional[Dict], meta_extra: Optional[Dict] = None) -> Dict:
+    """由本週與上週快照資料產生 3 分頁報告"""
+    weekly = data.get('weeklyReports', [])
+    line_series = data.get('line', [])
+    top_categories = data.get('categories', [])
+    channels = data.get('channels', [])
+    sent = data.get('sentiment', {'neutral': 0, 'negative': 0, 'positive': 0})
+    total_verified = data.get('totalVerified', 0)
+    ai_accuracy = data.get('aiAccuracy', 0)
+    report_date = date.fromisoformat(data['reportDate']) if data.get('reportDate') else datetime.utcnow().date()
+
+    news_change = _change_percent(data.get('newsCount', 0), previous.get('newsCount')) if previous else None
+    spread_change = _change_percent(data.get('totalSuspicious', 0), previous.get('totalSuspicious')) if previous else None
+
+    meta = {
+        'fetchedAt': data.get('fetchedAt'),
+        'source': data.get('source'),
+        'sourceCount': data.get('sourceCount', 0),
+        'headlineSamples': data.get('headlineSamples', []),
+        'weekStart': data.get('weekStart'),
+        'snapshotUpdatedAt': data.get('updatedAt'),
+    }
+    meta.update(meta_extra or {})
+
+    # 動態敘述
+    def cats_to_lines(cats):
+        return '\n'.join([f"* {c['name']} ({c['percentage']}%)" for c in cats]) or '（本週無顯著主題）'
+
+    if news_change is None:
+        news_line = f"本週新聞總量為 **{data.get('newsCount', 0)}** 則（尚無上週快照可比較）。"
+    else:
+        news_line = f"本週新聞總量相較上週{'增長' if news_change >= 0 else '減少'} **{abs(news_change)}%**。"
+
+    if spread_change is None:
+        spread_line = "本週為首份週報快照，尚無上週傳播速度可比較。"
+    else:
+        spread_line = f"傳播速度比上週{'加快' if spread_change >= 0 else '減緩'} **{abs(spread_change)}%**。"
+
+    detection_title = f"假訊息監測完整報告 (週報) - {report_date.year}/{str(report_date.month).zfill(2)}/{str(report_date.day).zfill(2)}"
+    detection_content = (
+        f"本週共偵測到 **{int(sum(line_series))}** 條疑似假訊息，其中 **{total_verified} 條**經 AI 交叉比對後確認為假消息，AI 準確率達 **{ai_accuracy}%**。\n\n"
+        f"**熱門趨勢分析:**\n{cats_to_lines(top_categories)}\n\n"
+        f"**建議:** 立即對高傳播風險的假訊息進行人工複核和澄清。"
+    )
+
+    trend_title = '新聞趨勢與熱度完整分析'
+    trend_content = (
+        f"{news_line}熱度最高的關鍵詞如下：\n{cats_to_lines(top_categories)}\n\n"
+        f"**情感分佈:**\n* 中性: {sent['neutral']}%\n* 負面: {sent['negative']}%\n* 正面: {sent['positive']}%\n\n"
+        f"**預測:** 預計下週主題將持續主導輿論，建議準備相關事實查核素材，以防衍生假消息。"
+    )
+
+    propagation_title = '假訊息傳播網路完整報告'
+    propagation_lines = '\n'.join([f"* {c['channel']} ({c['percentage']}%)" for c in channels])
+    # 依通道比例動態選出前兩名當作本週主要風險來源
+    top_channels = sorted(channels, key=lambda c: c.get('percentage', 0), reverse=True)
+    if len(top_channels) >= 2:
+        risk_label = f"「{top_channels[0]['channel']}」和「{top_channels[1]['channel']}」"
+    elif len(top_channels) == 1:
+        risk_label = f"「{top_channels[0]['channel']}」"
+    else:
+        risk_label = "主要通道"
+
+    propagation_content = (
+        f"{spread_line}\n\n**主要傳播途徑分佈:**\n{propagation_lines}\n\n"
+        f"**高風險通道:** {risk_label} 被識別為本週較主要的假訊息擴散來源。"
+    )
+
+    return {
+        'weekStart': data.get('weekStart'),
+        'deltas': {
+            'newsCountChange': news_change,
+            'suspiciousChange': spread_change,
+        },
+        'tabs': [
+            {
+                'key': 'detection',
+                'title': detection_title,
+                'content': detection_content,
+                'chartType': 'bar',
+                'weeklyReports': weekly,
+                'meta': meta,
+            },
+            {
+                'key': 'trend',
+                'title': trend_title,
+                'content': trend_content,
+                'chartType': 'line',
+                'line': line_series,
+                'categories': top_categories,
+                'meta': meta,
+            },
+            {
+                'key': 'propagation',
+                'title': propagation_title,
+                'content': propagation_content,
+                'chartType': 'pie',
+                'channels': channels,
+                'meta': meta,
+            },
+        ]
+    }